@@ -0,0 +1,122 @@
+"""
+Micro-benchmark of the image description serialization: serialization.dumps/loads and the description
+file writer and reader on 100k descriptions, with orjson and with the standard library fallback.
+
+    python benchmarks/serialization_bench.py [--count 100000]
+"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+import typing as T
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mapilio_kit.components.utilities import serialization  # noqa: E402
+from mapilio_kit.components.utilities.image_description_file import (  # noqa: E402
+    DESC_FORMATS,
+    iter_image_descriptions,
+    write_image_descriptions,
+)
+
+
+def _description(idx: int, sequence_uuid: str) -> T.Dict[str, T.Any]:
+    return {
+        "latitude": 41.0 + random.random(),
+        "longitude": 29.0 + random.random(),
+        "captureTime": f"2023-05-01 10:{idx // 60 % 60:02d}:{idx % 60:02d}",
+        "altitude": random.uniform(0, 200),
+        "sequenceUuid": sequence_uuid,
+        "source": "Mapilio_Kit",
+        "heading": random.uniform(0, 360),
+        "orientation": 1,
+        "roll": 0,
+        "pitch": 0,
+        "yaw": 0,
+        "carSpeed": 0,
+        "deviceMake": "gopro",
+        "deviceModel": "hero8 black",
+        "imageSize": "4000x3000",
+        "fov": 121.0,
+        "megapixels": 12.0,
+        "vfov": 93.0,
+        "filename": f"img_{idx:06d}.jpg",
+        "path": "",
+        "anomaly": 0,
+    }
+
+
+def generate_descriptions(count: int) -> T.List[T.Dict[str, T.Any]]:
+    random.seed(0)
+    sequence_uuid = str(uuid.uuid4())
+    descs = []
+    for idx in range(count):
+        if idx % 250 == 0:
+            sequence_uuid = str(uuid.uuid4())
+        descs.append(_description(idx, sequence_uuid))
+    return descs
+
+
+@contextlib.contextmanager
+def backend(name: str) -> T.Iterator[None]:
+    """
+    Run with orjson, or with the standard library as when orjson is not installed
+    """
+    orjson = serialization.orjson
+    if name == "json":
+        serialization.orjson = None
+    try:
+        yield
+    finally:
+        serialization.orjson = orjson
+
+
+def _timed(func: T.Callable[[], T.Any]) -> T.Tuple[float, T.Any]:
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def bench_backend(name: str, descs: T.List[T.Dict[str, T.Any]], workdir: str) -> None:
+    with backend(name):
+        encode, lines = _timed(lambda: [serialization.dumps(desc) for desc in descs])
+        decode, _ = _timed(lambda: [serialization.loads(line) for line in lines])
+        print(f"{name:>8} dumps/loads: encode {encode:.3f}s, decode {decode:.3f}s, "
+              f"{sum(len(line) for line in lines) / 1e6:.1f} MB")
+
+        for desc_format in DESC_FORMATS:
+            desc_path = os.path.join(workdir, f"descs.{desc_format}")
+            write, _ = _timed(lambda: write_image_descriptions(desc_path, descs, desc_format))
+
+            def read() -> int:
+                with open(desc_path, encoding="utf-8") as fp:
+                    return sum(1 for _ in iter_image_descriptions(fp))
+
+            read_time, count = _timed(read)
+            assert count == len(descs)
+            print(f"{name:>8} {desc_format:>6} file: write {write:.3f}s, read {read_time:.3f}s, "
+                  f"{os.path.getsize(desc_path) / 1e6:.1f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100000, help="number of descriptions")
+    args = parser.parse_args()
+
+    descs = generate_descriptions(args.count)
+    backends = ["json"]
+    if serialization.orjson is not None:
+        backends.insert(0, "orjson")
+    else:
+        print("orjson is not installed, pip install orjson to compare")
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in backends:
+            bench_backend(name, descs, workdir)
+
+
+if __name__ == "__main__":
+    main()
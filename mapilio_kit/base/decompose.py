@@ -1,8 +1,19 @@
 import argparse
+import contextlib
+import os
+import sqlite3
+import typing as T
+
+from mapilio_kit.components.logs import image_log
+from mapilio_kit.components.logs.checkpoint import DecomposeCheckpoint
+from mapilio_kit.components.logs.file_inventory import FileInventory
 from mapilio_kit.components.utilities.insert_MAPJson import insert_MAPJson
 from mapilio_kit.components.geotagging.geotag_property_handler import geotag_property_handler
 from mapilio_kit.components.metadata.metadata_property_handler import metadata_property_handler
 from mapilio_kit.components.processing.sequence_property_handler import sequence_property_handler
+from mapilio_kit.components.logger import MapilioLogger
+
+LOG = MapilioLogger().get_logger()
 
 
 class Decompose():
@@ -54,6 +65,14 @@ class Decompose():
             default=False,
             required=False,
         )
+        group.add_argument(
+            "--exif_overlay",
+            help="Keep the images untouched: record the EXIF tags to overwrite in the image descriptions "
+                 "and apply them only to the copies of the images zipped for upload.",
+            action="store_true",
+            default=False,
+            required=False,
+        )
 
         group_metadata = parser.add_argument_group("decompose metadata options")
         group_metadata.add_argument(
@@ -123,6 +142,22 @@ class Decompose():
             default=None,
             required=False,
         )
+        group_metadata.add_argument(
+            "--use_exiftool",
+            help="Read the camera features (field of view, roll, pitch, yaw, ...) of the images with exiftool "
+                 "instead of the built-in Exif and XMP reader.",
+            action="store_true",
+            default=False,
+            required=False,
+        )
+        group_metadata.add_argument(
+            "--exiftool_pool_size",
+            help="Number of exiftool processes kept running to read image metadata with --use_exiftool. "
+                 "Default is the number of CPUs, at most 4.",
+            type=int,
+            default=None,
+            required=False,
+        )
         group_metadata.add_argument(
             "--custom_meta_data",
             help='Add custom meta data to all images. Required format of input is a string, consisting of '
@@ -141,6 +176,23 @@ class Decompose():
             default=None,
             required=False,
         )
+        group_geotagging.add_argument(
+            "--desc_format",
+            help="Format of the image description file: a single JSON array (json), or one JSON description "
+                 "per line (ndjson), which is not a JSON document and should get a .ndjson --desc_path. "
+                 "Default is json.",
+            choices=["json", "ndjson"],
+            default="json",
+            required=False,
+        )
+        group_geotagging.add_argument(
+            "--normalize_descriptions",
+            help="Write the camera fields shared by the images (device make and model, image size, fov, ...) "
+                 "once per camera profile in the image description file, instead of in every description.",
+            action="store_true",
+            default=False,
+            required=False,
+        )
         group_geotagging.add_argument(
             "--geotag_source",
             help="Provide the source of date/time and GPS information needed for geotagging",
@@ -200,18 +252,83 @@ class Decompose():
             required=False,
         )
 
+        group_performance = parser.add_argument_group("decompose performance options")
+        group_performance.add_argument(
+            "--workers",
+            help="Number of processes used to extract image metadata and EXIF geotags, "
+                 "to build the sequences of the image folders and to detect their anomalies. "
+                 "Default is to run in the current process.",
+            type=int,
+            default=None,
+            required=False,
+        )
+        group_performance.add_argument(
+            "--resume",
+            help="Continue an interrupted decompose from the checkpoint kept in the import path, "
+                 "skipping the images already processed.",
+            action="store_true",
+            default=False,
+            required=False,
+        )
+        group_performance.add_argument(
+            "--incremental",
+            help="Keep the checkpoint and the image description file between runs, process only the images "
+                 "added or changed since the last run and upload only the sequences not uploaded yet.",
+            action="store_true",
+            default=False,
+            required=False,
+        )
+        group_performance.add_argument(
+            "--state_spill_dir",
+            help="Keep the per image processing state in files in this directory instead of memory, "
+                 "for very large imports.",
+            default=None,
+            required=False,
+        )
+
     def filter_args(self, func, args):
         return {k: v for k, v in args.items() if k in func.__code__.co_varnames}
 
-    def perform_task(self, vars_args: dict):
-        metadata_property_handler_args = self.filter_args(metadata_property_handler, vars_args)
-        metadata_property_handler(**metadata_property_handler_args)
+    @contextlib.contextmanager
+    def session(self, vars_args: dict) -> T.Iterator[T.Optional[DecomposeCheckpoint]]:
+        """
+        Shared file inventory and checkpoint of a decompose run, set in vars_args for the stages.
+        The checkpoint is only kept in the import path with --resume or --incremental.
+        """
+        if vars_args.get("state_spill_dir"):
+            image_log.reset_state(vars_args["state_spill_dir"])
 
-        geotag_property_handler_args = self.filter_args(geotag_property_handler, vars_args)
-        geotag_property_handler(**geotag_property_handler_args)
+        import_path = vars_args.get("import_path")
+        checkpoint = None
+        if import_path and os.path.isdir(import_path):
+            # listed once and shared by all the stages, and by the upload that follows
+            vars_args["file_inventory"] = FileInventory.scan(import_path, vars_args.get("skip_subfolders", False))
+            # an incremental run resumes from the previous one and only processes what is new
+            vars_args["resume"] = vars_args.get("resume", False) or vars_args.get("incremental", False)
+        if import_path and os.path.isdir(import_path) and vars_args.get("resume"):
+            try:
+                checkpoint = DecomposeCheckpoint.open(
+                    import_path, resume=True, file_inventory=vars_args["file_inventory"]
+                )
+            except (sqlite3.Error, OSError) as ex:
+                # e.g. a read-only import path, the run goes on without resuming
+                LOG.warning(f"Unable to open the checkpoint in {import_path}, continuing without it: {ex}")
+                vars_args["resume"] = False
+            else:
+                image_log.restore_checkpoint(checkpoint)
+                vars_args["stale_images"] = checkpoint.stale_images
+                image_log.attach_checkpoint(checkpoint)
 
-        sequence_property_handler_args = self.filter_args(sequence_property_handler, vars_args)
-        sequence_property_handler(**sequence_property_handler_args)
+        try:
+            yield checkpoint
+        finally:
+            if checkpoint is not None:
+                image_log.attach_checkpoint(None)
+                checkpoint.close()
 
-        insert_MAPJson_args = self.filter_args(insert_MAPJson, vars_args)
-        insert_MAPJson(**insert_MAPJson_args)
+    def perform_task(self, vars_args: dict):
+        with self.session(vars_args) as checkpoint:
+            for stage in (metadata_property_handler, geotag_property_handler, sequence_property_handler, insert_MAPJson):
+                stage(**self.filter_args(stage, vars_args))
+                if checkpoint is not None:
+                    checkpoint.commit()
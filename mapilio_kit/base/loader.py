@@ -1,4 +1,7 @@
 import argparse
+import os
+
+from mapilio_kit.components.upload.pipeline import DEFAULT_QUEUE_SIZE, upload_pipeline
 from mapilio_kit.components.upload.upload import upload
 class Upload:
     name = "upload"
@@ -46,6 +49,37 @@ class Upload:
             default=False,
             required=False,
         )
+        group.add_argument(
+            "--upload_concurrency",
+            help="Number of sequences zipped and uploaded at once. Default is 1, one sequence at a time.",
+            type=int,
+            default=None,
+            required=False,
+        )
+        group.add_argument(
+            "--stream_upload",
+            help="Upload the archive of each sequence while it is produced, without a temporary zip file. "
+                 "Sequences with images to modify or compress are zipped to a temporary file as before.",
+            action="store_true",
+            default=False,
+            required=False,
+        )
+        group.add_argument(
+            "--pipeline",
+            help="Zip and upload the sequences of each image folder as soon as the folder is decomposed, "
+                 "while the next folders are decomposed.",
+            action="store_true",
+            default=False,
+            required=False,
+        )
+        group.add_argument(
+            "--pipeline_queue_size",
+            help="Number of sequences waiting to be zipped, and zipped sequences waiting to be uploaded, "
+                 f"with --pipeline. Default is {DEFAULT_QUEUE_SIZE}.",
+            type=int,
+            default=DEFAULT_QUEUE_SIZE,
+            required=False,
+        )
         group.add_argument(
             "--exiftool_path",
             help="Path to your exiftool executable",
@@ -57,6 +91,11 @@ class Upload:
     def filter_args(self, args):
         return {k: v for k, v in args.items() if k in upload.__code__.co_varnames}
     def perform_task(self, vars_args: dict):
+        if vars_args.get('pipeline') and not vars_args['processed'] and os.path.isdir(vars_args['import_path']):
+            from . import decomposer
+            with decomposer().session(vars_args) as checkpoint:
+                return upload_pipeline(vars_args, checkpoint)
+
         if not vars_args['processed']:
             from . import decomposer
             decomposer().perform_task(vars_args)
@@ -1,11 +1,11 @@
 import os
-import json
 import getpass
 import subprocess
 from mapilio_kit.components.auth.login import list_all_users
 from mapilio_kit.components.upload.upload import upload, zip_images
 from mapilio_kit.components.utilities.edit_config import edit_config
 from mapilio_kit.components.processing.process_csv_to_description import process_csv_to_description
+from mapilio_kit.components.utilities.image_description_file import iter_image_descriptions
 
 
 class Run:
@@ -68,16 +68,20 @@ class Run:
             args["import_path"] = import_path
             target_path = os.path.join(import_path, "mapilio_image_description.json")
             if os.path.exists(target_path):
+                information = None
+                number_of_images = 0
                 with open(target_path, "r") as f:
-                    json_data = f.read()
-                data = json.loads(json_data)
+                    for item in iter_image_descriptions(f):
+                        if 'Information' in item:
+                            information = information or item['Information']
+                        else:
+                            number_of_images += 1
 
-                info_key_exists = any('Information' in item for item in data)
+                info_key_exists = information is not None
 
-                total_images = next((item['Information']['total_images'] for item in data if 'Information' in item),
-                                    None)
+                total_images = information['total_images'] if information is not None else None
 
-                correct_number_of_dicts = len(data) - 1 == total_images
+                correct_number_of_dicts = number_of_images == total_images
                 if info_key_exists and correct_number_of_dicts:
                     args["processed"] = True
                 else:
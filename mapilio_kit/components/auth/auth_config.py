@@ -1,10 +1,11 @@
 import requests
 from typing import Union
 from mapilio_kit.components.utilities.config import MAPILIO_API_ENDPOINT
+from mapilio_kit.components.utilities.http_session import get_session
 
 
 def get_upload_token(email: str, password: str) -> dict:
-    resp = requests.post(
+    resp = get_session().post(
         f"{MAPILIO_API_ENDPOINT}login",
         json={"email": email, "password": password},
     )
@@ -16,7 +17,7 @@ def get_upload_token(email: str, password: str) -> dict:
 def fetch_organization(
         user_access_token: str, organization_id: Union[int, str]
 ) -> requests.Response:
-    resp = requests.get(
+    resp = get_session().get(
         f"{MAPILIO_API_ENDPOINT}{organization_id}",
         params={
             "fields": ",".join(["slug", "description", "name"]),
@@ -2,6 +2,7 @@ import os
 import typing as T
 
 from mapilio_kit.components.logs import image_log
+from mapilio_kit.components.logs.file_inventory import FileInventory, get_file_inventory
 from mapilio_kit.components.processing import processing
 
 
@@ -13,21 +14,51 @@ def geotag_property_handler(
     offset_time=0.0,
     offset_angle=0.0,
     skip_subfolders=False,
+    workers: T.Optional[int] = None,
+    file_inventory: T.Optional[FileInventory] = None,
+    resume=False,
 ) -> None:
     if not import_path or not os.path.isdir(import_path):
         raise RuntimeError(
             f"Error, import directory {import_path} does not exist, exiting..."
         )
 
-    process_file_list = image_log.get_total_file_list(
-        import_path,
-        skip_subfolders=skip_subfolders,
+    file_inventory = get_file_inventory(import_path, skip_subfolders, file_inventory)
+    process_file_list = file_inventory.get_images(import_path, skip_subfolders)
+    if resume:
+        process_file_list = [
+            image for image in process_file_list if not image_log.is_logged(image, "geotag_process")
+        ]
+    return geotag_images(
+        process_file_list,
+        video_import_path=video_import_path,
+        geotag_source=geotag_source,
+        geotag_source_path=geotag_source_path,
+        offset_time=offset_time,
+        offset_angle=offset_angle,
+        workers=workers,
+        file_inventory=file_inventory,
     )
+
+
+def geotag_images(
+    process_file_list: T.List[str],
+    video_import_path: T.Optional[str] = None,
+    geotag_source="exif",
+    geotag_source_path: T.Optional[str] = None,
+    offset_time=0.0,
+    offset_angle=0.0,
+    workers: T.Optional[int] = None,
+    file_inventory: T.Optional[FileInventory] = None,
+) -> None:
+    """
+    Geotag the images from the geotag source and log the results
+    """
     if not process_file_list:
         return
 
     if geotag_source == "exif":
-        return processing.geotag_from_exif(process_file_list, offset_time, offset_angle)
+        return processing.geotag_from_exif(process_file_list, offset_time, offset_angle, workers)
 
     elif geotag_source == "gpx":
         if geotag_source_path is None:
@@ -61,6 +92,7 @@ def geotag_property_handler(
             geotag_source_path,
             offset_time=offset_time,
             offset_angle=offset_angle,
+            file_inventory=file_inventory,
         )
     else:
         raise RuntimeError(f"Invalid geotag source {geotag_source}")
@@ -1,10 +1,10 @@
 from mapilio_kit.components.utilities.types_fmt import GPXPoint, GPXPointAngle
-from mapilio_kit.components.metadata.exif_metadata_reader import ExifRead
+from mapilio_kit.components.metadata.image_metadata_cache import read_exif
 from mapilio_kit.components.utilities.error import MapilioGeoTaggingError
 
 
 def gpx_from_exif(image: str) -> GPXPointAngle:
-    exif = ExifRead(image)
+    exif = read_exif(image)
 
     lon, lat = exif.calc_lon_lat()
     if lat is None or lon is None:
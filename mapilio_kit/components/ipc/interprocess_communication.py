@@ -1,9 +1,9 @@
-import json
 import logging
 import os
 import struct
 
 from mapilio_kit.components.logger import MapilioLogger
+from mapilio_kit.components.utilities import serialization
 
 # Configure logging
 LOG = MapilioLogger().get_logger()
@@ -11,27 +11,28 @@ LOG = MapilioLogger().get_logger()
 # Get the NODE_CHANNEL_FD environment variable with a default of -1 if not set
 NODE_CHANNEL_FD = int(os.getenv("NODE_CHANNEL_FD", -1))
 
+_LINESEP = os.linesep.encode("utf-8")
+
 
 def _write(obj):
     """
     Write a JSON-serializable object to a file descriptor if NODE_CHANNEL_FD is valid.
     """
-    # Serialize the object to a JSON string
-    data = json.dumps(obj, separators=(",", ":")) + os.linesep
-
     # Check if NODE_CHANNEL_FD is valid
     if NODE_CHANNEL_FD == -1:
         # Do nothing if NODE_CHANNEL_FD is not set
         return
 
+    # Serialize the object to compact UTF-8 JSON
+    buf = serialization.dumps(obj) + _LINESEP
+
     if os.name == "nt":
         # On Windows, add a header before sending the data
-        buf = data.encode("utf-8")
         header = struct.pack("<Q", 1) + struct.pack("<Q", len(buf))
         os.write(NODE_CHANNEL_FD, header + buf)
     else:
         # On Unix-like systems, write the data directly
-        os.write(NODE_CHANNEL_FD, data.encode("utf-8"))
+        os.write(NODE_CHANNEL_FD, buf)
 
 
 def send_message(message_type, payload):
@@ -0,0 +1,185 @@
+import json
+import os
+import sqlite3
+import time
+import typing as T
+
+from mapilio_kit.components.logs.file_inventory import FileInventory, FileStat
+from mapilio_kit.components.logger import MapilioLogger
+
+LOG = MapilioLogger().get_logger()
+
+CHECKPOINT_FILENAME = ".mapilio_checkpoint.sqlite3"
+# pending rows are committed after this many rows or seconds, whichever comes first
+COMMIT_ROWS = 1000
+COMMIT_SECONDS = 2.0
+# logged after insert_MAPJson has overwritten the EXIF of the image, which changes its size and mtime
+FINAL_PROCESS = "mapilio_image_description"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    image TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS states (
+    image TEXT NOT NULL,
+    process TEXT NOT NULL,
+    status TEXT NOT NULL,
+    description TEXT NOT NULL,
+    PRIMARY KEY (image, process)
+);
+CREATE TABLE IF NOT EXISTS uploaded_images (
+    image TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+
+def checkpoint_path(import_path: str) -> str:
+    return os.path.join(import_path, CHECKPOINT_FILENAME)
+
+
+class DecomposeCheckpoint:
+    """
+    Per image and per process results of decompose, persisted to a SQLite database in the import path
+    as they are logged, so an interrupted run can be resumed with --resume.
+
+    Each image is recorded by its path relative to the import path with its size and mtime; on resume
+    the results of images that changed since are ignored and processed again. Uploaded images are
+    recorded the same way, so an incremental upload only sends the images that are new or changed.
+    """
+
+    def __init__(self, import_path: str, file_inventory: T.Optional[FileInventory] = None):
+        self.import_path = import_path
+        self.path = checkpoint_path(import_path)
+        self.file_inventory = file_inventory
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._fingerprints: T.Dict[str, FileStat] = {}
+        # recorded images that were removed or changed since, known after restore()
+        self.stale_images: T.List[str] = []
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    @classmethod
+    def open(
+        cls,
+        import_path: str,
+        resume: bool = False,
+        file_inventory: T.Optional[FileInventory] = None,
+    ) -> "DecomposeCheckpoint":
+        """
+        The checkpoint of the import path, emptied unless resuming
+        """
+        checkpoint = cls(import_path, file_inventory)
+        if not resume:
+            checkpoint.clear()
+        return checkpoint
+
+    def _fingerprint(self, image: str, refresh: bool = False) -> T.Optional[FileStat]:
+        if not refresh and image in self._fingerprints:
+            return self._fingerprints[image]
+        stat = None if refresh or self.file_inventory is None else self.file_inventory.stat(image)
+        if stat is None:
+            try:
+                st = os.stat(image)
+            except OSError:
+                return None
+            stat = FileStat(st.st_size, st.st_mtime_ns)
+        self._fingerprints[image] = stat
+        return stat
+
+    def record(self, image: str, process: str, status: str, description: T.Mapping) -> None:
+        fingerprint = self._fingerprint(image, refresh=process == FINAL_PROCESS)
+        if fingerprint is None:
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files (image, size, mtime_ns) VALUES (?, ?, ?)",
+            (self._relpath(image), fingerprint.size, fingerprint.mtime_ns),
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO states (image, process, status, description) VALUES (?, ?, ?, ?)",
+            (self._relpath(image), process, status, json.dumps(description, default=repr)),
+        )
+        self._pending += 1
+        if COMMIT_ROWS <= self._pending or COMMIT_SECONDS <= time.monotonic() - self._last_commit:
+            self.commit()
+
+    def restore(self) -> T.Iterator[T.Tuple[str, str, str, T.Dict]]:
+        """
+        (image, process, status, description) of the recorded images that have not changed since
+        """
+        unchanged = set()
+        stale = []
+        for relpath, size, mtime_ns in self._conn.execute("SELECT image, size, mtime_ns FROM files").fetchall():
+            if self._fingerprint(self._image(relpath)) == FileStat(size, mtime_ns):
+                unchanged.add(relpath)
+            else:
+                stale.append(relpath)
+
+        # changed images are recorded again once processed
+        self._conn.executemany("DELETE FROM states WHERE image = ?", [(relpath,) for relpath in stale])
+        self._conn.executemany("DELETE FROM files WHERE image = ?", [(relpath,) for relpath in stale])
+        self.commit()
+        self.stale_images = [self._image(relpath) for relpath in stale]
+
+        restored = 0
+        for relpath, process, status, description in self._conn.execute(
+            "SELECT image, process, status, description FROM states ORDER BY rowid"
+        ):
+            if relpath in unchanged:
+                restored += 1
+                yield self._image(relpath), process, status, json.loads(description)
+        LOG.info(
+            f"Resuming from checkpoint {self.path}: {len(unchanged)} images, {restored} results, "
+            f"{len(stale)} removed or changed images"
+        )
+
+    def _relpath(self, image: str) -> str:
+        # "/" separated, so the checkpoint can be resumed from any spelling of the import path
+        return os.path.relpath(image, self.import_path).replace(os.sep, "/")
+
+    def _image(self, relpath: str) -> str:
+        return os.path.join(self.import_path, relpath.replace("/", os.sep))
+
+    def commit(self) -> None:
+        self._conn.commit()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def uploaded_images(self) -> T.Set[str]:
+        """
+        Normalized paths of the uploaded images that have not changed since
+        """
+        uploaded = set()
+        for relpath, size, mtime_ns in self._conn.execute("SELECT image, size, mtime_ns FROM uploaded_images"):
+            image = self._image(relpath)
+            if self._fingerprint(image, refresh=True) == FileStat(size, mtime_ns):
+                uploaded.add(os.path.normpath(image))
+        return uploaded
+
+    def mark_uploaded(self, images: T.Iterable[str]) -> None:
+        rows = []
+        for image in images:
+            # as uploaded, after insert_MAPJson has overwritten its EXIF
+            fingerprint = self._fingerprint(image, refresh=True)
+            if fingerprint is not None:
+                rows.append((self._relpath(image), fingerprint.size, fingerprint.mtime_ns))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO uploaded_images (image, size, mtime_ns) VALUES (?, ?, ?)", rows
+        )
+        self.commit()
+
+    def clear(self) -> None:
+        self._conn.execute("DELETE FROM states")
+        self._conn.execute("DELETE FROM files")
+        self._conn.execute("DELETE FROM uploaded_images")
+        self.commit()
+
+    def close(self) -> None:
+        self.commit()
+        self._conn.close()
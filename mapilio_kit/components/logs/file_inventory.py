@@ -0,0 +1,141 @@
+import os
+import typing as T
+
+from mapilio_kit.components.logs import image_log
+
+
+class FileStat(T.NamedTuple):
+    size: int
+    mtime_ns: int
+
+
+class FileInventory:
+    """
+    Images and videos under an import path, listed once per run with os.scandir together with their stat results,
+    so the decompose and upload stages do not walk the directory tree again.
+
+    Listing rules are the ones of image_log.iterate_files: hidden subfolders are skipped and
+    paths are joined the same way, so the lists equal image_log.get_total_file_list and get_video_file_list.
+    """
+
+    def __init__(self, root: str, skip_subfolders: bool = False):
+        self.root = root
+        self.skip_subfolders = skip_subfolders
+        self._stats: T.Dict[str, FileStat] = {}
+        # normalized directory -> images / videos directly inside it
+        self._images: T.Dict[str, T.List[str]] = {}
+        self._videos: T.Dict[str, T.List[str]] = {}
+
+    @classmethod
+    def scan(cls, root: str, skip_subfolders: bool = False) -> "FileInventory":
+        inventory = cls(root, skip_subfolders)
+        inventory._scan_dir(root)
+        return inventory
+
+    def _scan_dir(self, dirpath: str) -> None:
+        subdirs = []
+        images = []
+        videos = []
+        with os.scandir(dirpath) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    # os.walk does not follow symlinked folders either
+                    if not self.skip_subfolders and not entry.name.startswith(".") and not entry.is_symlink():
+                        subdirs.append(entry.path)
+                    continue
+                if image_log.is_image_file(entry.name):
+                    images.append(entry.path)
+                elif image_log.is_video_file(entry.name):
+                    videos.append(entry.path)
+                else:
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                self._stats[os.path.normpath(entry.path)] = FileStat(st.st_size, st.st_mtime_ns)
+
+        key = os.path.normpath(dirpath)
+        if images:
+            self._images[key] = images
+        if videos:
+            self._videos[key] = videos
+        for subdir in subdirs:
+            self._scan_dir(subdir)
+
+    def covers(self, path: str, skip_subfolders: bool = False) -> bool:
+        """
+        Whether the files under path (and its subfolders unless skip_subfolders) are all in the inventory
+        """
+        root = os.path.normpath(self.root)
+        path = os.path.normpath(path)
+        if path == root:
+            return skip_subfolders or not self.skip_subfolders
+        if self.skip_subfolders or not path.startswith(root + os.sep):
+            return False
+        return not any(part.startswith(".") for part in os.path.relpath(path, root).split(os.sep))
+
+    def _files_under(self, files: T.Dict[str, T.List[str]], path: str, skip_subfolders: bool) -> T.List[str]:
+        path = os.path.normpath(path)
+        if skip_subfolders:
+            return sorted(files.get(path, []))
+        prefix = path.rstrip(os.sep) + os.sep
+        return sorted(
+            file
+            for dirpath, dir_files in files.items()
+            if dirpath == path or dirpath.startswith(prefix)
+            for file in dir_files
+        )
+
+    def get_images(self, path: T.Optional[str] = None, skip_subfolders: T.Optional[bool] = None) -> T.List[str]:
+        """
+        Sorted images under path, the import path by default
+        """
+        if skip_subfolders is None:
+            skip_subfolders = self.skip_subfolders
+        return self._files_under(self._images, self.root if path is None else path, skip_subfolders)
+
+    def get_videos(self, path: T.Optional[str] = None, skip_subfolders: T.Optional[bool] = None) -> T.List[str]:
+        """
+        Sorted videos under path, the import path by default
+        """
+        if skip_subfolders is None:
+            skip_subfolders = self.skip_subfolders
+        return self._files_under(self._videos, self.root if path is None else path, skip_subfolders)
+
+    def get_image_directories(self) -> T.List[T.Tuple[str, T.List[str]]]:
+        """
+        (directory, sorted images directly inside it) of every directory with images
+        """
+        return [(dirpath, sorted(self._images[dirpath])) for dirpath in sorted(self._images)]
+
+    def stat(self, path: str) -> T.Optional[FileStat]:
+        return self._stats.get(os.path.normpath(path))
+
+    def isfile(self, path: str) -> bool:
+        """
+        Same as os.path.isfile for the files the inventory covers, without touching the disk
+        """
+        if self.stat(path) is not None:
+            return True
+        listed = image_log.is_image_file(path) or image_log.is_video_file(path)
+        if listed and self.covers(os.path.dirname(path) or os.curdir, skip_subfolders=True):
+            return False
+        return os.path.isfile(path)
+
+
+def get_file_inventory(
+    import_path: str,
+    skip_subfolders: bool = False,
+    file_inventory: T.Optional[FileInventory] = None,
+) -> FileInventory:
+    """
+    The inventory shared by the stages of this run if it covers import_path, otherwise a new scan of import_path
+    """
+    if file_inventory is not None and file_inventory.covers(import_path, skip_subfolders):
+        return file_inventory
+    return FileInventory.scan(import_path, skip_subfolders)
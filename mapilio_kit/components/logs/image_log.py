@@ -2,8 +2,12 @@ import os
 import typing as T
 from typing import Generator, List, Optional
 
+from mapilio_kit.components.logs.image_state import ImageStateStore
 from mapilio_kit.components.utilities import types_fmt as types
 
+if T.TYPE_CHECKING:
+    from mapilio_kit.components.logs.checkpoint import DecomposeCheckpoint
+
 
 def is_image_file(path: str) -> bool:
     basename, ext = os.path.splitext(os.path.basename(path))
@@ -35,7 +39,33 @@ def get_total_file_list(import_path: str, skip_subfolders: bool = False) -> List
     return sorted(file for file in files if is_image_file(file))
 
 
-_IMAGE_STATE: T.Dict[str, T.Dict[types.Process, T.Tuple[types.Status, T.Mapping]]] = {}
+_IMAGE_STATE = ImageStateStore()
+_CHECKPOINT: T.Optional["DecomposeCheckpoint"] = None
+
+
+def reset_state(spill_dir: T.Optional[str] = None) -> None:
+    """
+    Forget the logged state of all images. With spill_dir the new state is kept in files in that directory.
+    """
+    global _IMAGE_STATE
+    _IMAGE_STATE.clear()
+    _IMAGE_STATE = ImageStateStore(spill_dir)
+
+
+def attach_checkpoint(checkpoint: T.Optional["DecomposeCheckpoint"]) -> None:
+    """
+    Persist every state logged from now on to the checkpoint, None to stop
+    """
+    global _CHECKPOINT
+    _CHECKPOINT = checkpoint
+
+
+def restore_checkpoint(checkpoint: "DecomposeCheckpoint") -> None:
+    """
+    Load the states recorded in the checkpoint for the images that have not changed since
+    """
+    for image, process, status, description in checkpoint.restore():
+        _IMAGE_STATE.set(image, process, status, description)
 
 
 def _create_and_log_process_in_memory(
@@ -44,7 +74,9 @@ def _create_and_log_process_in_memory(
     status: types.Status,
     description: T.Mapping,
 ) -> None:
-    _IMAGE_STATE.setdefault(image, {})[process] = (status, description)
+    _IMAGE_STATE.set(image, process, status, description)
+    if _CHECKPOINT is not None:
+        _CHECKPOINT.record(image, process, status, description)
 
 
 def log_failed_in_memory(image: str, process: types.Process, exc: Exception):
@@ -62,10 +94,11 @@ def log_in_memory(image: str, process: types.Process, desc: T.Mapping):
     return _create_and_log_process_in_memory(image, process, "success", desc)
 
 
+def is_logged(image: str, process: types.Process) -> bool:
+    return _IMAGE_STATE.has(image, process)
+
+
 def read_process_data_from_memory(
     image: str, process: types.Process
 ) -> Optional[T.Tuple[types.Status, T.Mapping]]:
-    state = _IMAGE_STATE.get(image)
-    if state is None:
-        return None
-    return state.get(process)
+    return T.cast(T.Optional[T.Tuple[types.Status, T.Mapping]], _IMAGE_STATE.get(image, process))
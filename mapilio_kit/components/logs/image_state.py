@@ -0,0 +1,232 @@
+import array
+import os
+import struct
+import tempfile
+import typing as T
+
+STATUSES: T.Tuple[str, ...] = ("success", "failed")
+
+# value kinds of a column and the array typecode holding them
+_KIND_TYPECODES = {
+    "float": "d",
+    "int": "q",
+    "bool": "b",
+    # id in the string table
+    "str": "q",
+}
+_INT_MIN, _INT_MAX = -(2 ** 63), 2 ** 63 - 1
+_MISSING = -1
+
+Layout = T.Tuple[T.Tuple[str, str], ...]
+
+
+def _value_kind(value: T.Any) -> T.Optional[str]:
+    """
+    Column kind of a value, "none" for None and None when the value has no column
+    """
+    if value is None:
+        return "none"
+    # bool before int, it is a subclass of it
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int" if _INT_MIN <= value <= _INT_MAX else None
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    return None
+
+
+class _Column:
+    """
+    One typed value per image id, in memory or in a spill file
+    """
+
+    def __init__(self, typecode: str, spill_dir: T.Optional[str] = None):
+        self.typecode = typecode
+        self.itemsize = array.array(typecode).itemsize
+        self._values = array.array(typecode)
+        self._file: T.Optional[T.BinaryIO] = None
+        if spill_dir is not None:
+            self._file = T.cast(T.BinaryIO, tempfile.TemporaryFile(dir=spill_dir, prefix="mapilio_state_"))
+            self._format = struct.Struct(f"={typecode}")
+
+    def set(self, idx: int, value: T.Any) -> None:
+        if self._file is not None:
+            self._file.seek(idx * self.itemsize)
+            self._file.write(self._format.pack(value))
+            return
+        missing = idx + 1 - len(self._values)
+        if 0 < missing:
+            self._values.frombytes(bytes(missing * self.itemsize))
+        self._values[idx] = value
+
+    def get(self, idx: int) -> T.Any:
+        if self._file is not None:
+            self._file.seek(idx * self.itemsize)
+            return self._format.unpack(self._file.read(self.itemsize))[0]
+        return self._values[idx]
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _ProcessState:
+    """
+    Status and description of one process for all images: a status code and a layout id per image,
+    and one column per (key, kind) of the descriptions
+    """
+
+    def __init__(self):
+        self.statuses = array.array("b")
+        self.layouts = array.array("l")
+        self.columns: T.Dict[T.Tuple[str, str], _Column] = {}
+        # descriptions with values the columns do not hold, e.g. exception vars
+        self.objects: T.Dict[int, T.Mapping] = {}
+
+    def ensure(self, idx: int) -> None:
+        missing = idx + 1 - len(self.statuses)
+        if 0 < missing:
+            self.statuses.extend([_MISSING] * missing)
+            self.layouts.extend([_MISSING] * missing)
+
+
+class ImageStateStore:
+    """
+    Per image and per process (status, description) of a decompose run, stored by columns.
+
+    Each image gets an integer id. Description values that are numbers, booleans or strings go into
+    typed arrays, one per field, strings as ids in a table of interned strings. The keys of a description,
+    in order, are stored once as a layout shared by the images, so a description comes back as
+    an equal dict with the same key order. Anything else is kept as is.
+
+    With spill_dir the columns live in temporary files in that directory instead of memory.
+    """
+
+    def __init__(self, spill_dir: T.Optional[str] = None):
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+        self.spill_dir = spill_dir
+        self._ids: T.Dict[str, int] = {}
+        self._images: T.List[str] = []
+        self._strings: T.List[str] = []
+        self._string_ids: T.Dict[str, int] = {}
+        self._layouts: T.List[Layout] = []
+        self._layout_ids: T.Dict[Layout, int] = {}
+        self._processes: T.Dict[str, _ProcessState] = {}
+
+    def image_id(self, image: str) -> int:
+        idx = self._ids.get(image)
+        if idx is None:
+            idx = len(self._images)
+            self._ids[image] = idx
+            self._images.append(image)
+        return idx
+
+    def _string_id(self, value: str) -> int:
+        idx = self._string_ids.get(value)
+        if idx is None:
+            idx = len(self._strings)
+            self._string_ids[value] = idx
+            self._strings.append(value)
+        return idx
+
+    def _layout_id(self, layout: Layout) -> int:
+        idx = self._layout_ids.get(layout)
+        if idx is None:
+            idx = len(self._layouts)
+            self._layout_ids[layout] = idx
+            self._layouts.append(layout)
+        return idx
+
+    def _column(self, state: _ProcessState, key: str, kind: str) -> _Column:
+        column = state.columns.get((key, kind))
+        if column is None:
+            column = _Column(_KIND_TYPECODES[kind], self.spill_dir)
+            state.columns[(key, kind)] = column
+        return column
+
+    def set(self, image: str, process: str, status: str, description: T.Mapping) -> None:
+        idx = self.image_id(image)
+        state = self._processes.get(process)
+        if state is None:
+            state = _ProcessState()
+            self._processes[process] = state
+        state.ensure(idx)
+        state.statuses[idx] = STATUSES.index(status)
+
+        kinds = [_value_kind(value) for value in description.values()]
+        if not all(isinstance(key, str) for key in description) or None in kinds:
+            state.layouts[idx] = _MISSING
+            state.objects[idx] = description
+            return
+        state.objects.pop(idx, None)
+
+        layout = tuple(zip(description.keys(), T.cast(T.List[str], kinds)))
+        state.layouts[idx] = self._layout_id(layout)
+        for (key, kind), value in zip(layout, description.values()):
+            if kind == "none":
+                continue
+            if kind == "str":
+                value = self._string_id(value)
+            self._column(state, key, kind).set(idx, value)
+
+    def has(self, image: str, process: str) -> bool:
+        idx = self._ids.get(image)
+        state = self._processes.get(process)
+        if idx is None or state is None or len(state.statuses) <= idx:
+            return False
+        return state.statuses[idx] != _MISSING
+
+    def get(self, image: str, process: str) -> T.Optional[T.Tuple[str, T.Mapping]]:
+        idx = self._ids.get(image)
+        state = self._processes.get(process)
+        if idx is None or state is None or len(state.statuses) <= idx:
+            return None
+        status = state.statuses[idx]
+        if status == _MISSING:
+            return None
+
+        layout_id = state.layouts[idx]
+        if layout_id == _MISSING:
+            return STATUSES[status], state.objects[idx]
+
+        description: T.Dict[str, T.Any] = {}
+        for key, kind in self._layouts[layout_id]:
+            if kind == "none":
+                description[key] = None
+                continue
+            value = state.columns[(key, kind)].get(idx)
+            if kind == "str":
+                value = self._strings[value]
+            elif kind == "bool":
+                value = bool(value)
+            description[key] = value
+        return STATUSES[status], description
+
+    def images(self) -> T.List[str]:
+        """
+        Images with a logged state, in the order they were first logged
+        """
+        return list(self._images)
+
+    def processes(self) -> T.List[str]:
+        return list(self._processes)
+
+    def clear(self) -> None:
+        for state in self._processes.values():
+            for column in state.columns.values():
+                column.close()
+        self._ids.clear()
+        self._images.clear()
+        self._strings.clear()
+        self._string_ids.clear()
+        self._layouts.clear()
+        self._layout_ids.clear()
+        self._processes.clear()
+
+    def __len__(self) -> int:
+        return len(self._images)
@@ -0,0 +1,215 @@
+import io
+import struct
+import typing as T
+
+from exifread.classes import IfdTag
+from exifread.tags import EXIF_TAGS, FIELD_TYPES
+from exifread.tags.exif import GPS_TAGS
+from exifread.utils import Ratio
+
+EXIF_IFD_POINTER = 0x8769
+GPS_IFD_POINTER = 0x8825
+
+# an IFD with more entries than this is not something a camera wrote
+MAX_IFD_ENTRIES = 1024
+JPEG_EXIF_HEADER = b"Exif\x00\x00"
+
+
+class UnsupportedExifError(ValueError):
+    """
+    The file is not laid out the way the fast reader expects, read it with exifread instead
+    """
+
+
+class _TiffReader:
+    """
+    Reads a TIFF structure from a byte buffer (the APP1 payload of a JPEG) or from a file
+    (a TIFF image), fetching only the bytes it is asked for
+    """
+
+    def __init__(self, read: T.Callable[[int, int], bytes]):
+        self._read = read
+        header = read(0, 8)
+        if header[:4] == b"II*\x00":
+            self.endian = "<"
+        elif header[:4] == b"MM\x00*":
+            self.endian = ">"
+        else:
+            raise UnsupportedExifError("Invalid TIFF header")
+        self.first_ifd = self.unpack("L", header[4:8])
+
+    def unpack(self, fmt: str, data: bytes) -> T.Any:
+        return struct.unpack(self.endian + fmt, data)[0]
+
+    def read(self, offset: int, length: int) -> bytes:
+        data = self._read(offset, length)
+        if len(data) != length:
+            raise UnsupportedExifError(f"Unexpected end of data at offset {offset}")
+        return data
+
+    def entries(self, ifd: int) -> T.Iterator[T.Tuple[int, int, int, int]]:
+        """
+        (tag, field type, count, entry offset) of each entry of the IFD
+        """
+        count = self.unpack("H", self.read(ifd, 2))
+        if MAX_IFD_ENTRIES < count:
+            raise UnsupportedExifError(f"Too many entries in IFD at offset {ifd}")
+        data = self.read(ifd + 2, 12 * count)
+        for idx in range(count):
+            entry = data[12 * idx: 12 * idx + 12]
+            tag = self.unpack("H", entry[0:2])
+            field_type = self.unpack("H", entry[2:4])
+            value_count = self.unpack("L", entry[4:8])
+            yield tag, field_type, value_count, ifd + 2 + 12 * idx + 8
+
+    def values(self, field_type: int, count: int, value_offset: int) -> T.Any:
+        """
+        Decode the values of an entry the same way exifread does
+        """
+        type_length = FIELD_TYPES[field_type][0]
+        if count * type_length > 4:
+            value_offset = self.unpack("L", self.read(value_offset, 4))
+
+        if field_type == 2:
+            if count == 0:
+                return ""
+            values = self.read(value_offset, count).split(b"\x00", 1)[0]
+            try:
+                return values.decode("utf-8")
+            except UnicodeDecodeError:
+                return values
+
+        if 1000 <= count:
+            return []
+
+        data = self.read(value_offset, count * type_length)
+        signed = field_type in (6, 8, 9, 10)
+        if field_type in (5, 10):
+            fmt = "l" if signed else "L"
+            return [
+                Ratio(
+                    self.unpack(fmt, data[idx: idx + 4]),
+                    self.unpack(fmt, data[idx + 4: idx + 8]),
+                )
+                for idx in range(0, len(data), 8)
+            ]
+        if field_type in (11, 12):
+            fmt = "f" if field_type == 11 else "d"
+            return [
+                struct.unpack(self.endian + fmt, data[idx: idx + type_length])
+                for idx in range(0, len(data), type_length)
+            ]
+        fmt = {1: "B", 2: "H", 4: "L"}[type_length]
+        if signed:
+            fmt = fmt.lower()
+        return [
+            self.unpack(fmt, data[idx: idx + type_length])
+            for idx in range(0, len(data), type_length)
+        ]
+
+
+def _dump_ifd(
+    reader: _TiffReader,
+    ifd: int,
+    ifd_name: str,
+    tag_dict: T.Mapping[int, T.Tuple],
+    fields: T.Container[str],
+    tags: T.Dict[str, IfdTag],
+) -> T.Dict[int, int]:
+    """
+    Decode the wanted fields of an IFD into tags, named the way exifread names them.
+    Returns the IFD pointers found in it.
+    """
+    pointers = {}
+    for tag, field_type, count, value_offset in reader.entries(ifd):
+        if tag in (EXIF_IFD_POINTER, GPS_IFD_POINTER):
+            if field_type in (4, 13) and count == 1:
+                pointers[tag] = reader.unpack("L", reader.read(value_offset, 4))
+            continue
+
+        tag_entry = tag_dict.get(tag)
+        tag_name = tag_entry[0] if tag_entry else "Tag 0x%04X" % tag
+        name = f"{ifd_name} {tag_name}"
+        if name not in fields:
+            continue
+        if not 0 < field_type < len(FIELD_TYPES):
+            # exifread skips unknown field types too
+            continue
+
+        values = reader.values(field_type, count, value_offset)
+        printable = str(values[0]) if count == 1 and field_type != 2 else str(values)
+        tags[name] = IfdTag(
+            printable, tag, field_type, values, value_offset, count * FIELD_TYPES[field_type][0]
+        )
+    return pointers
+
+
+def _read_tiff_tags(reader: _TiffReader, fields: T.Container[str]) -> T.Dict[str, IfdTag]:
+    tags: T.Dict[str, IfdTag] = {}
+    pointers = _dump_ifd(reader, reader.first_ifd, "Image", EXIF_TAGS, fields, tags)
+    if EXIF_IFD_POINTER in pointers:
+        _dump_ifd(reader, pointers[EXIF_IFD_POINTER], "EXIF", EXIF_TAGS, fields, tags)
+    if GPS_IFD_POINTER in pointers:
+        _dump_ifd(reader, pointers[GPS_IFD_POINTER], "GPS", GPS_TAGS, fields, tags)
+    return tags
+
+
+def _find_jpeg_exif_segment(fp: T.BinaryIO) -> bytes:
+    """
+    TIFF structure of the first Exif APP1 segment, reading nothing but the segment headers before it
+    """
+    fp.seek(2, io.SEEK_CUR)
+    while True:
+        marker = fp.read(4)
+        if len(marker) != 4 or marker[0] != 0xFF:
+            raise UnsupportedExifError("Invalid JPEG segment")
+        if marker[1] in (0xDA, 0xD9):
+            # image data starts, no Exif in the header
+            raise UnsupportedExifError("No Exif segment found")
+        length = struct.unpack(">H", marker[2:4])[0]
+        if length < 2:
+            raise UnsupportedExifError("Invalid JPEG segment length")
+        if marker[1] == 0xE1:
+            segment = fp.read(length - 2)
+            if segment[:6] == JPEG_EXIF_HEADER:
+                return segment[6:]
+        else:
+            fp.seek(length - 2, io.SEEK_CUR)
+
+
+def read_tiff_bytes_tags(data: bytes, fields: T.Container[str]) -> T.Dict[str, IfdTag]:
+    """
+    Decode the given exifread tag names from an in-memory TIFF structure, e.g. an Exif segment without its header
+    """
+    reader = _TiffReader(lambda offset, length: data[offset: offset + length])
+    try:
+        return _read_tiff_tags(reader, fields)
+    except (struct.error, IndexError, KeyError) as ex:
+        raise UnsupportedExifError(str(ex)) from ex
+
+
+def read_exif_tags(fp: T.BinaryIO, fields: T.Container[str]) -> T.Dict[str, IfdTag]:
+    """
+    Decode only the given exifread tag names (e.g. "GPS GPSLatitude") from a JPEG or TIFF file.
+
+    Raises UnsupportedExifError if the file needs the full exifread parser.
+    """
+    start = fp.tell()
+    magic = fp.read(4)
+    fp.seek(start)
+
+    if magic[:2] == b"\xff\xd8":
+        return read_tiff_bytes_tags(_find_jpeg_exif_segment(fp), fields)
+    elif magic in (b"II*\x00", b"MM\x00*"):
+        def _read_file(offset: int, length: int) -> bytes:
+            fp.seek(start + offset)
+            return fp.read(length)
+
+        reader = _TiffReader(_read_file)
+    else:
+        raise UnsupportedExifError("Neither a JPEG nor a TIFF file")
+
+    try:
+        return _read_tiff_tags(reader, fields)
+    except (struct.error, IndexError, KeyError) as ex:
+        raise UnsupportedExifError(str(ex)) from ex
@@ -1,4 +1,5 @@
 import sys
+import typing as T
 from typing import List, Optional, Tuple, Type, Union, Any
 import datetime
 import os
@@ -7,6 +8,7 @@ import exifread
 
 from calculation.geospatial_utils import normalize_bearing
 from exifread.utils import Ratio
+from mapilio_kit.components.metadata.exif_fast_reader import read_exif_tags, UnsupportedExifError
 
 
 def eval_frac(value: Ratio) -> float:
@@ -72,6 +74,60 @@ def exif_gps_date_fields() -> List[List[str]]:
     return [["GPS GPSDate", "EXIF GPS GPSDate"]]
 
 
+# every tag name looked up by ExifRead, see ExifRead.compact
+EXIF_READ_FIELDS = frozenset(
+    exif_datetime_fields()[0]
+    + [
+        "Image Tag 0x9213",
+        "GPS GPSAltitude",
+        "EXIF GPS GPSAltitude",
+        "GPS GPSAltitudeRef",
+        "EXIF GPS GPSAltitudeRef",
+        "GPS GPSImgDirection",
+        "EXIF GPS GPSImgDirection",
+        "GPS GPSTrack",
+        "EXIF GPS GPSTrack",
+        "GPS GPSDate",
+        "GPS GPSTimeStamp",
+        "GPS GPSLatitude",
+        "GPS GPSLatitudeRef",
+        "GPS GPSLongitude",
+        "GPS GPSLongitudeRef",
+        "EXIF GPS GPSLatitude",
+        "EXIF GPS GPSLatitudeRef",
+        "EXIF GPS GPSLongitude",
+        "EXIF GPS GPSLongitudeRef",
+        "EXIF LensMake",
+        "Image Make",
+        "EXIF LensModel",
+        "Image Model",
+        "Image ImageWidth",
+        "EXIF ExifImageWidth",
+        "Image ImageLength",
+        "EXIF ExifImageLength",
+        "Image Orientation",
+        "Image SubSecTimeOriginal",
+        "EXIF SubSecTimeOriginal",
+        "Image SubSecTimeDigitized",
+        "EXIF SubSecTimeDigitized",
+        "Image SubSecTime",
+        "EXIF SubSecTime",
+        "EXIF CameraElevationAngle",
+        "Image CameraElevationAngle",
+        "carSpeed",
+        "pitch",
+        "yaw",
+        "roll",
+        "megapixels",
+        "vfov",
+    ]
+)
+
+
+class _CompactTag(T.NamedTuple):
+    values: T.Any
+
+
 class ExifRead:
     """
     EXIF class for reading exif from an image
@@ -84,9 +140,32 @@ class ExifRead:
         self.filename = filename
         if isinstance(filename, str):
             with open(filename, "rb") as fp:
-                self.tags = exifread.process_file(fp, details=details, debug=True)
+                self.tags = self._read_tags(fp, details)
         else:
-            self.tags = exifread.process_file(filename, details=details, debug=True)
+            self.tags = self._read_tags(filename, details)
+
+    @staticmethod
+    def _read_tags(fp, details: bool) -> T.Dict[str, Any]:
+        if not details:
+            start = fp.tell()
+            try:
+                return read_exif_tags(fp, EXIF_READ_FIELDS)
+            except UnsupportedExifError:
+                # unusual layout, let exifread look for the tags
+                fp.seek(start)
+        return exifread.process_file(fp, details=details, debug=True)
+
+    def compact(self) -> "ExifRead":
+        """
+        Drop the tags that no extract method reads, keeping only their values.
+        Used to hold many parsed images in memory at once.
+        """
+        self.tags = {
+            field: _CompactTag(tag.values)
+            for field, tag in self.tags.items()
+            if field in EXIF_READ_FIELDS
+        }
+        return self
 
     def _extract_alternative_fields(
             self,
@@ -1,20 +1,31 @@
 import datetime
 import json
 import io
+import os
+import shutil
+import struct
+import typing as T
 
 import piexif
 
 from calculation.geospatial_utils import decimal_to_dms
+from mapilio_kit.components.metadata import image_metadata_cache, jpeg_exif_segment
 from mapilio_kit.components.utilities.types_fmt import FinalImageDescription
 
 
 class ImageExifModifier:
-    _filename: str
+    _filename: T.Optional[str]
 
-    def __init__(self, filename: str):
-        """Initialize the object"""
+    def __init__(self, filename: T.Optional[str] = None, cache: bool = True):
+        """Initialize the object, without any tag when there is no filename.
+        Without cache the tags are read from the file and not kept in the image metadata cache."""
         self._filename = filename
-        self._ef = piexif.load(filename)
+        if filename is None:
+            self._ef = {"0th": {}, "Exif": {}, "GPS": {}}
+        else:
+            self._ef = image_metadata_cache.copy_piexif(
+                image_metadata_cache.load_piexif(filename, cache=cache)
+            )
 
     def set_image_description(self, data: FinalImageDescription) -> None:
         """Add a dict to image description."""
@@ -91,40 +102,168 @@ class ImageExifModifier:
         )
         self._ef["GPS"][piexif.GPSIFD.GPSImgDirectionRef] = ref
 
-    def serialize_image_data(self) -> bytes:
+    def _dump(self) -> bytes:
         try:
-            exif_bytes = piexif.dump(self._ef)
+            return piexif.dump(self._ef)
         except piexif.InvalidImageDataError:
             if self._ef.get("thumbnail") == b"":
                 # workaround https://github.com/hMatoba/Piexif/issues/30
                 del self._ef["thumbnail"]
                 if "1st" in self._ef:
                     del self._ef["1st"]
-                exif_bytes = piexif.dump(self._ef)
+                return piexif.dump(self._ef)
             else:
                 raise
-        output = io.BytesIO()
-        piexif.insert(exif_bytes, self._filename, output)
-        return output.read()
+
+    def serialize_image_data(self) -> bytes:
+        exif_bytes = self._dump()
+        try:
+            return jpeg_exif_segment.image_with_exif(self._filename, exif_bytes)
+        except piexif.InvalidImageDataError:
+            # not a JPEG, e.g. WebP
+            output = io.BytesIO()
+            piexif.insert(exif_bytes, self._filename, output)
+            return output.read()
 
     def write(self, filename=None):
-        """Save exif data to file."""
+        """Save exif data to file, patching the Exif segment in place when the new one fits."""
         if filename is None:
             filename = self._filename
+        elif os.path.abspath(filename) != os.path.abspath(self._filename):
+            shutil.copyfile(self._filename, filename)
 
+        exif_bytes = self._dump()
         try:
-            exif_bytes = piexif.dump(self._ef)
+            jpeg_exif_segment.write_exif(filename, exif_bytes)
         except piexif.InvalidImageDataError:
-            if self._ef.get("thumbnail") == b"":
-                # workaround https://github.com/hMatoba/Piexif/issues/30
-                del self._ef["thumbnail"]
-                if "1st" in self._ef:
-                    del self._ef["1st"]
-                exif_bytes = piexif.dump(self._ef)
-            else:
-                raise
+            piexif.insert(exif_bytes, filename)
+        image_metadata_cache.IMAGE_METADATA_CACHE.invalidate(filename)
+
+
+_IFD_POINTERS = {
+    piexif.ImageIFD.ExifTag: "Exif",
+    piexif.ImageIFD.GPSTag: "GPS",
+}
+_TAGS_BY_IFD = {"0th": piexif.TAGS["Image"], "Exif": piexif.TAGS["Exif"], "GPS": piexif.TAGS["GPS"]}
+# piexif.dump writes big endian TIFF
+_FORMATS = {
+    piexif.TYPES.Byte: "B",
+    piexif.TYPES.Short: "H",
+    piexif.TYPES.Long: "L",
+    piexif.TYPES.SLong: "l",
+    piexif.TYPES.Rational: "LL",
+    piexif.TYPES.SRational: "ll",
+}
+_TYPE_SIZES = {
+    piexif.TYPES.Byte: 1,
+    piexif.TYPES.Ascii: 1,
+    piexif.TYPES.Short: 2,
+    piexif.TYPES.Long: 4,
+    piexif.TYPES.Rational: 8,
+    piexif.TYPES.Undefined: 1,
+    piexif.TYPES.SLong: 4,
+    piexif.TYPES.SRational: 8,
+}
+
+# (IFD name, tag)
+TagKey = T.Tuple[str, int]
+
+
+def _encode_value(field_type: int, value: T.Any) -> T.Optional[bytes]:
+    """
+    Bytes of a tag value the way piexif.dump writes them, None for the types not patched in place
+    """
+    if field_type == piexif.TYPES.Ascii:
+        if isinstance(value, str):
+            value = value.encode("latin1")
+        return value + b"\x00"
+    if field_type == piexif.TYPES.Undefined:
+        return bytes(value)
+    fmt = _FORMATS.get(field_type)
+    if fmt is None:
+        return None
+    if len(fmt) == 2:
+        values = value if isinstance(value[0], tuple) else (value,)
+        return b"".join(struct.pack(">" + fmt, *item) for item in values)
+    values = value if isinstance(value, tuple) else (value,)
+    return struct.pack(">" + fmt * len(values), *values)
+
+
+def _locate_values(exif_bytes: bytes) -> T.Dict[TagKey, T.Tuple[int, int]]:
+    """
+    (offset, size) of the value of each tag of the 0th, Exif and GPS IFDs in the output of piexif.dump
+    """
+    tiff = len(b"Exif\x00\x00")
+    located: T.Dict[TagKey, T.Tuple[int, int]] = {}
+    ifds = [("0th", struct.unpack(">L", exif_bytes[tiff + 4: tiff + 8])[0])]
+    while ifds:
+        name, ifd = ifds.pop()
+        count = struct.unpack(">H", exif_bytes[tiff + ifd: tiff + ifd + 2])[0]
+        for idx in range(count):
+            entry = tiff + ifd + 2 + 12 * idx
+            tag, field_type, value_count, pointer = struct.unpack(">HHLL", exif_bytes[entry: entry + 12])
+            size = _TYPE_SIZES.get(field_type, 0) * value_count
+            if name == "0th" and tag in _IFD_POINTERS:
+                ifds.append((_IFD_POINTERS[tag], pointer))
+                continue
+            located[(name, tag)] = (entry + 8 if size <= 4 else tiff + pointer, size)
+    return located
+
+
+class ExifTemplate(ImageExifModifier):
+    """
+    EXIF shared by the frames of a video. The tags set on the template are the same for every frame;
+    the per-frame tags are set on a frame() and written with write(). The template is dumped once
+    for each set of per-frame tags, and the values of each frame are patched into a copy of the dumped
+    bytes, the fields keeping the same width (dates, GPS rationals, direction, ...).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._compiled: T.Dict[T.FrozenSet[TagKey], T.Tuple[bytes, T.Dict[TagKey, T.Tuple[int, int]]]] = {}
+
+    def frame(self) -> ImageExifModifier:
+        return ImageExifModifier()
+
+    def _merged(self, frame: ImageExifModifier) -> T.Dict:
+        return {ifd: {**tags, **frame._ef.get(ifd, {})} for ifd, tags in self._ef.items()}
+
+    def render(self, frame: ImageExifModifier) -> bytes:
+        """
+        Exif block of a frame, as piexif.dump would write it
+        """
+        values = {(ifd, tag): value for ifd, tags in frame._ef.items() for tag, value in tags.items()}
+        key = frozenset(values)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            exif_bytes = piexif.dump(self._merged(frame))
+            compiled = self._compiled[key] = exif_bytes, _locate_values(exif_bytes)
+            return exif_bytes
+
+        template, located = compiled
+        exif_bytes = bytearray(template)
+        for (ifd, tag), value in values.items():
+            offset, size = located[(ifd, tag)]
+            encoded = _encode_value(_TAGS_BY_IFD[ifd][tag]["type"], value)
+            if encoded is None or len(encoded) != size:
+                # a value of another width moves the following fields
+                return piexif.dump(self._merged(frame))
+            exif_bytes[offset: offset + size] = encoded
+        return bytes(exif_bytes)
 
-        with open(self._filename, "rb") as fp:
-            img = fp.read()
+    def write(self, filename: str, frame: T.Optional[ImageExifModifier] = None):
+        """Write the template and the frame tags to an image without Exif, e.g. a frame extracted by ffmpeg."""
+        if frame is None:
+            frame = self.frame()
+        with open(filename, "rb") as fp:
+            has_exif = jpeg_exif_segment.locate_exif_segment(fp).size
+        if has_exif:
+            # keep the tags the image already has
+            exif_edit = ImageExifModifier(filename)
+            for ifd, tags in self._merged(frame).items():
+                exif_edit._ef.setdefault(ifd, {}).update(tags)
+            exif_edit.write()
+            return
 
-        piexif.insert(exif_bytes, img, filename)
\ No newline at end of file
+        jpeg_exif_segment.write_exif(filename, self.render(frame))
+        image_metadata_cache.IMAGE_METADATA_CACHE.invalidate(filename)
@@ -0,0 +1,194 @@
+import collections
+import os
+import sys
+import threading
+import typing as T
+
+import piexif
+
+from mapilio_kit.components.metadata.exif_metadata_reader import ExifRead
+
+DEFAULT_MAX_ENTRIES = 32768
+# piexif dicts hold the embedded thumbnail, tens of KB per image, so the cache is bounded by bytes too
+DEFAULT_MAX_BYTES = 1024 * 1024 * 256  # 256MB
+
+Fingerprint = T.Tuple[int, int]
+
+
+def approximate_size(value: T.Any) -> int:
+    """
+    Bytes held by a parsed representation: its bytes and strings, and the objects of its containers
+    """
+    if isinstance(value, (bytes, bytearray, str)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            approximate_size(key) + approximate_size(item) for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(approximate_size(item) for item in value)
+    if hasattr(value, "__dict__"):
+        # e.g. the compact ExifRead and its tags
+        return sys.getsizeof(value) + approximate_size(vars(value))
+    return sys.getsizeof(value)
+
+
+def file_fingerprint(path: str) -> Fingerprint:
+    """
+    (size, mtime) of a file, used to detect changes between two reads
+    """
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+class ImageMetadataCache:
+    """
+    LRU cache of parsed image headers, keyed by (path, size, mtime), bounded by entries and by bytes.
+
+    Each file gets one entry holding every parsed representation requested so far
+    (exifread tags, piexif dict, exiftool features, ...), so the decompose stages and
+    the zipper parse a file's headers once per run. An entry is dropped as soon as
+    the file's size or mtime changes, e.g. after its EXIF has been overwritten.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        if max_entries <= 0:
+            raise ValueError(f"Expect positive max entries but got {max_entries}")
+        if max_bytes <= 0:
+            raise ValueError(f"Expect positive max bytes but got {max_bytes}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+        self._entries: "collections.OrderedDict[str, T.Tuple[Fingerprint, T.Dict[str, T.Any]]]" = (
+            collections.OrderedDict()
+        )
+        # approximate bytes of each representation of each entry
+        self._sizes: T.Dict[str, T.Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _pop(self, path: str) -> None:
+        # with the lock held
+        if self._entries.pop(path, None) is not None:
+            self.total_bytes -= sum(self._sizes.pop(path, {}).values())
+
+    def _evict(self) -> None:
+        # with the lock held, least recently used first
+        while self._entries and (self.max_entries < len(self._entries) or self.max_bytes < self.total_bytes):
+            self._pop(next(iter(self._entries)))
+
+    def _entry(self, path: str, fingerprint: Fingerprint) -> T.Dict[str, T.Any]:
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached[0] == fingerprint:
+                self._entries.move_to_end(path)
+                return cached[1]
+            self._pop(path)
+            entry: T.Dict[str, T.Any] = {}
+            self._entries[path] = (fingerprint, entry)
+            self._evict()
+            return entry
+
+    def _store(self, path: str, fingerprint: Fingerprint, kind: str, value: T.Any) -> None:
+        size = approximate_size(value)
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is None or cached[0] != fingerprint:
+                # evicted or changed while the value was loaded
+                return
+            cached[1][kind] = value
+            sizes = self._sizes.setdefault(path, {})
+            self.total_bytes += size - sizes.get(kind, 0)
+            sizes[kind] = size
+            self._evict()
+
+    def get(
+        self,
+        path: str,
+        kind: str,
+        loader: T.Callable[[str], T.Any],
+        fingerprint: T.Optional[Fingerprint] = None,
+    ) -> T.Any:
+        """
+        Return the parsed representation `kind` of the file, calling loader(path) on a miss
+        """
+        path = os.path.abspath(path)
+        if fingerprint is None:
+            fingerprint = file_fingerprint(path)
+        entry = self._entry(path, fingerprint)
+        if kind in entry:
+            self.hits += 1
+            return entry[kind]
+        self.misses += 1
+        value = loader(path)
+        self._store(path, fingerprint, kind, value)
+        return value
+
+    def put(
+        self,
+        path: str,
+        kind: str,
+        value: T.Any,
+        fingerprint: T.Optional[Fingerprint] = None,
+    ) -> None:
+        path = os.path.abspath(path)
+        if fingerprint is None:
+            fingerprint = file_fingerprint(path)
+        self._entry(path, fingerprint)
+        self._store(path, fingerprint, kind, value)
+
+    def contains(self, path: str, kind: str, fingerprint: T.Optional[Fingerprint] = None) -> bool:
+        path = os.path.abspath(path)
+        if fingerprint is None:
+            fingerprint = file_fingerprint(path)
+        with self._lock:
+            cached = self._entries.get(path)
+        return cached is not None and cached[0] == fingerprint and kind in cached[1]
+
+    def invalidate(self, path: str) -> None:
+        with self._lock:
+            self._pop(os.path.abspath(path))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+IMAGE_METADATA_CACHE = ImageMetadataCache()
+
+
+def _load_exif(image: str) -> ExifRead:
+    return ExifRead(image).compact()
+
+
+def read_exif(image: str) -> ExifRead:
+    """
+    Parsed EXIF tags of the image, shared by the decompose stages
+    """
+    return IMAGE_METADATA_CACHE.get(image, "exifread", _load_exif)
+
+
+def load_piexif(image: str, cache: bool = True) -> T.Dict:
+    """
+    piexif dict of the image. It is shared with other readers, so copy it before modifying it.
+    Without cache it is read from the file and not kept, for images read once.
+    """
+    if not cache:
+        return piexif.load(image)
+    return IMAGE_METADATA_CACHE.get(image, "piexif", piexif.load)
+
+
+def copy_piexif(exif_dict: T.Dict) -> T.Dict:
+    # values are immutable (ints, bytes, tuples), so copying the IFDs is enough
+    return {
+        ifd: dict(tags) if isinstance(tags, dict) else tags
+        for ifd, tags in exif_dict.items()
+    }
@@ -0,0 +1,134 @@
+import io
+import os
+import shutil
+import struct
+import tempfile
+import typing as T
+
+import piexif
+
+from mapilio_kit.components.metadata.exif_fast_reader import JPEG_EXIF_HEADER
+
+# zeros reserved after the Exif block when its segment is created or grown,
+# so that the following writes of a few more tags fit in place
+DEFAULT_PADDING = 4096
+# the segment length field counts itself and cannot exceed 16 bits
+MAX_SEGMENT_LENGTH = 0xFFFF
+
+_APP0 = 0xE0
+_APP1 = 0xE1
+_SOS = 0xDA
+_EOI = 0xD9
+
+
+class ExifSegment(T.NamedTuple):
+    # offset of the Exif APP1 marker, or where a new Exif segment goes when there is none
+    offset: int
+    # size of the segment with its marker, 0 when there is none
+    size: int
+
+
+def locate_exif_segment(fp: T.BinaryIO) -> ExifSegment:
+    """
+    Exif APP1 segment of a JPEG file, reading nothing but the segment headers
+    """
+    fp.seek(0)
+    if fp.read(2) != b"\xff\xd8":
+        raise piexif.InvalidImageDataError("Not a JPEG file")
+    offset = 2
+    insert_offset = 2
+    while True:
+        marker = fp.read(4)
+        if len(marker) != 4 or marker[0] != 0xFF:
+            raise piexif.InvalidImageDataError(f"Invalid JPEG segment at offset {offset}")
+        if marker[1] in (_SOS, _EOI):
+            return ExifSegment(insert_offset, 0)
+        length = struct.unpack(">H", marker[2:4])[0]
+        if length < 2:
+            raise piexif.InvalidImageDataError(f"Invalid JPEG segment length at offset {offset}")
+        if marker[1] == _APP1 and fp.read(len(JPEG_EXIF_HEADER)) == JPEG_EXIF_HEADER:
+            return ExifSegment(offset, 2 + length)
+        if marker[1] == _APP0 and offset == 2:
+            # keep the JFIF segment first, the way exiftool adds Exif
+            insert_offset = 2 + 2 + length
+        offset += 2 + length
+        fp.seek(offset)
+
+
+def exif_segment(exif_bytes: bytes, padding: int = 0) -> bytes:
+    """
+    APP1 segment holding the Exif block from piexif.dump, followed by up to padding zeros
+    """
+    if exif_bytes[:len(JPEG_EXIF_HEADER)] != JPEG_EXIF_HEADER:
+        raise ValueError("Given data is not exif data")
+    length = 2 + len(exif_bytes)
+    if MAX_SEGMENT_LENGTH < length:
+        raise ValueError(f"Exif data of {len(exif_bytes)} bytes does not fit a JPEG segment")
+    padding = max(0, min(padding, MAX_SEGMENT_LENGTH - length))
+    return b"\xff\xe1" + struct.pack(">H", length + padding) + exif_bytes + b"\x00" * padding
+
+
+def _pwrite(fp: T.BinaryIO, data: bytes, offset: int) -> None:
+    if hasattr(os, "pwrite"):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fp.fileno(), view, offset)
+            view = view[written:]
+            offset += written
+    else:
+        fp.seek(offset)
+        fp.write(data)
+
+
+def _copy_range(src: T.BinaryIO, dst: T.BinaryIO, start: int, end: T.Optional[int] = None) -> None:
+    src.seek(start)
+    if end is None:
+        shutil.copyfileobj(src, dst)
+        return
+    remaining = end - start
+    while remaining:
+        buf = src.read(min(remaining, io.DEFAULT_BUFFER_SIZE * 16))
+        if not buf:
+            break
+        dst.write(buf)
+        remaining -= len(buf)
+
+
+def write_exif(filename: str, exif_bytes: bytes, padding: int = DEFAULT_PADDING) -> bool:
+    """
+    Replace the Exif of a JPEG file. The new block is written over the old segment when it fits
+    (the rest of the segment zeroed), otherwise the file is copied, streamed, with a new segment
+    reserving padding bytes for the next writes. Returns whether the file was patched in place.
+    """
+    with open(filename, "r+b") as fp:
+        segment = locate_exif_segment(fp)
+        if segment.size and 2 + 2 + len(exif_bytes) <= segment.size:
+            _pwrite(fp, exif_segment(exif_bytes, segment.size - 4 - len(exif_bytes)), segment.offset)
+            return True
+
+        dirname = os.path.dirname(os.path.abspath(filename))
+        with tempfile.NamedTemporaryFile(dir=dirname, prefix=".exif_", delete=False) as tmp:
+            try:
+                _copy_range(fp, tmp, 0, segment.offset)
+                tmp.write(exif_segment(exif_bytes, padding))
+                _copy_range(fp, tmp, segment.offset + segment.size)
+            except BaseException:
+                tmp.close()
+                os.remove(tmp.name)
+                raise
+    shutil.copymode(filename, tmp.name)
+    os.replace(tmp.name, filename)
+    return False
+
+
+def image_with_exif(filename: str, exif_bytes: bytes) -> bytes:
+    """
+    Content of a JPEG file with its Exif replaced, read once
+    """
+    with open(filename, "rb") as fp:
+        segment = locate_exif_segment(fp)
+        fp.seek(0)
+        head = fp.read(segment.offset)
+        fp.seek(segment.offset + segment.size)
+        return b"".join((head, exif_segment(exif_bytes), fp.read()))
+
@@ -1,12 +1,26 @@
+import functools
 import os
 import time
+import typing as T
 
 from tqdm import tqdm
 from mapilio_kit.components.logs import image_log
+from mapilio_kit.components.logs.file_inventory import FileInventory, get_file_inventory
 from mapilio_kit.components.processing import processing
 from mapilio_kit.components.metadata.exif_metadata_reader import ExifRead
+from mapilio_kit.components.metadata.image_metadata_cache import IMAGE_METADATA_CACHE, read_exif
+from mapilio_kit.components.metadata.xmp_reader import read_camera_metadata
 from mapilio_kit.components.utilities.types_fmt import MetaProperties
-from mapilio_kit.components.utilities.utilities import get_exiftool_specific_feature
+from mapilio_kit.components.utilities.utilities import (
+    exiftool_features_from_json,
+    get_exiftool_specific_feature,
+    get_exiftool_specific_features,
+)
+from mapilio_kit.components.utilities.exiftool_pool import DEFAULT_BATCH_SIZE
+from mapilio_kit.components.utilities.executor import imap_in_workers, split_batches, batch_size_for_workers
+
+# images whose exiftool features are requested at once, spread over the exiftool workers
+EXIFTOOL_PREFETCH_SIZE = DEFAULT_BATCH_SIZE * 4
 
 META_DATA_TYPES = {
     "strings": str,
@@ -107,11 +121,23 @@ def finalize_import_properties_process(
     return desc
 
 
-def get_import_meta_properties_exif(image: str, exiftool_path: str) -> MetaProperties:
+def read_camera_features(image: str) -> T.Dict[str, T.Union[None, str, float]]:
+    """
+    Camera features of the image from its Exif and XMP (GPano, Camera, ...) segments, without exiftool
+    """
+    return exiftool_features_from_json(read_camera_metadata(image))
+
+
+def get_import_meta_properties_exif(image: str, exiftool_path: str, use_exiftool: bool = False) -> MetaProperties:
     import_meta_data_properties: MetaProperties = {}
-    exif = ExifRead(image)
+    exif = read_exif(image)
     import_meta_data_properties["orientation"] = exif.extract_orientation()
-    ebi = get_exiftool_specific_feature(image, exiftool_path) # ebi = exif_basic_information
+    if use_exiftool:
+        ebi = IMAGE_METADATA_CACHE.get(
+            image, "exiftool", lambda path: get_exiftool_specific_feature(path, exiftool_path)
+        )  # ebi = exif_basic_information
+    else:
+        ebi = IMAGE_METADATA_CACHE.get(image, "camera_features", read_camera_features)
     import_meta_data_properties["roll"] = ebi['roll'] if ebi['roll'] else exif.extract_roll()
     import_meta_data_properties["pitch"] = ebi["pitch"] if ebi["pitch"] else exif.extract_pitch()
     import_meta_data_properties["yaw"] = ebi["yaw"] if ebi["yaw"] else exif.extract_yaw()
@@ -128,6 +154,45 @@ def get_import_meta_properties_exif(image: str, exiftool_path: str) -> MetaPrope
     return import_meta_data_properties
 
 
+def prefetch_exiftool_features(images: T.List[str], exiftool_path: str, exiftool_pool_size: T.Optional[int] = None) -> None:
+    """
+    Read the exiftool features of the images in one batched request and keep them in the metadata cache
+    """
+    missing = [image for image in images if not IMAGE_METADATA_CACHE.contains(image, "exiftool")]
+    if not missing:
+        return
+    features = get_exiftool_specific_features(missing, exiftool_path, exiftool_pool_size)
+    for image, ebi in zip(missing, features):
+        IMAGE_METADATA_CACHE.put(image, "exiftool", ebi)
+
+
+def process_metadata_batch(
+    images: T.Sequence[str],
+    import_path: str,
+    exiftool_path=None,
+    exiftool_pool_size=None,
+    use_exiftool=False,
+    **finalize_options,
+) -> T.List[T.Tuple[str, MetaProperties, ExifRead]]:
+    """
+    Metadata properties of a batch of images. Runs in the worker processes with --workers,
+    so the parsed EXIF is returned as well for the parent's metadata cache.
+    """
+    if use_exiftool:
+        prefetch_exiftool_features(list(images), exiftool_path, exiftool_pool_size)
+    results = []
+    for image in images:
+        import_meta_data_properties = get_import_meta_properties_exif(image, exiftool_path, use_exiftool)
+        desc = finalize_import_properties_process(
+            image,
+            import_meta_data_properties,
+            import_path,
+            **finalize_options,
+        )
+        results.append((image, desc, read_exif(image)))
+    return results
+
+
 def metadata_property_handler(
     import_path,
     orientation=None,
@@ -143,39 +208,103 @@ def metadata_property_handler(
     exclude_import_path=False,
     exclude_path=None,
     exiftool_path=None,
+    exiftool_pool_size=None,
+    use_exiftool=False,
+    workers=None,
+    file_inventory: T.Optional[FileInventory] = None,
+    resume=False,
 ) -> None:
     if not import_path or not os.path.isdir(import_path):
         raise RuntimeError(f"Image directory {import_path} does not exist")
 
-    process_file_list = image_log.get_total_file_list(
+    file_inventory = get_file_inventory(import_path, skip_subfolders, file_inventory)
+    process_file_list = file_inventory.get_images(import_path, skip_subfolders)
+    if resume:
+        process_file_list = [
+            image for image in process_file_list if not image_log.is_logged(image, "import_meta_data_process")
+        ]
+
+    extract_metadata_properties(
+        process_file_list,
         import_path,
-        skip_subfolders=skip_subfolders,
+        orientation=orientation,
+        device_make=device_make,
+        device_model=device_model,
+        GPS_accuracy=GPS_accuracy,
+        add_file_name=add_file_name,
+        add_import_date=add_import_date,
+        custom_meta_data=custom_meta_data,
+        camera_uuid=camera_uuid,
+        windows_path=windows_path,
+        exclude_import_path=exclude_import_path,
+        exclude_path=exclude_path,
+        exiftool_path=exiftool_path,
+        exiftool_pool_size=exiftool_pool_size,
+        use_exiftool=use_exiftool,
+        workers=workers,
     )
 
+
+def extract_metadata_properties(
+    process_file_list: T.List[str],
+    import_path: str,
+    orientation=None,
+    device_make=None,
+    device_model=None,
+    GPS_accuracy=None,
+    add_file_name=False,
+    add_import_date=False,
+    custom_meta_data=None,
+    camera_uuid=None,
+    windows_path=False,
+    exclude_import_path=False,
+    exclude_path=None,
+    exiftool_path=None,
+    exiftool_pool_size=None,
+    use_exiftool=False,
+    workers=None,
+) -> None:
+    """
+    Extract and log the metadata properties of the images
+    """
     if not process_file_list:
         return
 
     if orientation is not None:
         orientation = processing.format_orientation(orientation)
 
-    for image in tqdm(
-        process_file_list, unit="files", desc="metadata properties being processed"
-    ):
-        import_meta_data_properties = get_import_meta_properties_exif(image, exiftool_path)
-        desc = finalize_import_properties_process(
-            image,
-            import_meta_data_properties,
-            import_path,
-            orientation,
-            device_make,
-            device_model,
-            GPS_accuracy,
-            add_file_name,
-            add_import_date,
-            custom_meta_data,
-            camera_uuid,
-            windows_path,
-            exclude_import_path,
-            exclude_path,
-        )
-        image_log.log_in_memory(image, "import_meta_data_process", desc)
\ No newline at end of file
+    if use_exiftool and workers is not None and 1 < workers and exiftool_pool_size is None:
+        # every worker process runs its own exiftool pool
+        exiftool_pool_size = 1
+
+    process_batch = functools.partial(
+        process_metadata_batch,
+        import_path=import_path,
+        exiftool_path=exiftool_path,
+        exiftool_pool_size=exiftool_pool_size,
+        use_exiftool=use_exiftool,
+        orientation=orientation,
+        device_make=device_make,
+        device_model=device_model,
+        GPS_accuracy=GPS_accuracy,
+        add_file_name=add_file_name,
+        add_import_date=add_import_date,
+        custom_meta_data=custom_meta_data,
+        camera_uuid=camera_uuid,
+        windows_path=windows_path,
+        exclude_import_path=exclude_import_path,
+        exclude_path=exclude_path,
+    )
+    batches = split_batches(
+        process_file_list,
+        batch_size_for_workers(len(process_file_list), workers, EXIFTOOL_PREFETCH_SIZE),
+    )
+
+    with tqdm(
+        total=len(process_file_list), unit="files", desc="metadata properties being processed"
+    ) as pbar:
+        for results in imap_in_workers(process_batch, batches, workers):
+            for image, desc, exif in results:
+                IMAGE_METADATA_CACHE.put(image, "exifread", exif)
+                image_log.log_in_memory(image, "import_meta_data_process", desc)
+            pbar.update(len(results))
@@ -0,0 +1,186 @@
+import math
+import struct
+import typing as T
+import xml.etree.ElementTree as ET
+
+from mapilio_kit.components.metadata.exif_fast_reader import (
+    JPEG_EXIF_HEADER,
+    UnsupportedExifError,
+    read_exif_tags,
+    read_tiff_bytes_tags,
+)
+
+JPEG_XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+RDF_NAMESPACE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+
+# SOF markers carrying the frame size, i.e. SOF0..SOF15 without DHT, JPG and DAC
+SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class JpegHeader(T.NamedTuple):
+    # TIFF structure of the Exif APP1 segment, without the Exif header
+    exif: T.Optional[bytes]
+    # XMP packets of the APP1 segments, in file order
+    xmp: T.List[bytes]
+    width: T.Optional[int]
+    height: T.Optional[int]
+
+
+def read_jpeg_header(fp: T.BinaryIO) -> T.Optional[JpegHeader]:
+    """
+    Exif and XMP segments and frame size of a JPEG, reading nothing after the start of the image data.
+    None if the file is not a JPEG.
+    """
+    if fp.read(2) != b"\xff\xd8":
+        return None
+
+    exif = None
+    xmp = []
+    width = height = None
+    while True:
+        marker = fp.read(4)
+        if len(marker) != 4 or marker[0] != 0xFF or marker[1] in (0xDA, 0xD9):
+            break
+        length = struct.unpack(">H", marker[2:4])[0]
+        if length < 2:
+            break
+        if marker[1] == 0xE1:
+            segment = fp.read(length - 2)
+            if segment.startswith(JPEG_EXIF_HEADER):
+                if exif is None:
+                    exif = segment[len(JPEG_EXIF_HEADER):]
+            elif segment.startswith(JPEG_XMP_HEADER):
+                xmp.append(segment[len(JPEG_XMP_HEADER):])
+        elif marker[1] in SOF_MARKERS:
+            segment = fp.read(length - 2)
+            if 5 <= len(segment):
+                height, width = struct.unpack(">HH", segment[1:5])
+        else:
+            fp.seek(length - 2, 1)
+
+    return JpegHeader(exif, xmp, width, height)
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _xmp_value(text: str) -> T.Union[str, int, float]:
+    """
+    XMP values are all text, convert the numeric ones the way `exiftool -n` prints them
+    """
+    text = text.strip()
+    for type_ in (int, float):
+        try:
+            return type_(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_xmp_properties(packet: bytes) -> T.List[T.Tuple[str, T.Union[str, int, float]]]:
+    """
+    Simple properties of an XMP packet as (local name, value), e.g. ("PoseHeadingDegrees", 90.0).
+
+    Properties are read from the attributes and the text-only children of every rdf:Description,
+    so the GPano (http://ns.google.com/photos/1.0/panorama/), Camera and drone namespaces
+    all come out the same way. Structured values (rdf:Seq, rdf:Bag, ...) are skipped.
+    """
+    try:
+        root = ET.fromstring(packet)
+    except ET.ParseError:
+        return []
+
+    properties = []
+    for description in root.iter(f"{{{RDF_NAMESPACE}}}Description"):
+        for name, value in description.attrib.items():
+            if not name.startswith(f"{{{RDF_NAMESPACE}}}"):
+                properties.append((_local_name(name), _xmp_value(value)))
+        for child in description:
+            if len(child) == 0 and child.text is not None and child.text.strip():
+                properties.append((_local_name(child.tag), _xmp_value(child.text)))
+    return properties
+
+
+# exifread names of the EXIF tags exiftool would report with the camera features
+CAMERA_EXIF_FIELDS = frozenset([
+    "Image Make",
+    "Image Model",
+    "Image ImageWidth",
+    "Image ImageLength",
+    "EXIF LensMake",
+    "EXIF FocalLength",
+    "EXIF FocalLengthIn35mmFilm",
+    # CameraElevationAngle, unknown to exifread
+    "EXIF Tag 0x9405",
+])
+
+CAMERA_EXIF_NAMES = [
+    ("Image Make", "Make"),
+    ("Image Model", "Model"),
+    ("EXIF LensMake", "LensMake"),
+    ("EXIF Tag 0x9405", "CameraElevationAngle"),
+]
+
+
+def _tag_value(tag) -> T.Any:
+    if tag is None:
+        return None
+    values = tag.values
+    if isinstance(values, (str, bytes)):
+        return values.strip() if isinstance(values, str) else None
+    if not values:
+        return None
+    value = values[0]
+    if isinstance(value, tuple):
+        value = value[0]
+    try:
+        return float(value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+
+
+def read_camera_metadata(path: str) -> T.Dict[str, T.Any]:
+    """
+    The camera related part of an `exiftool -j -n` record (Make, Model, XMP properties, ImageSize,
+    Megapixels, FieldOfView), read in-process from the Exif and XMP segments of a JPEG or TIFF image.
+    Tags found in several places keep exiftool's priority: EXIF first, then XMP, then composites.
+    """
+    with open(path, "rb") as fp:
+        header = read_jpeg_header(fp)
+        try:
+            if header is None:
+                fp.seek(0)
+                tags = read_exif_tags(fp, CAMERA_EXIF_FIELDS)
+            elif header.exif is not None:
+                tags = read_tiff_bytes_tags(header.exif, CAMERA_EXIF_FIELDS)
+            else:
+                tags = {}
+        except UnsupportedExifError:
+            tags = {}
+
+    metadata: T.Dict[str, T.Any] = {}
+    for field, name in CAMERA_EXIF_NAMES:
+        value = _tag_value(tags.get(field))
+        if value is not None and value != "":
+            metadata[name] = value
+
+    for packet in header.xmp if header is not None else []:
+        for name, value in parse_xmp_properties(packet):
+            metadata.setdefault(name, value)
+
+    if header is not None and header.width and header.height:
+        width, height = header.width, header.height
+    else:
+        width, height = _tag_value(tags.get("Image ImageWidth")), _tag_value(tags.get("Image ImageLength"))
+    if width and height:
+        metadata.setdefault("ImageSize", f"{int(width)} {int(height)}")
+        metadata.setdefault("Megapixels", width * height / 1000000)
+
+    focal_length = _tag_value(tags.get("EXIF FocalLength"))
+    focal_length_35mm = _tag_value(tags.get("EXIF FocalLengthIn35mmFilm"))
+    if focal_length and focal_length_35mm:
+        # exiftool's composite FieldOfView, for a 36mm wide full frame sensor
+        metadata.setdefault("FieldOfView", math.degrees(2 * math.atan2(36, 2 * focal_length_35mm)))
+
+    return metadata
@@ -1,15 +1,18 @@
 from typing import Dict, List, Tuple
 import typing as T
 import datetime
+import functools
 import os
 import logging
 
 from tqdm import tqdm
 
 from mapilio_kit.components.logs import image_log
+from mapilio_kit.components.logs.file_inventory import FileInventory, get_file_inventory
 from mapilio_kit.components.utilities import types_fmt as types
 from mapilio_kit.components.utilities.error import MapilioGeoTaggingError
-from mapilio_kit.components.metadata.exif_metadata_reader import ExifRead
+from mapilio_kit.components.utilities.executor import imap_in_workers, batch_size_for_workers
+from mapilio_kit.components.metadata.image_metadata_cache import read_exif
 from mapilio_kit.components.metadata.exif_metadata_writer import ImageExifModifier
 from calculation.geospatial_utils import normalize_bearing, interpolate_lat_lon, Point
 from mapilio_kit.components.geotagging.gps_parser import get_lat_lon_time_from_gpx, get_lat_lon_time_from_nmea
@@ -19,37 +22,58 @@ from mapilio_kit.components.logger import MapilioLogger
 
 LOG = MapilioLogger().get_logger()
 
-def geotag_from_exif(
-    process_file_list: List[str],
+def geotag_image_from_exif(
+    image: str,
     offset_time: float = 0.0,
     offset_angle: float = 0.0,
-) -> None:
-    for image in tqdm(process_file_list, unit="files", desc="Extracting GPS from EXIF"):
+) -> T.Tuple[str, T.Union[types.GPXPointAngle, MapilioGeoTaggingError]]:
+    try:
+        point = gpx_from_exif(image)
+    except MapilioGeoTaggingError as ex:
+        return image, ex
 
-        try:
-            point = gpx_from_exif(image)
-        except MapilioGeoTaggingError as ex:
-            image_log.log_failed_in_memory(image, "geotag_process", ex)
-            continue
+    corrected_time = point.point.time + datetime.timedelta(seconds=offset_time)
 
-        corrected_time = point.point.time + datetime.timedelta(seconds=offset_time)
+    if point.angle is not None:
+        corrected_angle: T.Optional[float] = normalize_bearing(
+            point.angle + offset_angle
+        )
+    else:
+        corrected_angle = None
+
+    point = types.GPXPointAngle(
+        point=types.GPXPoint(
+            time=corrected_time,
+            lon=point.point.lon,
+            lat=point.point.lat,
+            alt=point.point.alt,
+        ),
+        angle=corrected_angle,
+    )
+    return image, point
 
-        if point.angle is not None:
-            corrected_angle: T.Optional[float] = normalize_bearing(
-                point.angle + offset_angle
-            )
-        else:
-            corrected_angle = None
 
-        point = types.GPXPointAngle(
-            point=types.GPXPoint(
-                time=corrected_time,
-                lon=point.point.lon,
-                lat=point.point.lat,
-                alt=point.point.alt,
-            ),
-            angle=corrected_angle,
-        )
+def geotag_from_exif(
+    process_file_list: List[str],
+    offset_time: float = 0.0,
+    offset_angle: float = 0.0,
+    workers: T.Optional[int] = None,
+) -> None:
+    geotag_image = functools.partial(
+        geotag_image_from_exif, offset_time=offset_time, offset_angle=offset_angle
+    )
+    results = imap_in_workers(
+        geotag_image,
+        process_file_list,
+        workers,
+        chunksize=batch_size_for_workers(len(process_file_list), workers, 64),
+    )
+    for image, point in tqdm(
+        results, unit="files", desc="Extracting GPS from EXIF", total=len(process_file_list)
+    ):
+        if isinstance(point, MapilioGeoTaggingError):
+            image_log.log_failed_in_memory(image, "geotag_process", point)
+            continue
 
         image_log.log_in_memory(image, "geotag_process", point.as_desc())
 
@@ -78,9 +102,12 @@ def geotag_from_gopro_video(
     geotag_source_path: str,
     offset_time: float,
     offset_angle: float,
+    file_inventory: T.Optional[FileInventory] = None,
 ) -> None:
     if os.path.isdir(geotag_source_path):
-        gopro_videos = image_log.get_video_file_list(geotag_source_path)
+        gopro_videos = get_file_inventory(geotag_source_path, False, file_inventory).get_videos(
+            geotag_source_path, skip_subfolders=False
+        )
         for gopro_video in gopro_videos:
             trace = gpx_from_gopro(gopro_video)
             _geotag_from_gpx(
@@ -111,7 +138,7 @@ def _geotag_from_gpx(
     read_image_time: T.Optional[T.Callable] = None,
 ):
     if read_image_time is None:
-        read_image_time = lambda img: ExifRead(img).extract_capture_time()
+        read_image_time = lambda img: read_exif(img).extract_capture_time()
 
     if not points:
         raise ValueError("Empty GPX list provided")
@@ -234,46 +261,75 @@ def geotag_from_gpx_file(
     )
 
 
-def overwrite_exif_tags(
-    image_path: str,
+def exif_tag_changes(
     desc: types.FinalImageDescription,
     overwrite_all_EXIF_tags: bool = False,
     overwrite_EXIF_time_tag: bool = False,
     overwrite_EXIF_gps_tag: bool = False,
     overwrite_EXIF_direction_tag: bool = False,
     overwrite_EXIF_orientation_tag: bool = False,
-) -> None:
-    modified = False
-
-    image_exif = ImageExifModifier(image_path)
+) -> T.Dict[str, T.Any]:
+    """
+    EXIF tag changes the overwrite options make for an image, as the description values to write
+    """
+    changes: T.Dict[str, T.Any] = {}
 
     # also try to set time and gps so image can be placed on the map for testing and
     # qc purposes
     if overwrite_all_EXIF_tags or overwrite_EXIF_time_tag:
-        dt = types.map_capture_time_to_datetime(desc["captureTime"])
-        image_exif.set_date_time_original(dt)
-        modified = True
+        changes["captureTime"] = desc["captureTime"]
 
     if overwrite_all_EXIF_tags or overwrite_EXIF_gps_tag:
-        image_exif.set_lat_lon(
-            desc["latitude"],
-            desc["longitude"],
-        )
-        modified = True
+        changes["latitude"] = desc["latitude"]
+        changes["longitude"] = desc["longitude"]
 
     if overwrite_all_EXIF_tags or overwrite_EXIF_direction_tag:
         heading = desc.get("heading")
         if heading is not None:
-            image_exif.set_direction(desc["heading"])
-            modified = True
+            changes["heading"] = heading
 
     if overwrite_all_EXIF_tags or overwrite_EXIF_orientation_tag:
         if "orientation" in desc:
-            image_exif.set_orientation(desc["orientation"])
-            modified = True
+            changes["orientation"] = desc["orientation"]
+
+    return changes
+
+
+def apply_exif_tag_changes(image_exif: ImageExifModifier, changes: T.Mapping[str, T.Any]) -> None:
+    if "captureTime" in changes:
+        image_exif.set_date_time_original(types.map_capture_time_to_datetime(changes["captureTime"]))
+    if "latitude" in changes and "longitude" in changes:
+        image_exif.set_lat_lon(changes["latitude"], changes["longitude"])
+    if "heading" in changes:
+        image_exif.set_direction(changes["heading"])
+    if "orientation" in changes:
+        image_exif.set_orientation(changes["orientation"])
+
+
+def overwrite_exif_tags(
+    image_path: str,
+    desc: types.FinalImageDescription,
+    overwrite_all_EXIF_tags: bool = False,
+    overwrite_EXIF_time_tag: bool = False,
+    overwrite_EXIF_gps_tag: bool = False,
+    overwrite_EXIF_direction_tag: bool = False,
+    overwrite_EXIF_orientation_tag: bool = False,
+) -> None:
+    changes = exif_tag_changes(
+        desc,
+        overwrite_all_EXIF_tags,
+        overwrite_EXIF_time_tag,
+        overwrite_EXIF_gps_tag,
+        overwrite_EXIF_direction_tag,
+        overwrite_EXIF_orientation_tag,
+    )
+    if not changes:
+        return
 
-    if modified:
-        image_exif.write()
+    # written back right away, which invalidates the cached tags
+    image_exif = ImageExifModifier(image_path, cache=False)
+    apply_exif_tag_changes(image_exif, changes)
+    image_exif.write()
 
 
 def format_orientation(orientation: int) -> int:
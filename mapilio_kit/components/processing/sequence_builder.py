@@ -0,0 +1,241 @@
+import datetime
+import os
+import typing as T
+
+import numpy as np
+
+from mapilio_kit.components.logs import image_log
+from mapilio_kit.components.logs.file_inventory import FileInventory
+from mapilio_kit.components.utilities import types_fmt as types
+
+# same ellipsoid as calculation.geospatial_utils.lla_to_ecef
+WGS84_a = 6378137.0
+WGS84_b = 6356752.314245
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+# upload size budget of a sequence archive, shared by the sequence builder and the uploader
+MAX_UPLOAD_SIZE = 1024 * 1024 * 750  # 750MB
+# archives are packed up to this size, and never over MAX_UPLOAD_SIZE
+TARGET_UPLOAD_SIZE = 1024 * 1024 * 500  # 500MB
+# zip headers of an entry, local and central directory, with its name
+ZIP_ENTRY_OVERHEAD = 256
+
+
+def capture_time_to_epoch(capture_time: str) -> float:
+    """
+    Seconds since 1970-01-01 of a captureTime, without timezone like the captureTime itself
+    """
+    # fromisoformat parses "%Y-%m-%d %H:%M:%S" several times faster than strptime
+    if len(capture_time) == 19 and capture_time[10] == " ":
+        try:
+            return (datetime.datetime.fromisoformat(capture_time) - _EPOCH).total_seconds()
+        except ValueError:
+            pass
+    return (types.map_capture_time_to_datetime(capture_time) - _EPOCH).total_seconds()
+
+
+def load_geotag_descs(images: T.Iterable[str]) -> T.Tuple[T.List[str], T.List[types.Image]]:
+    """
+    (filenames, geotag descriptions) of the images geotagged successfully
+    """
+    filenames = []
+    descs = []
+    for image in images:
+        ret = image_log.read_process_data_from_memory(image, "geotag_process")
+        if ret is None:
+            continue
+        status, geotag_data = ret
+        if status != "success":
+            continue
+        filenames.append(image)
+        descs.append(T.cast(types.Image, geotag_data))
+    return filenames, descs
+
+
+def file_sizes(filenames: T.Iterable[str], file_inventory: T.Optional[FileInventory] = None) -> T.List[int]:
+    """
+    Sizes of the files in bytes, from the inventory stats when it has them
+    """
+    sizes = []
+    for filename in filenames:
+        stat = file_inventory.stat(filename) if file_inventory is not None else None
+        sizes.append(stat.size if stat is not None else os.path.getsize(filename))
+    return sizes
+
+
+class SequenceArrays:
+    """
+    Geotagged images of a sequence sorted by capture time, with latitude, longitude, capture time (epoch seconds),
+    heading (NaN when missing) and, when known, file size in arrays. Capture times are parsed once,
+    when the sequence is loaded.
+    """
+
+    def __init__(
+        self,
+        filenames: T.List[str],
+        descs: T.List[types.Image],
+        lat: np.ndarray,
+        lon: np.ndarray,
+        time: np.ndarray,
+        heading: np.ndarray,
+        size: T.Optional[np.ndarray] = None,
+    ):
+        self.filenames = filenames
+        self.descs = descs
+        self.lat = lat
+        self.lon = lon
+        self.time = time
+        self.heading = heading
+        self.size = size
+
+    @classmethod
+    def from_descs(
+        cls,
+        filenames: T.List[str],
+        descs: T.List[types.Image],
+        sizes: T.Optional[T.List[int]] = None,
+    ) -> "SequenceArrays":
+        """
+        The images sorted by capture time, the order of images in the same second kept
+        """
+        count = len(descs)
+        time = np.fromiter((capture_time_to_epoch(desc["captureTime"]) for desc in descs), float, count)
+        order = np.argsort(time, kind="stable")
+        descs = [descs[idx] for idx in order]
+        heading = [desc.get("heading") for desc in descs]
+        return cls(
+            [filenames[idx] for idx in order],
+            descs,
+            np.fromiter((desc["latitude"] for desc in descs), float, count),
+            np.fromiter((desc["longitude"] for desc in descs), float, count),
+            time[order],
+            np.fromiter((np.nan if value is None else value for value in heading), float, count),
+            None if sizes is None else np.asarray(sizes, dtype=np.int64)[order],
+        )
+
+    def __len__(self) -> int:
+        return len(self.filenames)
+
+
+def ecef_from_lla(lat: np.ndarray, lon: np.ndarray) -> T.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    ECEF coordinates at altitude 0, calculation.geospatial_utils.lla_to_ecef over arrays
+    """
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    a2 = WGS84_a ** 2
+    b2 = WGS84_b ** 2
+    e2 = (a2 - b2) / a2
+    n = WGS84_a / np.sqrt(1 - e2 * np.sin(lat) ** 2)
+    x = n * np.cos(lat) * np.cos(lon)
+    y = n * np.cos(lat) * np.sin(lon)
+    z = (1 - e2) * n * np.sin(lat)
+    return x, y, z
+
+
+def pair_distances(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """
+    gps_distance between each point and the next one, the straight line between their ECEF coordinates
+    """
+    x, y, z = ecef_from_lla(lat, lon)
+    return np.sqrt(np.diff(x) ** 2 + np.diff(y) ** 2 + np.diff(z) ** 2)
+
+
+def compass_bearings(start_lat, start_lon, end_lat, end_lon) -> np.ndarray:
+    """
+    calculation.geospatial_utils.calculate_compass_bearing over arrays, in degrees from 0 to 360
+    """
+    start_lat = np.radians(start_lat)
+    start_lon = np.radians(start_lon)
+    end_lat = np.radians(end_lat)
+    end_lon = np.radians(end_lon)
+
+    delta_lon = end_lon - start_lon
+    # the shorter way around the antimeridian
+    delta_lon = np.where(
+        np.pi < np.abs(delta_lon),
+        np.where(0.0 < delta_lon, -(2.0 * np.pi - delta_lon), 2.0 * np.pi + delta_lon),
+        delta_lon,
+    )
+
+    y = np.sin(delta_lon) * np.cos(end_lat)
+    x = np.cos(start_lat) * np.sin(end_lat) - np.sin(start_lat) * np.cos(end_lat) * np.cos(delta_lon)
+    bearing = np.degrees(np.arctan2(y, x))
+    return (bearing + 360) % 360
+
+
+def split_starts(sequence: SequenceArrays, cutoff_distance: float, cutoff_time: float) -> np.ndarray:
+    """
+    Index of the first image of each part of the sequence, split where two consecutive images
+    are at least cutoff_distance meters or cutoff_time seconds apart
+    """
+    if not len(sequence):
+        return np.zeros(0, dtype=np.intp)
+    breaks = (cutoff_distance <= pair_distances(sequence.lat, sequence.lon)) | (
+        cutoff_time <= np.diff(sequence.time)
+    )
+    return np.concatenate(([0], np.flatnonzero(breaks) + 1))
+
+
+def interpolate_headings(
+    sequence: SequenceArrays,
+    starts: np.ndarray,
+    interpolate_directions: bool,
+) -> T.Tuple[np.ndarray, np.ndarray]:
+    """
+    (interpolated, heading): whether the heading of each image is replaced, and the new headings.
+
+    Within each part, an image gets the bearing to the next image when interpolate_directions is set
+    or it has no heading; the last image of a part of 2 images or more gets the heading of the image
+    before it when interpolate_directions is set.
+    """
+    count = len(sequence)
+    heading = np.full(count, np.nan)
+    interpolated = np.zeros(count, dtype=bool)
+    if count < 2:
+        return interpolated, heading
+
+    bearings = compass_bearings(sequence.lat[:-1], sequence.lon[:-1], sequence.lat[1:], sequence.lon[1:])
+    ends = np.append(starts[1:], count) - 1
+    is_last = np.zeros(count, dtype=bool)
+    is_last[ends] = True
+
+    interpolated[:-1] = ~is_last[:-1] & (interpolate_directions | np.isnan(sequence.heading[:-1]))
+    heading[:-1] = np.where(interpolated[:-1], bearings, np.nan)
+
+    if interpolate_directions:
+        last = ends[starts < ends]
+        interpolated[last] = True
+        heading[last] = bearings[last - 1]
+    return interpolated, heading
+
+
+def packed_chunk_ids(
+    starts: np.ndarray,
+    sizes: np.ndarray,
+    max_length: int,
+    target_size: int,
+    max_size: int,
+) -> np.ndarray:
+    """
+    Chunk number of each image, when each part is cut every max_length images and packed by bytes:
+    a chunk is closed once it holds target_size bytes, or before the next image takes it over max_size bytes.
+    An image larger than max_size gets a chunk of its own.
+
+    The end of each chunk is searched in the cumulative sizes, the loop runs once per chunk, not per image.
+    """
+    count = len(sizes)
+    is_chunk_start = np.zeros(count, dtype=bool)
+    # bytes before each image, and in total
+    offsets = np.concatenate(([0], np.cumsum(sizes, dtype=np.int64)))
+    part_ends = np.append(starts[1:], count).tolist()
+    for start, part_end in zip(starts.tolist(), part_ends):
+        while start < part_end:
+            is_chunk_start[start] = True
+            # first image that would start a new chunk: at max_length images, once target_size
+            # bytes are held, or the first image that does not fit in max_size bytes
+            full = np.searchsorted(offsets, offsets[start] + target_size, side="left")
+            over = np.searchsorted(offsets, offsets[start] + max_size, side="right") - 1
+            start = max(start + 1, min(part_end, start + max_length, int(full), int(over)))
+    return np.cumsum(is_chunk_start) - 1
@@ -1,15 +1,33 @@
 import typing as T
 import datetime
+import functools
 import os
 import uuid
 
+import numpy as np
+
 from mapilio_kit.components.logs import image_log
+from mapilio_kit.components.logs.file_inventory import FileInventory, get_file_inventory
+from mapilio_kit.components.processing.sequence_builder import (
+    MAX_UPLOAD_SIZE,
+    TARGET_UPLOAD_SIZE,
+    ZIP_ENTRY_OVERHEAD,
+    SequenceArrays,
+    file_sizes,
+    interpolate_headings,
+    load_geotag_descs,
+    packed_chunk_ids,
+    split_starts,
+)
 from mapilio_kit.components.utilities import types_fmt as types
 from calculation.geospatial_utils import calculate_compass_bearing, gps_distance, generate_pairs
 from mapilio_kit.components import version
 from mapilio_kit.components.utilities.error import MapilioDuplicationError
+from mapilio_kit.components.utilities.executor import imap_in_workers
 
 MAX_SEQUENCE_LENGTH = 250
+# namespace of the uuid5 sequence uuids
+SEQUENCE_UUID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, "mapilio.com")
 
 
 class _GPXPoint:
@@ -19,6 +37,7 @@ class _GPXPoint:
     def __init__(self, desc: types.Image, filename: str):
         self.desc = desc
         self.filename = filename
+        self._time: T.Optional[datetime.datetime] = None
 
     @property
     def lat(self) -> float:
@@ -30,7 +49,10 @@ class _GPXPoint:
 
     @property
     def time(self) -> datetime.datetime:
-        return types.map_capture_time_to_datetime(self.desc["captureTime"])
+        # parsed on first access only, it is read by the sort key and for every pair
+        if self._time is None:
+            self._time = types.map_capture_time_to_datetime(self.desc["captureTime"])
+        return self._time
 
     @property
     def angle(self) -> T.Optional[float]:
@@ -126,94 +148,119 @@ def sequence_property_handler(
     duplicate_distance=0.1,
     duplicate_angle=5,
     skip_subfolders=False,
+    workers=None,
+    file_inventory: T.Optional[FileInventory] = None,
+    resume=False,
+    stale_images: T.Optional[T.List[str]] = None,
 ) -> None:
     if not import_path or not os.path.isdir(import_path):
         raise RuntimeError(f"Error, import directory {import_path} does not exist")
-    sequences = find_sequences(import_path, skip_subfolders)
-    for sequence in sequences:
-        process_sequence_by_anomaly(
-            sequence,
-            cutoff_distance,
-            cutoff_time,
-            interpolate_directions,
-            duplicate_distance,
-            duplicate_angle,
-        )
+    file_inventory = get_file_inventory(import_path, skip_subfolders, file_inventory)
+
+    # one sequence per folder, (filenames, geotag descriptions, file sizes) of its geotagged images
+    sequences = [
+        load_geotag_descs(images) for images in sequence_directories(import_path, skip_subfolders, file_inventory)
+    ]
+    sequences = [
+        (filenames, descs, file_sizes(filenames, file_inventory)) for filenames, descs in sequences if filenames
+    ]
+    if resume:
+        # sequences depend on every image of their folder, so they are kept
+        # for the folders where no image was added, changed or removed
+        changed_dirs = {os.path.dirname(os.path.normpath(image)) for image in stale_images or []}
+        sequences = [
+            sequence for sequence in sequences
+            if os.path.dirname(os.path.normpath(sequence[0][0])) in changed_dirs
+            or not all(image_log.is_logged(filename, "sequence_process") for filename in sequence[0])
+        ]
 
-def process_sequence_by_anomaly(
-        sequence: Sequence,
-        cutoff_distance: float,
-        cutoff_time: float,
-        interpolate_directions: bool,
-        duplicate_distance: float,
-        duplicate_angle: float,
-) -> None:
-    splitted_sequences: T.List[Sequence] = split_sequences(
-        sequence, cutoff_distance, cutoff_time
+    process_directory = functools.partial(
+        process_directory_sequence,
+        import_path=import_path,
+        cutoff_distance=cutoff_distance,
+        cutoff_time=cutoff_time,
+        interpolate_directions=interpolate_directions,
     )
+    # results come back in folder order whatever the number of workers
+    for results in imap_in_workers(process_directory, sequences, workers):
+        for filename, desc in results:
+            image_log.log_in_memory(filename, "sequence_process", desc)
 
-    for sequence in splitted_sequences:
-        _sequence = [
-            image for idx, image in enumerate(sequence)
-        ]
-        
 
-        # interpolate angles
-        interpolated_dedup_sequence: Sequence = []
-        for cur, nex in generate_pairs(_sequence):
-            # should interpolate or not
-            if interpolate_directions or cur.angle is None:
-                new_bearing = calculate_compass_bearing(cur.lat, cur.lon, nex.lat, nex.lon)
-                new_desc: types.Image = T.cast(
-                    types.Image,
-                    {
-                        **cur.desc,
-                        "heading": new_bearing
-                    },
-                )
-                interpolated_dedup_sequence.append(_GPXPoint(new_desc, cur.filename))
-            else:
-                interpolated_dedup_sequence.append(cur)
+def sequence_uuid_for(filenames: T.Iterable[str], import_path: T.Optional[str] = None) -> str:
+    """
+    Sequence uuid of a chunk of images, derived from their paths relative to the import path,
+    so processing the same images again gives the same uuid
+    """
+    if import_path is not None:
+        filenames = (os.path.relpath(filename, import_path) for filename in filenames)
+    key = "\n".join(filename.replace(os.sep, "/") for filename in filenames)
+    return str(uuid.uuid5(SEQUENCE_UUID_NAMESPACE, key))
 
-        if interpolated_dedup_sequence:
-            assert len(interpolated_dedup_sequence) == len(_sequence) - 1
-        else:
-            assert len(_sequence) <= 1
 
-        # interpolate the last image's angle
-        # can interpolate or not
-        if 2 <= len(_sequence) and interpolated_dedup_sequence[-1] is not None:
-            # should interpolate or not
-            if interpolate_directions or _sequence[-1] is None:
-                new_desc = T.cast(
-                    types.Image,
-                    {
-                        **_sequence[-1].desc,
-                        "heading": interpolated_dedup_sequence[-1].angle
-                    },
-                )
-                interpolated_dedup_sequence.append(
-                    _GPXPoint(new_desc, _sequence[-1].filename)
-                )
-            else:
-                interpolated_dedup_sequence.append(_sequence[-1])
-        else:
-            interpolated_dedup_sequence.append(_sequence[-1])
-
-        assert len(interpolated_dedup_sequence) == len(_sequence)
+def build_sequence_descs(
+    sequence: SequenceArrays,
+    cutoff_distance: float,
+    cutoff_time: float,
+    interpolate_directions: bool,
+    import_path: T.Optional[str] = None,
+) -> T.List[T.Tuple[str, types.Sequence]]:
+    """
+    (filename, sequence description) of each image: the sequence is split by cutoff distance and time,
+    the headings interpolated and the parts cut per MAX_SEQUENCE_LENGTH images, each chunk with its own uuid.
+    When the file sizes are known, the chunks are also packed by the upload size budget.
+    """
+    count = len(sequence)
+    if not count:
+        return []
+    starts = split_starts(sequence, cutoff_distance, cutoff_time)
+    interpolated, headings = interpolate_headings(sequence, starts, interpolate_directions)
+    # without the file sizes, the parts are only cut every MAX_SEQUENCE_LENGTH images
+    sizes = np.zeros(count, dtype=np.int64) if sequence.size is None else sequence.size + ZIP_ENTRY_OVERHEAD
+    chunks = packed_chunk_ids(starts, sizes, MAX_SEQUENCE_LENGTH, TARGET_UPLOAD_SIZE, MAX_UPLOAD_SIZE)
+
+    chunk_starts = np.append(np.flatnonzero(np.diff(chunks)) + 1, count)
+    sequence_uuids = []
+    start = 0
+    for end in chunk_starts.tolist():
+        sequence_uuids.append(sequence_uuid_for(sequence.filenames[start:end], import_path))
+        start = end
+
+    results = []
+    source = f"Mapilio_Kit-v{version.VERSION}"
+    for filename, image_desc, chunk, is_interpolated, new_heading in zip(
+        sequence.filenames, sequence.descs, chunks.tolist(), interpolated.tolist(), headings.tolist()
+    ):
+        desc: types.Sequence = {
+            "sequenceUuid": sequence_uuids[chunk],
+        }
+        heading = new_heading if is_interpolated else image_desc.get("heading")
+        desc["source"] = source
+        if heading is not None:
+            desc["heading"] = heading
+        results.append((filename, desc))
+    return results
+
+
+def process_directory_sequence(
+    sequence: T.Tuple[T.List[str], T.List[types.Image], T.List[int]],
+    import_path: str,
+    cutoff_distance: float,
+    cutoff_time: float,
+    interpolate_directions: bool,
+) -> T.List[T.Tuple[str, types.Sequence]]:
+    """
+    Sequence descriptions of the geotagged images of a folder, from their (filenames, geotag descriptions,
+    file sizes). Runs in the worker processes with --workers.
+    """
+    return build_sequence_descs(
+        SequenceArrays.from_descs(*sequence),
+        cutoff_distance,
+        cutoff_time,
+        interpolate_directions,
+        import_path,
+    )
 
-        # cut sequence per MAX_SEQUENCE_LENGTH images
-        for idx in range(0, len(interpolated_dedup_sequence), MAX_SEQUENCE_LENGTH):
-            sequence_uuid = str(uuid.uuid4())
-            for image in interpolated_dedup_sequence[idx: idx + MAX_SEQUENCE_LENGTH]:
-                desc: types.Sequence = {
-                    "sequenceUuid": sequence_uuid,
-                }
-                heading = image.desc.get("heading")
-                desc["source"] = f"Mapilio_Kit-v{version.VERSION}"
-                if heading is not None:
-                    desc["heading"] = heading
-                image_log.log_in_memory(image.filename, "sequence_process", desc)
 
 # Deprecated
 def process_sequence_deprecated(
@@ -306,30 +353,16 @@ def process_sequence_deprecated(
                 image_log.log_in_memory(image.filename, "sequence_process", desc)
 
 
-def find_sequences(
+def sequence_directories(
     import_path: str,
     skip_subfolders: bool,
-) -> T.List[Sequence]:
-    sort_key = lambda image: image.time
-
+    file_inventory: FileInventory,
+) -> T.List[T.List[str]]:
+    """
+    Images of each folder whose images form one sequence, before splitting
+    """
     if skip_subfolders:
-        images = image_log.get_total_file_list(
-            import_path,
-            skip_subfolders=True,
-        )
-        sequence = sorted(list(load_geotag_points(images)), key=sort_key)
-        return [sequence]
-    else:
-        sequences = []
-
-        # sequence limited to the root of the files
-        for root, dirs, files in os.walk(import_path, topdown=True):
-            dirs[:] = [d for d in dirs if not d.startswith(".")]
-            images = image_log.get_total_file_list(
-                root,
-                skip_subfolders=True,
-            )
-            sequence = sorted(list(load_geotag_points(images)), key=sort_key)
-            sequences.append(sequence)
+        return [file_inventory.get_images(import_path, skip_subfolders=True)]
+    # sequence limited to the root of the files
+    return [images for _, images in file_inventory.get_image_directories()]
 
-        return sequences
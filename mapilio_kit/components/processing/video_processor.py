@@ -10,8 +10,9 @@ import mapilio_kit.components.geotagging.geotagger as geotagger
 import mapilio_kit.components.utilities.point as P_exe
 import mapilio_kit.components.blending.video_blender as video_blender
 from mapilio_kit.components.logs import image_log
+from mapilio_kit.components.logs.file_inventory import FileInventory, get_file_inventory
 from mapilio_kit.components.processing import processing
-from mapilio_kit.components.metadata.exif_metadata_writer import ImageExifModifier
+from mapilio_kit.components.metadata.exif_metadata_writer import ExifTemplate
 from mapilio_kit.components.processing.ffmpeg import get_video_info, extract_video_by_idx, extract_video_by_idx_large, sort_selected_samples
 from mapilio_kit.components.utilities.utilities import get_exiftool_specific_feature, get_video_size, calculate_chunk_size, is_large_video
 from mapilio_kit.components.logger import MapilioLogger
@@ -72,12 +73,15 @@ def video_sampler(
         video_duration_ratio=1.0,
         skip_subfolders=False,
         force_overwrite=False,
+        file_inventory: T.Optional[FileInventory] = None,
 ):
     if not os.path.exists(video_import_path):
         raise RuntimeError(f'Error, video path "{video_import_path}" does not exist')
 
     video_list = (
-        image_log.get_video_file_list(video_import_path, skip_subfolders)
+        get_file_inventory(video_import_path, skip_subfolders, file_inventory).get_videos(
+            video_import_path, skip_subfolders
+        )
         if os.path.isdir(video_import_path)
         else [video_import_path]
     )
@@ -231,6 +235,13 @@ def _extract_frames_distance_gap(video_file: str,
             raise Exception(f"Expect {sample_paths[0]} to be {idx + 1}th sample but got {frame_idx_1based}"
                             )
 
+    # make and model are the same for every frame, only the time and position change
+    exif_template = ExifTemplate()
+    if video_metadata.make:
+        exif_template.set_make(video_metadata.make)
+    if video_metadata.model:
+        exif_template.set_model(video_metadata.model)
+
     for (_, sample_paths), sample_idx in zip(frame_samples, sorted_sample_indices):
         if sample_paths[0] is None:
             continue
@@ -241,19 +252,15 @@ def _extract_frames_distance_gap(video_file: str,
         ), f"interpolated time {interp.time} should match the video sample time {video_sample.composition_time_offset}"
         start_time = datetime.datetime.strptime(str(start_time), '%Y-%m-%d %H:%M:%S.%f%z')
         timestamp = start_time + datetime.timedelta(seconds=interp.time)
-        exif_edit = ImageExifModifier(str(sample_paths[0]))
-        exif_edit.set_date_time_original(timestamp)
-        exif_edit.set_gps_datetime(timestamp)
-        exif_edit.set_lat_lon(interp.lat, interp.lon)
+        frame_exif = exif_template.frame()
+        frame_exif.set_date_time_original(timestamp)
+        frame_exif.set_gps_datetime(timestamp)
+        frame_exif.set_lat_lon(interp.lat, interp.lon)
         if interp.alt is not None:
-            exif_edit.set_altitude(interp.alt)
+            frame_exif.set_altitude(interp.alt)
         if interp.angle is not None:
-            exif_edit.set_direction(interp.angle)
-        if video_metadata.make:
-            exif_edit.set_make(video_metadata.make)
-        if video_metadata.model:
-            exif_edit.set_model(video_metadata.model)
-        exif_edit.write()
+            frame_exif.set_direction(interp.angle)
+        exif_template.write(str(sample_paths[0]), frame_exif)
 
 def _extract_frames_time_slice(video_file: str,
                                import_path: str,
@@ -317,9 +324,10 @@ def insert_video_frame_timestamp_device_infomation(
         video_filename, frame_list, start_time, sample_interval, duration_ratio
     )
 
+    exif_template = ExifTemplate()
+    exif_template.set_device_information(device_make, device_model)
+    exif_template.set_fov(field_of_view)
     for image, timestamp in zip(frame_list, video_frame_timestamps):
-        exif_edit = ImageExifModifier(image)
-        exif_edit.set_date_time_original(timestamp)
-        exif_edit.set_device_information(device_make, device_model)
-        exif_edit.set_fov(field_of_view)
-        exif_edit.write()
+        frame_exif = exif_template.frame()
+        frame_exif.set_date_time_original(timestamp)
+        exif_template.write(image, frame_exif)
@@ -0,0 +1,321 @@
+import os
+import queue
+import threading
+import time
+import typing as T
+import uuid
+
+from colorama import Fore
+
+from mapilio_kit.components.geotagging.geotag_property_handler import geotag_images
+from mapilio_kit.components.logs import image_log
+from mapilio_kit.components.logs.checkpoint import DecomposeCheckpoint
+from mapilio_kit.components.logs.file_inventory import get_file_inventory
+from mapilio_kit.components.metadata.metadata_property_handler import extract_metadata_properties
+from mapilio_kit.components.processing.sequence_builder import file_sizes, load_geotag_descs
+from mapilio_kit.components.processing.sequence_property_handler import (
+    process_directory_sequence,
+    sequence_directories,
+)
+from mapilio_kit.components.upload import uploader
+from mapilio_kit.components.upload.upload import desc_image_path, pending_upload_descs, user_items_retriever
+from mapilio_kit.components.utilities import types_fmt as types
+from mapilio_kit.components.utilities.executor import imap_in_workers
+from mapilio_kit.components.utilities.image_description_file import JSON, open_image_description_writer
+from mapilio_kit.components.utilities.insert_MAPJson import detect_sequence_anomalies, finalize_image_description
+from mapilio_kit.components.utilities.utilities import photo_uuid_generate
+from mapilio_kit.components.logger import MapilioLogger
+
+LOG = MapilioLogger().get_logger()
+
+# finished sequences waiting to be zipped, and zipped sequences waiting to be uploaded
+DEFAULT_QUEUE_SIZE = 2
+# how often a blocked stage checks whether the pipeline stopped
+_POLL_SECONDS = 0.1
+
+_DONE = object()
+
+
+class _Stopped(Exception):
+    pass
+
+
+class PipelineSequence(T.NamedTuple):
+    sequence_idx: int
+    sequence_uuid: str
+    # uploadable descriptions of the sequence, marked by the anomaly detector
+    descs: T.List[types.ImageDescriptionJSON]
+    # Information summary of the sequence for upload_desc
+    summary: T.Dict
+
+
+def _put(q: queue.Queue, item: T.Any, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+            return
+        except queue.Full:
+            continue
+    raise _Stopped()
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> T.Any:
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+    raise _Stopped()
+
+
+class _Stage(threading.Thread):
+    """
+    Applies func to the items of the inbox until the end marker and puts the results in the outbox, if any.
+    An error stops the whole pipeline and is kept for the caller.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: T.Callable[[T.Any], T.Any],
+        inbox: queue.Queue,
+        outbox: T.Optional[queue.Queue],
+        stop: threading.Event,
+    ):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop = stop
+        self.error: T.Optional[BaseException] = None
+
+    def run(self) -> None:
+        try:
+            while True:
+                item = _get(self.inbox, self.stop)
+                if item is _DONE:
+                    break
+                result = self.func(item)
+                if self.outbox is not None:
+                    _put(self.outbox, result, self.stop)
+            if self.outbox is not None:
+                _put(self.outbox, _DONE, self.stop)
+        except _Stopped:
+            pass
+        except BaseException as ex:
+            self.error = ex
+            self.stop.set()
+
+
+def _stage_kwargs(func: T.Callable, vars_args: dict) -> dict:
+    params = func.__code__.co_varnames[:func.__code__.co_argcount]
+    return {k: v for k, v in vars_args.items() if k in params}
+
+
+def _decompose_directory(
+    images: T.List[str],
+    vars_args: dict,
+    resume: bool,
+) -> T.Tuple[T.Dict[str, T.List[types.FinalImageDescription]], int, int]:
+    """
+    Run the decompose stages on the images of a folder.
+    Returns (final descriptions by sequence uuid, number of images, number of processed images).
+    """
+    pending = [image for image in images if not (resume and image_log.is_logged(image, "import_meta_data_process"))]
+    extract_metadata_properties(pending, **_stage_kwargs(extract_metadata_properties, vars_args))
+    pending = [image for image in images if not (resume and image_log.is_logged(image, "geotag_process"))]
+    geotag_images(pending, **_stage_kwargs(geotag_images, vars_args))
+
+    # sequence uuids are derived from the images, rebuilding the sequence of the folder gives the same ones
+    filenames, descs = load_geotag_descs(images)
+    for filename, desc in process_directory_sequence(
+        (filenames, descs, file_sizes(filenames, vars_args.get("file_inventory"))),
+        **_stage_kwargs(process_directory_sequence, vars_args),
+    ):
+        image_log.log_in_memory(filename, "sequence_process", desc)
+
+    sequences: T.Dict[str, T.List[types.FinalImageDescription]] = {}
+    total_images = 0
+    processed_images = 0
+    for image in images:
+        ret = finalize_image_description(image, **_stage_kwargs(finalize_image_description, vars_args))
+        if ret is None:
+            continue
+        status, final_desc = ret
+        total_images += 1
+        if status == "success":
+            processed_images += 1
+            if "heading" in final_desc:
+                sequences.setdefault(final_desc.get("sequenceUuid"), []).append(final_desc)
+    return sequences, total_images, processed_images
+
+
+def upload_pipeline(vars_args: dict, checkpoint: T.Optional[DecomposeCheckpoint] = None) -> dict:
+    """
+    Decompose, zip and upload the images of an import path as a pipeline: each folder is decomposed
+    in this thread, and its sequences are handed over to a zip thread and then an upload thread,
+    through queues of pipeline_queue_size sequences. The upload of a sequence overlaps
+    with the decompose of the next folders, and the sequences held at once are bounded by the queues.
+    """
+    import_path = vars_args["import_path"]
+    skip_subfolders = vars_args.get("skip_subfolders", False)
+    dry_run = vars_args.get("dry_run", False)
+    incremental = vars_args.get("incremental", False)
+    skip_process_errors = vars_args.get("skip_process_errors", True)
+    queue_size = vars_args.get("pipeline_queue_size") or DEFAULT_QUEUE_SIZE
+    organization_key = vars_args.get("organization_key") or None
+    project_key = vars_args.get("project_key") or None
+    desc_path = vars_args.get("desc_path") or os.path.join(import_path, "mapilio_image_description.json")
+
+    file_inventory = get_file_inventory(import_path, skip_subfolders, vars_args.get("file_inventory"))
+    uploaded = checkpoint.uploaded_images() if checkpoint is not None and incremental else set()
+
+    user_items = user_items_retriever(vars_args.get("user_name"), organization_key)
+    LOG.warning(f"{Fore.BLUE}If shooting was taken at a point outside the polygon,"
+                f" these points and images will be published publicly...{Fore.RESET}")
+    time.sleep(5)
+
+    information = {
+        "total_images": 0,
+        "processed_images": 0,
+        "failed_images": 0,
+        "duplicated_images": 0,
+        "id": uuid.uuid4().hex,
+        "group_key": str(uuid.uuid4()),
+        "device_type": "Desktop",
+        "anomaly_sequences": [],
+    }
+    results: T.List[T.Tuple[PipelineSequence, bool]] = []
+
+    def check_failed_images(failed_images: int) -> None:
+        # as insert_MAPJson, raised before the images of the failed folder or sequence are queued
+        if 0 < failed_images and not skip_process_errors:
+            raise RuntimeError(
+                f"Failed to process {failed_images} images. "
+                f"Check {desc_path} for details. Specify --skip_process_errors to skip these errors"
+            )
+
+    def zip_sequence(sequence: PipelineSequence) -> T.Tuple[PipelineSequence, uploader.ZippedSequence]:
+        uploader._validate_descs(import_path, sequence.descs, file_inventory)
+        images = uploader._group_sequences_by_uuid(sequence.descs)[sequence.sequence_uuid]
+        zipped = uploader._zip_single_sequence(
+            import_path,
+            images,
+            tqdm_desc=f"Compressing {sequence.sequence_idx + 1}",
+            stream=vars_args.get("stream_upload", False),
+        )
+        return sequence, zipped
+
+    def upload_sequence(item: T.Tuple[PipelineSequence, uploader.ZippedSequence]) -> None:
+        sequence, zipped = item
+        with zipped.fp:
+            sequence_information = uploader._upload_zipped_sequence(
+                zipped,
+                user_items,
+                sequence.sequence_idx,
+                None,
+                organization_key,
+                project_key,
+                tqdm_desc=f"Uploading {sequence.sequence_idx + 1}",
+                dry_run=dry_run,
+            )
+        response = uploader.upload_desc(
+            image_desc=[*sequence.descs, sequence.summary],
+            user_items=user_items,
+            organization_key=organization_key,
+            project_key=project_key,
+            seq_info=sequence_information,
+        )
+        results.append((sequence, bool(response and response["Success"])))
+
+    stop = threading.Event()
+    zip_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    upload_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    stages = [
+        _Stage("zip", zip_sequence, zip_queue, upload_queue, stop),
+        _Stage("upload", upload_sequence, upload_queue, None, stop),
+    ]
+    for stage in stages:
+        stage.start()
+
+    error: T.Optional[BaseException] = None
+    try:
+        with open_image_description_writer(
+            desc_path, vars_args.get("desc_format") or JSON, vars_args.get("normalize_descriptions", False)
+        ) as writer:
+            sequence_idx = 0
+            for images in sequence_directories(import_path, skip_subfolders, file_inventory):
+                sequences, total_images, processed_images = _decompose_directory(
+                    images, vars_args, vars_args.get("resume", False)
+                )
+                information["total_images"] += total_images
+                information["processed_images"] += processed_images
+                information["failed_images"] += total_images - processed_images
+                check_failed_images(total_images - processed_images)
+
+                for (sequence_uuid, descs), (marked_descs, _, counts) in zip(
+                    sequences.items(),
+                    imap_in_workers(detect_sequence_anomalies, list(sequences.values()), vars_args.get("workers")),
+                ):
+                    writer.write_all(marked_descs)
+                    for key in ("processed_images", "failed_images", "duplicated_images"):
+                        information[key] += counts[key]
+                    information["anomaly_sequences"].extend(counts["anomaly_sequences"])
+                    check_failed_images(counts["failed_images"])
+                    # a sequence with new images gets a new uuid, its images uploaded before are not sent again
+                    pending_descs = pending_upload_descs(import_path, marked_descs, uploaded)
+                    if not pending_descs:
+                        continue
+                    summary = {
+                        "Information": {
+                            **information,
+                            "total_images": len(pending_descs),
+                            "processed_images": len(descs) + counts["processed_images"],
+                            "failed_images": counts["failed_images"],
+                            "duplicated_images": counts["duplicated_images"],
+                            "anomaly_sequences": counts["anomaly_sequences"],
+                        }
+                    }
+                    upload_descs = photo_uuid_generate(
+                        user_email=vars_args.get("user_name"), descs=[*pending_descs, summary]
+                    )[:-1]
+                    _put(zip_queue, PipelineSequence(sequence_idx, sequence_uuid, upload_descs, summary), stop)
+                    sequence_idx += 1
+
+                if checkpoint is not None:
+                    checkpoint.commit()
+            writer.write({"Information": information})
+        _put(zip_queue, _DONE, stop)
+    except _Stopped:
+        pass
+    except BaseException as ex:
+        error = ex
+        stop.set()
+    finally:
+        for stage in stages:
+            stage.join()
+        # zipped sequences left behind by a stopped pipeline
+        while not upload_queue.empty():
+            item = upload_queue.get_nowait()
+            if item is not _DONE:
+                item[1].fp.close()
+
+    error = error or next((stage.error for stage in stages if stage.error is not None), None)
+    if checkpoint is not None and not dry_run:
+        checkpoint.mark_uploaded(
+            desc_image_path(import_path, desc) for sequence, success in results if success for desc in sequence.descs
+        )
+    if checkpoint is None or not incremental:
+        if os.path.isfile(desc_path):
+            os.remove(desc_path)
+    if error is not None:
+        return {'Success': False, "Error": error}
+
+    if 0 < information["failed_images"]:
+        LOG.warning(f"{Fore.YELLOW}Skipped %s failed images{Fore.RESET}", information["failed_images"])
+    uploaded_count = sum(success for _, success in results)
+    if uploaded_count:
+        LOG.warning(
+            f"{Fore.GREEN}Upload has been successfully finished. {uploaded_count} sequence(s) out of "
+            f"{len(results)} sequences were uploaded correctly. Thanks for your contributions to Mapilio 🎉!{Fore.RESET}")
+    return {'Success': True}
@@ -6,8 +6,11 @@ import json
 import logging
 
 from mapilio_kit.components.upload import uploader
+from mapilio_kit.components.logs.checkpoint import DecomposeCheckpoint
+from mapilio_kit.components.logs.file_inventory import FileInventory
 from mapilio_kit.components.auth import login
 from mapilio_kit.components.utilities import types_fmt as types
+from mapilio_kit.components.utilities.image_description_file import CameraProfiles, iter_image_descriptions
 
 from gps_anomaly.detector import Anomaly
 from mapilio_kit.components.utilities.utilities import photo_uuid_generate
@@ -18,26 +21,37 @@ init(autoreset=True)
 LOG = MapilioLogger().get_logger()
 
 
-def read_image_descriptions(desc_path: str):
+def _filter_image_descriptions(descs: T.Iterable[T.Dict]) -> T.Iterator[types.ImageDescriptionJSON]:
+    for desc in descs:
+        if ("error" not in desc) and (("heading" in desc) or ("Information" in desc)):
+            yield T.cast(types.ImageDescriptionJSON, desc)
+
+
+def read_image_descriptions(
+    desc_path: str,
+    profiles: T.Optional[CameraProfiles] = None,
+) -> T.Iterator[types.ImageDescriptionJSON]:
+    """
+    Uploadable descriptions and the Information summary of an ndjson or JSON array description file,
+    decoded one at a time. With profiles, the camera profiles of a normalized file are collected into it
+    and the descriptions are not expanded.
+    """
     if not os.path.isfile(desc_path):
         raise RuntimeError(
             f"Image description file {desc_path} not found. Please process it first. Exiting..."
         )
 
-    descs: T.List[types.ImageDescriptionJSON] = []
     if desc_path == "-":
         try:
-            descs = json.load(sys.stdin)
+            yield from _filter_image_descriptions(iter_image_descriptions(sys.stdin, profiles))
         except json.JSONDecodeError:
             raise RuntimeError(f"Invalid JSON stream from stdin")
     else:
         with open(desc_path) as fp:
             try:
-                descs = json.load(fp)
+                yield from _filter_image_descriptions(iter_image_descriptions(fp, profiles))
             except json.JSONDecodeError:
                 raise RuntimeError(f" Invalid JSON file {desc_path}")
-    descs = [desc for desc in descs if ("error" not in desc) and (("heading" in desc) or ("Information" in desc))]
-    return descs
 
 
 def zip_images(
@@ -52,7 +66,7 @@ def zip_images(
     if desc_path is None:
         desc_path = os.path.join(import_path, "mapilio_image_description.json")
 
-    descs = read_image_descriptions(desc_path)
+    descs = list(read_image_descriptions(desc_path))
 
     if not descs:
         LOG.warning(f"No images found in {desc_path}. Exiting...")
@@ -96,6 +110,17 @@ def user_items_retriever(
     return user_items
 
 
+def desc_image_path(import_path: str, desc: T.Mapping) -> str:
+    return os.path.normpath(os.path.join(import_path, desc["path"], desc["filename"]))
+
+
+def pending_upload_descs(import_path: str, descs: T.List[T.Dict], uploaded: T.Set[str]) -> T.List[T.Dict]:
+    """
+    The descriptions without the images already uploaded, summaries included
+    """
+    return [desc for desc in descs if "path" not in desc or desc_image_path(import_path, desc) not in uploaded]
+
+
 def upload(
     import_path: str,
     desc_path: T.Optional[str] = None,
@@ -103,6 +128,10 @@ def upload(
     organization_key: T.Optional[str] = None,
     project_key: T.Optional[str] = None,
     dry_run=False,
+    file_inventory: T.Optional[FileInventory] = None,
+    incremental=False,
+    upload_concurrency: T.Optional[int] = None,
+    stream_upload=False,
 ):
     if os.path.isfile(import_path):
         user_items = user_items_retriever(user_name, organization_key)
@@ -113,12 +142,25 @@ def upload(
         if desc_path is None:
             desc_path = os.path.join(import_path, "mapilio_image_description.json")
 
-        descs = read_image_descriptions(desc_path)
+        # descriptions of a normalized file stay normalized in memory, uploader expands them per sequence
+        profiles: CameraProfiles = {}
+        descs = list(read_image_descriptions(desc_path, profiles))
+        checkpoint = None
+        if incremental:
+            # the images uploaded by the previous runs are in the description file too, their sequences
+            # are rebuilt when new images are added, so they are skipped image by image
+            checkpoint = DecomposeCheckpoint.open(import_path, resume=True)
+            descs = pending_upload_descs(import_path, descs, checkpoint.uploaded_images())
+            if all("Information" in desc for desc in descs):
+                checkpoint.close()
+                LOG.info(f"All the images in {desc_path} are already uploaded")
+                return {'Success': True}
         descs = photo_uuid_generate(user_email=user_name, descs=descs)
 
         if not descs:
             LOG.warning(f"No images found in {desc_path}. Exiting...")
-
+            if checkpoint is not None:
+                checkpoint.close()
             return
         user_items = user_items_retriever(user_name, organization_key)
 
@@ -127,17 +169,31 @@ def upload(
         time.sleep(5)
 
         try:
-            uploader.upload_image_dir_and_description(
+            uploaded_sequences = uploader.upload_image_dir_and_description(
                 import_path, descs, user_items,
                 dry_run=dry_run,
                 organization_key=organization_key if organization_key else None,
-                project_key=project_key if project_key else None)
+                project_key=project_key if project_key else None,
+                file_inventory=file_inventory,
+                profiles=profiles,
+                upload_concurrency=upload_concurrency,
+                stream_upload=stream_upload)
+            if checkpoint is not None and not dry_run:
+                checkpoint.mark_uploaded(
+                    desc_image_path(import_path, desc)
+                    for desc in descs
+                    if "path" in desc and uploaded_sequences.get(desc.get("sequenceUuid"))
+                )
             #logger.warning(f"{Fore.GREEN}Upload has been successfully finished. Thanks for your contributions to Mapilio 🎉!{Fore.RESET}")
             return {'Success': True}
         except Exception as e:
             return {'Success': False, "Error": e}
         finally:
-            os.remove(desc_path)
+            if checkpoint is not None:
+                # kept for the next incremental run
+                checkpoint.close()
+            else:
+                os.remove(desc_path)
 
 
     else:
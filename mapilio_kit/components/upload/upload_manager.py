@@ -7,6 +7,7 @@ import typing as T
 
 from mapilio_kit.components.utilities.config import MAPILIO_UPLOAD_ENDPOINT_ZIP
 from mapilio_kit.components.utilities import types_fmt as types
+from mapilio_kit.components.utilities.http_session import get_session
 from mapilio_kit.components.logger import MapilioLogger
 
 LOG = MapilioLogger().get_logger()
@@ -33,7 +34,7 @@ class UploadManager:
         headers = {
             "Authorization": f"OAuth {self.user_access_token}"
         }
-        resp = requests.get(
+        resp = get_session().get(
             f"{MAPILIO_UPLOAD_ENDPOINT_ZIP}?fileName={self.session_key}&email={email}",
             headers=headers
         )
@@ -74,7 +75,7 @@ class UploadManager:
                 "project-key": project_key if project_key else None
             }
             try:
-                resp = requests.post(
+                resp = get_session().post(
                     f"{MAPILIO_UPLOAD_ENDPOINT_ZIP}",
                     headers=headers,
                     files=files
@@ -107,7 +108,7 @@ class UploadManager:
             data["organization_id"] = organization_id
             data["project_id"] = project_id
 
-        resp = requests.post(
+        resp = get_session().post(
             f"{MAPILIO_UPLOAD_ENDPOINT_ZIP}/finish_upload", headers=headers, json=data
         )
 
@@ -130,7 +131,10 @@ class FakeUploadManager(UploadManager):
 
     def upload(
         self,
+        user_items: types.User,
         data: T.IO[bytes],
+        organization_key: str = None,
+        project_key: str = None,
         offset: T.Optional[int] = None,
         chunk_size: int = DEFAULT_CHUNK_SIZE,
     ) -> str:
@@ -154,9 +158,9 @@ class FakeUploadManager(UploadManager):
     # ) -> int:
     #     return 1
 
-    def fetch_offset(self) -> int:
+    def fetch_offset(self, email=None) -> int:
         try:
-            with open(self.session_key, "rb") as fp:
+            with open(os.path.join(FakeUploadManager.upload_path, self.session_key), "rb") as fp:
                 fp.seek(0, io.SEEK_END)
                 return fp.tell()
         except FileNotFoundError:
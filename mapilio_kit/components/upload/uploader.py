@@ -1,8 +1,10 @@
+import copy
 import hashlib
 import io
 import json
 import os
 import tempfile
+import threading
 import time
 import typing as T
 import uuid
@@ -11,16 +13,30 @@ from datetime import datetime
 from typing import Optional, Iterable
 
 import jsonschema
+import numpy as np
 import requests
 from colorama import init, Fore
 from tqdm import tqdm
 
 from mapilio_kit.components.auth.login import wrap_http_exception
 from mapilio_kit.components.ipc import interprocess_communication as ipc
+from mapilio_kit.components.logs.file_inventory import FileInventory
 from mapilio_kit.components.metadata import exif_metadata_writer
-from mapilio_kit.components.upload import upload_manager
+from mapilio_kit.components.processing import processing
+from mapilio_kit.components.processing.sequence_builder import (
+    MAX_UPLOAD_SIZE,
+    TARGET_UPLOAD_SIZE,
+    ZIP_ENTRY_OVERHEAD,
+    file_sizes,
+    packed_chunk_ids,
+)
+from mapilio_kit.components.upload import upload_manager, zip_stream
+from mapilio_kit.components.utilities import serialization
 from mapilio_kit.components.utilities import types_fmt as types
 from mapilio_kit.components.utilities.config import MAPILIO_API_ENDPOINT_UPLOAD
+from mapilio_kit.components.utilities.executor import imap_in_threads
+from mapilio_kit.components.utilities.http_session import get_session
+from mapilio_kit.components.utilities.image_description_file import CameraProfiles, expand_image_description
 from mapilio_kit.components.logger import MapilioLogger
 
 init(autoreset=True)
@@ -28,7 +44,10 @@ LOG = MapilioLogger().get_logger()
 
 MIN_CHUNK_SIZE = 1024 * 1024 * 2  # 32MB
 MAX_CHUNK_SIZE = 1024 * 1024 * 16  # 64MB
-MAX_UPLOAD_SIZE = 1024 * 1024 * 750  # 750MB
+# files are read into the archive this many bytes at a time
+ZIP_BLOCK_SIZE = 1024 * 1024
+# already compressed media, stored in the archive as it is
+STORED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".heic", ".webp", ".mp4", ".mov"}
 
 
 def _find_root_dir(file_list: Iterable[str]) -> Optional[str]:
@@ -62,14 +81,22 @@ def _group_sequences_by_uuid(
     return sequences
 
 
-def _validate_descs(image_dir: str, image_descs: T.List[types.ImageDescriptionJSON]):
+def _validate_descs(
+        image_dir: str,
+        image_descs: T.List[types.ImageDescriptionJSON],
+        file_inventory: T.Optional[FileInventory] = None,
+):
     image_descs = [desc for desc in image_descs if "Information" not in desc]
     for desc in image_descs:
         jsonschema.validate(instance=desc, schema=types.ImageDescriptionJSONSchema)
+    if file_inventory is not None and file_inventory.covers(image_dir):
+        isfile = file_inventory.isfile
+    else:
+        isfile = os.path.isfile
     for desc in image_descs:
         dirpath = os.path.join(desc["path"], desc["filename"])
         abspath = os.path.join(image_dir, dirpath)
-        if not os.path.isfile(abspath):
+        if not isfile(abspath):
             raise RuntimeError(f"Image path {abspath} not found")
     return image_descs
 
@@ -81,6 +108,7 @@ def upload_desc(
         project_key: T.Optional[str] = None,
         seq_info: dict = None,
         backup_path: str = os.path.join(os.path.expanduser('~'), '.config', 'mapilio', 'configs'),
+        profiles: T.Optional[CameraProfiles] = None,
 ):
     """
     :param image_desc: description file path
@@ -89,6 +117,7 @@ def upload_desc(
     :param project_key: which organization key use project key to upload description json
     :param seq_info: information sequence data such as count and entity size, hash
     :param backup_path:
+    :param profiles: camera profiles of normalized descriptions, expanded before sending
     :return: None
     """
 
@@ -96,18 +125,29 @@ def upload_desc(
         os.makedirs(os.path.join(backup_path, user_items['SettingsEmail']))
     export_backup_path = os.path.join(backup_path, user_items['SettingsEmail'])
 
-    summary = list(image_desc).pop()
-    image_desc = list(image_desc)[:-1]
+    image_desc = list(image_desc)
+    # the summary is shared by the sequences, it is completed for this one on a copy
+    summary = copy.deepcopy(image_desc.pop())
     sequence_uuid = next(iter(seq_info))  # get first key from dict
     description_chunk = [desc for desc in image_desc if
                          desc.get("sequenceUuid") == sequence_uuid]
+    if profiles:
+        # the upload API only takes full descriptions: camera profiles save disk and memory,
+        # the request body keeps every camera field of every image
+        description_chunk = [expand_image_description(desc, profiles) for desc in description_chunk]
+    # the overlay is already applied to the uploaded images
+    description_chunk = [
+        {k: v for k, v in desc.items() if k != "exifOverlay"} if "exifOverlay" in desc else desc
+        for desc in description_chunk
+    ]
     summary['Information']['failed_images'] = summary['Information']['total_images'] - seq_info[sequence_uuid][
         'count']  # noqa
     summary['Information']['total_images'] = seq_info[sequence_uuid]['count']  # noqa
     summary['Information']['processed_images'] = seq_info[sequence_uuid]['count']  # noqa
     summary['Information']['sequence_uuid'] = sequence_uuid  # noqa
     summary['Information'].update(seq_info[sequence_uuid])  # noqa
-    payload = json.dumps({
+    # encoded once, the same bytes are sent and backed up
+    payload = serialization.dumps({
         "options": {
             "parameters": {
                 "organization_key": organization_key if organization_key else "",
@@ -124,10 +164,10 @@ def upload_desc(
 
     current_time = "{:%Y_%m_%d_%H_%M_%S}".format(datetime.now())
     try:
-        resp = requests.request("POST", url=MAPILIO_API_ENDPOINT_UPLOAD, headers=headers, data=payload)
+        resp = get_session().post(MAPILIO_API_ENDPOINT_UPLOAD, headers=headers, data=payload)
         with open(os.path.join(export_backup_path,
-                               f'{current_time}_backup_request_{organization_key}_{project_key}.json'), 'w') as f:
-            json.dump(payload, f)
+                               f'{current_time}_backup_request_{organization_key}_{project_key}.json'), 'wb') as f:
+            f.write(payload)
         resp.raise_for_status()
         if not resp.status_code // 100 == 2:
             LOG.warning(resp.text)
@@ -143,18 +183,30 @@ def upload_image_dir_and_description(
         user_items: types.User,
         dry_run=False,
         organization_key: str = None,
-        project_key: str = None
-):
+        project_key: str = None,
+        file_inventory: T.Optional[FileInventory] = None,
+        profiles: T.Optional[CameraProfiles] = None,
+        upload_concurrency: T.Optional[int] = None,
+        stream_upload: bool = False,
+) -> T.Dict[str, bool]:
+    """
+    Upload the images sequence by sequence, upload_concurrency sequences at once,
+    returns whether each sequence was uploaded, by sequence uuid in the order of the sequences
+    """
     jsonschema.validate(instance=user_items, schema=types.UserItemAttributes)
 
     image_descs = [desc for desc in descs if "heading" in desc]
 
-    _validate_descs(image_dir, image_descs)
+    _validate_descs(image_dir, image_descs, file_inventory)
 
     sequences = _group_sequences_by_uuid(image_descs)
-    response_list = []
+    concurrent = upload_concurrency is not None and 1 < upload_concurrency and 1 < len(sequences)
+    # one progress bar for all the sequences uploaded at once
+    progress = UploadProgress(len(sequences)) if concurrent else None
     LOG.info(f"{Fore.GREEN}Upload has been started.{Fore.RESET}")
-    for sequence_idx, images in enumerate(sequences.values()):
+
+    def _upload_sequence(item: T.Tuple[int, T.Tuple[str, T.Dict[str, types.FinalImageDescription]]]) -> bool:
+        sequence_idx, (sequence_uuid, images) = item
         LOG.info(
             f"🗺️{Fore.GREEN} Currently at: Sequence {sequence_idx + 1}, Total Number of Sequences: {len(sequences)}{Fore.RESET}")
         sequence_information = _zip_and_upload_single_sequence(
@@ -166,20 +218,35 @@ def upload_image_dir_and_description(
             organization_key,
             project_key,
             dry_run=dry_run,
+            progress=progress,
+            stream=stream_upload,
         )
         response = upload_desc(
             image_desc=descs,
             user_items=user_items,
             organization_key=organization_key if organization_key else None,
             project_key=project_key if project_key else None,
-            seq_info=sequence_information
+            seq_info=sequence_information,
+            profiles=profiles,
         )
+        return bool(response and response['Success'])
 
-        response_list.append(response['Success'])
-
+    uploaded_sequences = {}
+    try:
+        # each sequence has its own upload session, the results come back in the order of the sequences
+        for sequence_uuid, success in zip(
+            sequences, imap_in_threads(_upload_sequence, list(enumerate(sequences.items())), upload_concurrency)
+        ):
+            uploaded_sequences[sequence_uuid] = success
+    finally:
+        if progress is not None:
+            progress.close()
+
+    response_list = list(uploaded_sequences.values())
     if any(response_list):
         LOG.warning(
             f"{Fore.GREEN}Upload has been successfully finished. {sum(response_list)} sequence(s) out of {len(response_list)} sequences were uploaded correctly. Thanks for your contributions to Mapilio 🎉!{Fore.RESET}")
+    return uploaded_sequences
 
 
 def zip_image_dir(
@@ -189,14 +256,36 @@ def zip_image_dir(
     sequences = _group_sequences_by_uuid(image_descs)
     os.makedirs(zip_dir, exist_ok=True)
     for sequence_uuid, sequence in sequences.items():
-        # FIXME: do not use UUID as filename
-        zip_filename_wip = os.path.join(
-            zip_dir, f"mapilio_tools_{sequence_uuid}.{os.getpid()}.wip"
-        )
-        with open(zip_filename_wip, "wb") as fp:
-            sequence_md5 = _zip_sequence(image_dir, sequence, fp)
-        zip_filename = os.path.join(zip_dir, f"mapilio_tools_{sequence_md5}.zip")
-        os.rename(zip_filename_wip, zip_filename)
+        for part in _pack_sequence(image_dir, sequence):
+            # FIXME: do not use UUID as filename
+            zip_filename_wip = os.path.join(
+                zip_dir, f"mapilio_tools_{sequence_uuid}.{os.getpid()}.wip"
+            )
+            with open(zip_filename_wip, "wb") as fp:
+                sequence_md5 = _zip_sequence(image_dir, part, fp)
+            zip_filename = os.path.join(zip_dir, f"mapilio_tools_{sequence_md5}.zip")
+            os.rename(zip_filename_wip, zip_filename)
+
+
+def _pack_sequence(
+        image_dir: str,
+        sequence: T.Dict[str, types.FinalImageDescription],
+) -> T.List[T.Dict[str, types.FinalImageDescription]]:
+    """
+    Images of a sequence in capture time order, split into archives of TARGET_UPLOAD_SIZE bytes
+    and at most MAX_UPLOAD_SIZE bytes
+    """
+    file_list = sorted(sequence, key=lambda path: sequence[path]["captureTime"])
+    sizes = np.asarray(file_sizes(os.path.join(image_dir, file) for file in file_list), dtype=np.int64)
+    chunks = packed_chunk_ids(
+        np.zeros(1, dtype=np.intp), sizes + ZIP_ENTRY_OVERHEAD, len(file_list), TARGET_UPLOAD_SIZE, MAX_UPLOAD_SIZE
+    )
+    parts: T.List[T.Dict[str, types.FinalImageDescription]] = []
+    for file, chunk in zip(file_list, chunks.tolist()):
+        if chunk == len(parts):
+            parts.append({})
+        parts[chunk][file] = sequence[file]
+    return parts
 
 
 class Notifier:
@@ -214,12 +303,71 @@ class Notifier:
         ipc.send_message("upload", payload)
 
 
+class UploadProgress:
+    """
+    Bytes uploaded over the sequences uploaded at once, the total growing as the sequences are zipped
+    """
+
+    def __init__(self, total_sequences: int):
+        self._lock = threading.Lock()
+        self.pbar = tqdm(
+            total=0,
+            desc=f"Uploading {total_sequences} sequences",
+            unit="B",
+            unit_scale=True,
+            unit_divisor=1024,
+        )
+
+    def add_total(self, entity_size: int) -> None:
+        with self._lock:
+            self.pbar.total += entity_size
+            self.pbar.refresh()
+
+    def update(self, uploaded_bytes: int) -> None:
+        with self._lock:
+            self.pbar.update(uploaded_bytes)
+
+    def close(self) -> None:
+        self.pbar.close()
+
+
+class _SequenceProgress:
+    """
+    Progress of one sequence in an UploadProgress, rewound to the server offset when the upload resumes
+    """
+
+    def __init__(self, progress: UploadProgress, entity_size: int):
+        self.progress = progress
+        self.uploaded_bytes = 0
+        progress.add_total(entity_size)
+
+    def start(self, offset: int) -> None:
+        self.progress.update(offset - self.uploaded_bytes)
+        self.uploaded_bytes = offset
+
+    def notify_progress(self, chunk: bytes, _) -> None:
+        self.uploaded_bytes += len(chunk)
+        self.progress.update(len(chunk))
+
+
+def _zip_entry(abspath: str, relpath: str, compress_type: int) -> zipfile.ZipInfo:
+    # the file time instead of the current time, so that zipping again gives the same archive
+    zinfo = zipfile.ZipInfo.from_file(abspath, relpath)
+    zinfo.compress_type = compress_type
+    return zinfo
+
+
 def _zip_sequence(
         image_dir: str,
         sequences: T.Dict[str, types.FinalImageDescription],
         fp: T.IO[bytes],
         tqdm_desc: str = "Compressing",
+        disable_progress: bool = False,
 ) -> str:
+    """
+    Zip the images of a sequence, streaming each file in blocks of ZIP_BLOCK_SIZE bytes and hashing them
+    in the same pass. Media that is already compressed is stored, the rest deflated.
+    """
     file_list = list(sequences.keys())
     first_image = list(sequences.values())[0]
 
@@ -232,16 +380,33 @@ def _zip_sequence(
 
     file_list.sort(key=lambda path: sequences[path]["captureTime"])
 
-    # compressing
     with zipfile.ZipFile(fp, "w", zipfile.ZIP_DEFLATED) as ziph:
-        for file in tqdm(file_list, unit="files", desc=tqdm_desc):
+        for file in tqdm(file_list, unit="files", desc=tqdm_desc, disable=disable_progress):
             relpath = os.path.relpath(file, root_dir)
             abspath = os.path.join(image_dir, file)
-            edit = exif_metadata_writer.ImageExifModifier(abspath)
-            # edit.add_image_description(sequences[file]) # comment because changing md5sum values each run
-            image_bytes = edit.serialize_image_data()
-            sequence_md5.update(image_bytes)
-            ziph.writestr(relpath, image_bytes)
+            ext = os.path.splitext(file)[1].lower()
+            zinfo = _zip_entry(
+                abspath, relpath, zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+            )
+            overlay = sequences[file].get("exifOverlay")
+            if overlay:
+                # the EXIF changes of --exif_overlay go to the zipped copy only, the image is untouched
+                # each image is read once at zip time, its tags are not worth caching
+                edit = exif_metadata_writer.ImageExifModifier(abspath, cache=False)
+                processing.apply_exif_tag_changes(edit, overlay)
+                image_bytes = edit.serialize_image_data()
+                sequence_md5.update(image_bytes)
+                ziph.writestr(zinfo, image_bytes)
+                continue
+
+            # the file bytes as they are: adding the description to the EXIF would change the md5sum every run
+            with open(abspath, "rb") as src, ziph.open(zinfo, "w") as dst:
+                while True:
+                    block = src.read(ZIP_BLOCK_SIZE)
+                    if not block:
+                        break
+                    sequence_md5.update(block)
+                    dst.write(block)
 
     return sequence_md5.hexdigest()
 
@@ -312,11 +477,13 @@ def _upload_zipfile_fp(
         tqdm_desc: str = "Uploading",
         notifier: Optional[Notifier] = None,
         dry_run: bool = False,
+        progress: Optional[UploadProgress] = None,
 ) -> str:
     """
     :param fp: the file handle to a zipped sequence file. Will always upload from the beginning
     :param entity_size: the size of the whole zipped sequence file
     :param session_key: the upload session key used to identify an upload
+    :param progress: progress shared with the other sequences uploaded at once, instead of a progress bar
     :return: cluster ID
     """
 
@@ -345,6 +512,7 @@ def _upload_zipfile_fp(
         nonlocal retries
         retries = 0
 
+    sequence_progress = _SequenceProgress(progress, entity_size) if progress is not None else None
     while True:
         with tqdm(
                 total=upload_service.entity_size,
@@ -352,6 +520,7 @@ def _upload_zipfile_fp(
                 unit="B",
                 unit_scale=True,
                 unit_divisor=1024,
+                disable=progress is not None,
         ) as pbar:
             fp.seek(0, io.SEEK_SET)
             update_pbar = lambda chunk, _: pbar.update(len(chunk))
@@ -363,6 +532,9 @@ def _upload_zipfile_fp(
                     update_pbar,
                     _reset_retries,
                 ]
+                if sequence_progress is not None:
+                    sequence_progress.start(offset)
+                    upload_service.callbacks.append(sequence_progress.notify_progress)
                 if notifier:
                     notifier.uploaded_bytes = offset
                     upload_service.callbacks.append(notifier.notify_progress)
@@ -390,19 +562,52 @@ def _upload_zipfile_fp(
     return uploaded_hash
 
 
-def _zip_and_upload_single_sequence(
+class ZippedSequence(T.NamedTuple):
+    sequence_uuid: str
+    root_dir: str
+    count: int
+    # temporary file deleted when closed, or the archive produced as it is read with stream
+    fp: T.IO[bytes]
+    entity_size: int
+    md5: str
+
+
+def _stream_single_sequence(
         image_dir: str,
         sequences: T.Dict[str, types.FinalImageDescription],
-        user_items: types.User,
-        sequence_idx: int,
-        total_sequences: int,
-        organization_key: str = None,
-        project_key: str = None,
-        dry_run=False,
-) -> dict:
-    def _build_desc(desc: str) -> str:
-        return f"{desc} {sequence_idx + 1}/{total_sequences}"
+        sequence_uuid: str,
+        root_dir: str,
+) -> T.Optional[ZippedSequence]:
+    """
+    The archive of a sequence produced while it is uploaded, without a temporary file,
+    None when a member has to be modified or compressed
+    """
+    file_list = sorted(sequences, key=lambda path: sequences[path]["captureTime"])
+    if any(
+        sequences[file].get("exifOverlay") or os.path.splitext(file)[1].lower() not in STORED_EXTENSIONS
+        for file in file_list
+    ):
+        return None
+    layout = zip_stream.StoredZipLayout(
+        [(os.path.join(image_dir, file), os.path.relpath(file, root_dir)) for file in file_list]
+    )
+    # the layout key identifies the upload session instead of the md5 of the content, known only once read
+    return ZippedSequence(
+        sequence_uuid, root_dir, len(sequences), zip_stream.StoredZipReader(layout), layout.size, layout.key
+    )
 
+
+def _zip_single_sequence(
+        image_dir: str,
+        sequences: T.Dict[str, types.FinalImageDescription],
+        tqdm_desc: str = "Compressing",
+        disable_progress: bool = False,
+        stream: bool = False,
+) -> ZippedSequence:
+    """
+    Zip the images of a sequence to a temporary file, or with stream, lay out the archive
+    to produce it while it is uploaded when its members can be stored as they are
+    """
     file_list = list(sequences.keys())
     first_image = list(sequences.values())[0]
     sequence_uuid = first_image.get("sequenceUuid")
@@ -411,44 +616,104 @@ def _zip_and_upload_single_sequence(
     if root_dir is None:
         raise RuntimeError(f"Unable to find the root dir of sequence {sequence_uuid}")
 
-    sequence_info = {}
-    with tempfile.NamedTemporaryFile() as fp:
+    if stream:
+        streamed = _stream_single_sequence(image_dir, sequences, sequence_uuid, root_dir)
+        if streamed is not None:
+            return streamed
+
+    fp = tempfile.NamedTemporaryFile()
+    try:
         sequence_md5 = _zip_sequence(
-            image_dir, sequences, fp, tqdm_desc=_build_desc("Compressing")
+            image_dir, sequences, fp, tqdm_desc=tqdm_desc, disable_progress=disable_progress
         )
-
         fp.seek(0, io.SEEK_END)  # noqa
         entity_size = fp.tell()
+    except BaseException:
+        fp.close()
+        raise
+    return ZippedSequence(sequence_uuid, root_dir, len(sequences), fp, entity_size, sequence_md5)
 
-        # chunk size
-        avg_image_size = int(entity_size / len(sequences))
-        chunk_size = min(max(avg_image_size, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
 
-        notifier = Notifier(
-            {
-                "sequence_path": root_dir,
-                "sequence_uuid": sequence_uuid,
-                "total_bytes": entity_size,
-                "sequence_idx": sequence_idx,
-                "total_sequences": total_sequences,
-            }
-        )
-        uploaded_hash = _upload_zipfile_fp(
+def _upload_zipped_sequence(
+        zipped: ZippedSequence,
+        user_items: types.User,
+        sequence_idx: int,
+        total_sequences: T.Optional[int],
+        organization_key: str = None,
+        project_key: str = None,
+        tqdm_desc: str = "Uploading",
+        dry_run=False,
+        progress: T.Optional[UploadProgress] = None,
+) -> dict:
+    """
+    Upload a zipped sequence, returns the sequence information by sequence uuid for upload_desc
+    """
+    # chunk size
+    avg_image_size = int(zipped.entity_size / zipped.count)
+    chunk_size = min(max(avg_image_size, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+
+    notifier = Notifier(
+        {
+            "sequence_path": zipped.root_dir,
+            "sequence_uuid": zipped.sequence_uuid,
+            "total_bytes": zipped.entity_size,
+            "sequence_idx": sequence_idx,
+            "total_sequences": total_sequences,
+        }
+    )
+    uploaded_hash = _upload_zipfile_fp(
+        user_items,
+        zipped.fp,
+        zipped.entity_size,
+        chunk_size,
+        organization_key,
+        project_key,
+        session_key=f"mapilio_tools_{zipped.md5}.zip",
+        tqdm_desc=tqdm_desc,
+        notifier=notifier,
+        dry_run=dry_run,
+        progress=progress,
+    )
+    return {
+        zipped.sequence_uuid: {
+            "count": zipped.count,
+            "size": zipped.entity_size / 1024 ** 2,
+            "hash": uploaded_hash
+        }
+    }
+
+
+def _zip_and_upload_single_sequence(
+        image_dir: str,
+        sequences: T.Dict[str, types.FinalImageDescription],
+        user_items: types.User,
+        sequence_idx: int,
+        total_sequences: int,
+        organization_key: str = None,
+        project_key: str = None,
+        dry_run=False,
+        progress: T.Optional[UploadProgress] = None,
+        stream: bool = False,
+) -> dict:
+    def _build_desc(desc: str) -> str:
+        return f"{desc} {sequence_idx + 1}/{total_sequences}"
+
+    zipped = _zip_single_sequence(
+        image_dir,
+        sequences,
+        tqdm_desc=_build_desc("Compressing"),
+        disable_progress=progress is not None,
+        stream=stream,
+    )
+    with zipped.fp:
+        return _upload_zipped_sequence(
+            zipped,
             user_items,
-            fp,
-            entity_size,
-            chunk_size,
+            sequence_idx,
+            total_sequences,
             organization_key,
             project_key,
-            session_key=f"mapilio_tools_{sequence_md5}.zip",
             tqdm_desc=_build_desc("Uploading"),
-            notifier=notifier,
             dry_run=dry_run,
+            progress=progress,
         )
-        sequence_info[sequence_uuid] = {
-            "count": len(sequences),
-            "size": entity_size / 1024 ** 2,
-            "hash": uploaded_hash
-        }
-
-        return sequence_info
@@ -0,0 +1,282 @@
+import bisect
+import hashlib
+import io
+import os
+import struct
+import threading
+import typing as T
+import zipfile
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# files are read for their CRC this many bytes at a time
+READ_BLOCK_SIZE = 1024 * 1024
+
+# flag bit 3: the CRC and the sizes follow the member data in a data descriptor
+DATA_DESCRIPTOR_FLAG = 0x08
+DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+STRUCT_DATA_DESCRIPTOR = "<4sLLL"
+SIZE_DATA_DESCRIPTOR = struct.calcsize(STRUCT_DATA_DESCRIPTOR)
+
+
+def _encode_filename(zinfo: zipfile.ZipInfo) -> T.Tuple[bytes, int]:
+    try:
+        return zinfo.filename.encode("ascii"), zinfo.flag_bits
+    except UnicodeEncodeError:
+        # language encoding flag, the name is UTF-8
+        return zinfo.filename.encode("utf-8"), zinfo.flag_bits | 0x800
+
+
+def _file_crc(path: str) -> int:
+    crc = 0
+    with open(path, "rb") as fp:
+        while True:
+            block = fp.read(READ_BLOCK_SIZE)
+            if not block:
+                return crc
+            crc = zlib.crc32(block, crc)
+
+
+class StoredZipLayout:
+    """
+    Layout of a zip archive storing files as they are: every member size is known from the file stats,
+    so the offset of each member and the size of the whole archive are known before any file is read.
+    The CRC of each member is written in a data descriptor after its data, it is computed from the data
+    as it is read, so a file read in order is read once. Only out of order reads read a file again.
+    """
+
+    def __init__(self, files: T.Sequence[T.Tuple[str, str]]):
+        """
+        files: (path on disk, name in the archive) of each member, in archive order
+        """
+        self.paths: T.List[str] = []
+        self.members: T.List[zipfile.ZipInfo] = []
+        # offset and local header size of each member
+        self.offsets: T.List[int] = []
+        self.header_sizes: T.List[int] = []
+        self._crcs: T.Dict[int, int] = {}
+        # (bytes read so far, CRC of these bytes) of each member read in order
+        self._partial_crcs: T.Dict[int, T.Tuple[int, int]] = {}
+        # member index and file of the member being read
+        self._current: T.Optional[T.Tuple[int, T.BinaryIO]] = None
+        self._lock = threading.Lock()
+
+        key = hashlib.md5()
+        offset = 0
+        for path, name in files:
+            zinfo = zipfile.ZipInfo.from_file(path, name)
+            zinfo.compress_type = zipfile.ZIP_STORED
+            zinfo.compress_size = zinfo.file_size
+            zinfo.CRC = 0
+            zinfo.flag_bits |= DATA_DESCRIPTOR_FLAG
+            if zipfile.ZIP64_LIMIT <= zinfo.file_size:
+                raise ValueError(f"{path} is too large for a stored zip member")
+            header_size = len(self._local_header(zinfo))
+            self.paths.append(path)
+            self.members.append(zinfo)
+            self.offsets.append(offset)
+            self.header_sizes.append(header_size)
+            offset += header_size + zinfo.file_size + SIZE_DATA_DESCRIPTOR
+            st = os.stat(path)
+            key.update(f"{name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+
+        self.central_directory_offset = offset
+        self.central_directory_size = sum(
+            zipfile.sizeCentralDir + len(_encode_filename(zinfo)[0]) for zinfo in self.members
+        )
+        self.size = self.central_directory_offset + self.central_directory_size + zipfile.sizeEndCentDir
+        if zipfile.ZIP64_LIMIT <= self.size or zipfile.ZIP_FILECOUNT_LIMIT <= len(self.members):
+            raise ValueError("The archive needs zip64, which is not supported by the stored layout")
+        # identifies the archive like an md5 of its content would, as long as the files do not change
+        self.key = key.hexdigest()
+
+    @staticmethod
+    def _local_header(zinfo: zipfile.ZipInfo) -> bytes:
+        # with the data descriptor flag, the CRC and the sizes of the local header are 0
+        return zinfo.FileHeader(zip64=False)
+
+    def crc(self, idx: int) -> int:
+        if idx not in self._crcs:
+            # the member was not read in order, read it again for its CRC
+            self._crcs[idx] = _file_crc(self.paths[idx]) if self.members[idx].file_size else 0
+        return self._crcs[idx]
+
+    def local_header(self, idx: int) -> bytes:
+        return self._local_header(self.members[idx])
+
+    def data_descriptor(self, idx: int) -> bytes:
+        zinfo = self.members[idx]
+        return struct.pack(
+            STRUCT_DATA_DESCRIPTOR, DATA_DESCRIPTOR_SIGNATURE, self.crc(idx), zinfo.compress_size, zinfo.file_size
+        )
+
+    def _update_crc(self, idx: int, position: int, data: bytes) -> None:
+        if idx in self._crcs:
+            return
+        read, crc = self._partial_crcs.get(idx, (0, 0))
+        if position != read:
+            return
+        read, crc = read + len(data), zlib.crc32(data, crc)
+        if read == self.members[idx].file_size:
+            self._crcs[idx] = crc
+            self._partial_crcs.pop(idx, None)
+        else:
+            self._partial_crcs[idx] = (read, crc)
+
+    def _read_data(self, idx: int, position: int, size: int) -> bytes:
+        if self._current is None or self._current[0] != idx:
+            self._close_current()
+            self._current = (idx, open(self.paths[idx], "rb"))
+        fp = self._current[1]
+        if fp.tell() != position:
+            fp.seek(position)
+        data = fp.read(size)
+        if not data:
+            raise RuntimeError(f"{self.paths[idx]} changed while it was uploaded")
+        self._update_crc(idx, position, data)
+        return data
+
+    def central_directory(self) -> bytes:
+        records = []
+        for idx, zinfo in enumerate(self.members):
+            filename, flag_bits = _encode_filename(zinfo)
+            dt = zinfo.date_time
+            dosdate = (dt[0] - 1980) << 9 | dt[1] << 5 | dt[2]
+            dostime = dt[3] << 11 | dt[4] << 5 | (dt[5] // 2)
+            records.append(struct.pack(
+                zipfile.structCentralDir,
+                zipfile.stringCentralDir,
+                zinfo.create_version,
+                zinfo.create_system,
+                zinfo.extract_version,
+                zinfo.reserved,
+                flag_bits,
+                zinfo.compress_type,
+                dostime,
+                dosdate,
+                self.crc(idx),
+                zinfo.compress_size,
+                zinfo.file_size,
+                len(filename),
+                0,
+                0,
+                0,
+                zinfo.internal_attr,
+                zinfo.external_attr,
+                self.offsets[idx],
+            ))
+            records.append(filename)
+        records.append(struct.pack(
+            zipfile.structEndArchive,
+            zipfile.stringEndArchive,
+            0,
+            0,
+            len(self.members),
+            len(self.members),
+            self.central_directory_size,
+            self.central_directory_offset,
+            0,
+        ))
+        return b"".join(records)
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        """
+        size bytes of the archive from offset, fewer at the end of the archive
+        """
+        with self._lock:
+            return self._read_at(offset, size)
+
+    def _read_at(self, offset: int, size: int) -> bytes:
+        end = min(self.size, offset + size)
+        parts = []
+        while offset < end:
+            if self.central_directory_offset <= offset:
+                tail = self.central_directory()
+                start = offset - self.central_directory_offset
+                parts.append(tail[start: start + end - offset])
+                break
+            idx = bisect.bisect_right(self.offsets, offset) - 1
+            header_end = self.offsets[idx] + self.header_sizes[idx]
+            data_end = header_end + self.members[idx].file_size
+            if offset < header_end:
+                header = self.local_header(idx)
+                part = header[offset - self.offsets[idx]: end - self.offsets[idx]]
+            elif offset < data_end:
+                part = self._read_data(idx, offset - header_end, min(end, data_end) - offset)
+            else:
+                descriptor = self.data_descriptor(idx)
+                part = descriptor[offset - data_end: end - data_end]
+            parts.append(part)
+            offset += len(part)
+        return b"".join(parts)
+
+    def close(self) -> None:
+        """
+        Close the file of the member being read, it is opened again by the next read
+        """
+        with self._lock:
+            self._close_current()
+
+    def _close_current(self) -> None:
+        if self._current is not None:
+            self._current[1].close()
+            self._current = None
+
+
+class StoredZipReader(io.RawIOBase):
+    """
+    Seekable file object over the bytes of a StoredZipLayout, produced as they are read. The next block
+    after each read is prepared in the background, so reading the files overlaps with sending the last block.
+    """
+
+    def __init__(self, layout: StoredZipLayout):
+        super().__init__()
+        self.layout = layout
+        self._position = 0
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        # (offset, size, bytes) of the block read ahead
+        self._prefetch: T.Optional[T.Tuple[int, int, Future]] = None
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        elif whence == io.SEEK_END:
+            self._position = self.layout.size + offset
+        else:
+            raise ValueError(f"Invalid whence {whence}")
+        if self._position < 0:
+            raise ValueError(f"Negative seek position {self._position}")
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        size = len(buffer)
+        if self._prefetch is not None and self._prefetch[:2] == (self._position, size):
+            data = self._prefetch[2].result()
+        else:
+            data = self.layout.read_at(self._position, size)
+        self._position += len(data)
+        buffer[:len(data)] = data
+        if self._position < self.layout.size:
+            self._prefetch = (
+                self._position, size, self._executor.submit(self.layout.read_at, self._position, size)
+            )
+        else:
+            self._prefetch = None
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._executor.shutdown(wait=True)
+            self.layout.close()
+        super().close()
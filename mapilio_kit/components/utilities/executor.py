@@ -0,0 +1,63 @@
+import typing as T
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+
+_IT = T.TypeVar("_IT")
+_RT = T.TypeVar("_RT")
+
+
+def imap_in_workers(
+    func: T.Callable[[_IT], _RT],
+    items: T.Sequence[_IT],
+    workers: T.Optional[int] = None,
+    chunksize: int = 1,
+) -> T.Iterator[_RT]:
+    """
+    Apply func to every item over a pool of `workers` processes and yield the results in input order.
+    With workers None or <= 1 everything runs in the current process.
+
+    func and the items must be picklable, i.e. func is a module level function or a functools.partial of one.
+    """
+    if workers is None or workers <= 1 or len(items) <= 1:
+        yield from map(func, items)
+        return
+
+    with Pool(processes=min(workers, len(items))) as pool:
+        yield from pool.imap(func, items, chunksize=chunksize)
+
+
+def imap_in_threads(
+    func: T.Callable[[_IT], _RT],
+    items: T.Sequence[_IT],
+    threads: T.Optional[int] = None,
+) -> T.Iterator[_RT]:
+    """
+    Apply func to every item over a pool of `threads` threads and yield the results in input order,
+    for work that waits on the network. With threads None or <= 1 everything runs in the current thread.
+    The items not started yet are cancelled when an item fails or the iteration stops.
+    """
+    if threads is None or threads <= 1 or len(items) <= 1:
+        yield from map(func, items)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(threads, len(items))) as executor:
+        futures = [executor.submit(func, item) for item in items]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def split_batches(items: T.Sequence[_IT], batch_size: int) -> T.List[T.Sequence[_IT]]:
+    return [items[idx: idx + batch_size] for idx in range(0, len(items), batch_size)]
+
+
+def batch_size_for_workers(total: int, workers: T.Optional[int], max_batch_size: int) -> int:
+    """
+    Batch size that gives every worker a few batches, so a slow batch does not leave the others idle
+    """
+    if workers is None or workers <= 1:
+        return max_batch_size
+    return max(1, min(max_batch_size, -(-total // (workers * 4))))
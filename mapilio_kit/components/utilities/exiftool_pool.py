@@ -0,0 +1,199 @@
+import atexit
+import json
+import os
+import platform
+import queue
+import subprocess
+import threading
+import time
+import typing as T
+from concurrent.futures import ThreadPoolExecutor
+
+from mapilio_kit.components.logger import MapilioLogger
+
+LOG = MapilioLogger().get_logger()
+
+DEFAULT_POOL_SIZE = min(4, os.cpu_count() or 1)
+DEFAULT_BATCH_SIZE = 64
+EXIFTOOL_READY = b"{ready}"
+# seconds a worker may take to answer a batch, it is killed and restarted past that
+DEFAULT_TIMEOUT = float(os.getenv("MAPILIO_EXIFTOOL_TIMEOUT", "120"))
+
+
+def _normalize_path(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+class ExifToolWorker:
+    """
+    A long-lived `exiftool -stay_open True -@ -` process answering batches of files with `-j -n` JSON.
+    Its output is read by a thread, so that a batch exiftool hangs on can be given up after timeout seconds.
+    """
+
+    def __init__(self, exiftool_path: T.Optional[str] = None, timeout: float = DEFAULT_TIMEOUT):
+        self.exiftool_path = exiftool_path if exiftool_path is not None else "exiftool"
+        self.timeout = timeout
+        self._process: T.Optional[subprocess.Popen] = None
+        # output lines of the process, b"" once it exited
+        self._lines: "queue.Queue[bytes]" = queue.Queue()
+
+    def _start(self) -> subprocess.Popen:
+        command = [
+            self.exiftool_path,
+            "-stay_open", "True",
+            "-@", "-",
+            "-common_args", "-j", "-n", "-charset", "filename=utf8",
+        ]
+        if platform.system() == "Windows":
+            process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                       stderr=subprocess.DEVNULL, creationflags=subprocess.CREATE_NO_WINDOW)
+        else:
+            process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                       stderr=subprocess.DEVNULL)
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read_lines, args=(process.stdout, self._lines), daemon=True).start()
+        return process
+
+    @staticmethod
+    def _read_lines(stdout: T.IO[bytes], lines: "queue.Queue[bytes]") -> None:
+        for line in iter(stdout.readline, b""):
+            lines.put(line)
+        lines.put(b"")
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def _request(self, files: T.Sequence[str]) -> bytes:
+        if not self.is_alive():
+            self._process = self._start()
+        process = T.cast(subprocess.Popen, self._process)
+
+        args = "".join(f"{file}\n" for file in files) + "-execute\n"
+        process.stdin.write(args.encode("utf-8"))
+        process.stdin.flush()
+
+        output = []
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                self._kill()
+                raise subprocess.TimeoutExpired(process.args, self.timeout)
+            if not line:
+                # reaped now, it may not have exited yet and would look alive to the next request
+                self._kill()
+                raise BrokenPipeError("exiftool exited before answering the request")
+            if line.rstrip() == EXIFTOOL_READY:
+                break
+            output.append(line)
+        return b"".join(output)
+
+    def execute_json(self, files: T.Sequence[str]) -> T.List[T.Optional[T.Dict[str, T.Any]]]:
+        """
+        Metadata of each file in the same order, None for files exiftool could not read
+        """
+        if not files:
+            return []
+        try:
+            try:
+                output = self._request(files)
+            except FileNotFoundError:
+                raise
+            except (BrokenPipeError, OSError, ValueError):
+                # the worker crashed or hung up, restart it once and retry the batch
+                LOG.warning("exiftool worker stopped unexpectedly, restarting it")
+                self.close()
+                output = self._request(files)
+        except subprocess.TimeoutExpired:
+            # the worker was killed, the next batch starts a new one
+            LOG.warning(f"exiftool did not answer within {self.timeout}s, skipping {len(files)} files")
+            return [None] * len(files)
+
+        records = json.loads(output.decode("utf-8")) if output.strip() else []
+        by_path = {_normalize_path(record.get("SourceFile", "")): record for record in records}
+        return [by_path.get(_normalize_path(file)) for file in files]
+
+    def _kill(self) -> None:
+        process, self._process = self._process, None
+        if process is not None:
+            process.kill()
+            process.wait()
+
+    def close(self) -> None:
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            if process.poll() is None:
+                process.stdin.write(b"-stay_open\nFalse\n")
+                process.stdin.flush()
+                process.wait(timeout=5)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            process.kill()
+
+
+class ExifToolPool:
+    """
+    A fixed number of ExifToolWorker shared by threads. Workers are started on first use.
+    """
+
+    def __init__(self, size: T.Optional[int] = None, exiftool_path: T.Optional[str] = None):
+        self.size = max(1, size if size is not None else DEFAULT_POOL_SIZE)
+        self.exiftool_path = exiftool_path
+        self._workers: "queue.Queue[ExifToolWorker]" = queue.Queue()
+        for _ in range(self.size):
+            self._workers.put(ExifToolWorker(exiftool_path))
+
+    def _execute_batch(self, files: T.Sequence[str]) -> T.List[T.Optional[T.Dict[str, T.Any]]]:
+        worker = self._workers.get()
+        try:
+            return worker.execute_json(files)
+        finally:
+            self._workers.put(worker)
+
+    def execute_json(
+        self, files: T.Sequence[str], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> T.List[T.Optional[T.Dict[str, T.Any]]]:
+        """
+        Split the files into batches and run them on the workers in parallel
+        """
+        batches = [files[idx: idx + batch_size] for idx in range(0, len(files), batch_size)]
+        if len(batches) <= 1:
+            return self._execute_batch(files)
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            results = executor.map(self._execute_batch, batches)
+            return [record for batch in results for record in batch]
+
+    def close(self) -> None:
+        while True:
+            try:
+                worker = self._workers.get_nowait()
+            except queue.Empty:
+                break
+            worker.close()
+
+
+_POOLS: T.Dict[T.Tuple[T.Optional[str], int], ExifToolPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_exiftool_pool(exiftool_path: T.Optional[str] = None, size: T.Optional[int] = None) -> ExifToolPool:
+    """
+    The process-wide pool for the given exiftool executable, created on first use
+    """
+    size = max(1, size if size is not None else DEFAULT_POOL_SIZE)
+    with _POOLS_LOCK:
+        pool = _POOLS.get((exiftool_path, size))
+        if pool is None:
+            pool = ExifToolPool(size, exiftool_path)
+            _POOLS[(exiftool_path, size)] = pool
+        return pool
+
+
+@atexit.register
+def close_exiftool_pools() -> None:
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            pool.close()
+        _POOLS.clear()
@@ -0,0 +1,78 @@
+import os
+import threading
+import typing as T
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# connections kept alive per host, at least the number of sequences uploaded at once
+DEFAULT_POOL_SIZE = int(os.getenv("MAPILIO_HTTP_POOL_SIZE", "10"))
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (
+    float(os.getenv("MAPILIO_HTTP_CONNECT_TIMEOUT", "10")),
+    float(os.getenv("MAPILIO_HTTP_READ_TIMEOUT", "300")),
+)
+DEFAULT_RETRIES = int(os.getenv("MAPILIO_HTTP_RETRIES", "3"))
+# methods retried on read errors and on the statuses below, a POST may have been applied already
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+RETRY_STATUSES = (502, 503, 504)
+
+_SESSION: T.Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter with a default timeout for the requests sent without one
+    """
+
+    def __init__(self, timeout: T.Tuple[float, float] = DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def create_session(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    timeout: T.Tuple[float, float] = DEFAULT_TIMEOUT,
+    retries: int = DEFAULT_RETRIES,
+) -> requests.Session:
+    """
+    Session keeping pool_size connections alive per host, with a default timeout. Connection errors
+    are retried for every method, since nothing was sent; read errors and 502/503/504 responses
+    only for the idempotent methods.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=0.5,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=IDEMPOTENT_METHODS,
+        raise_on_status=False,
+    )
+    adapter = TimeoutHTTPAdapter(
+        timeout=timeout, pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    The session shared by all the API calls of this process
+    """
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                _SESSION = create_session()
+    return _SESSION
@@ -0,0 +1,206 @@
+import contextlib
+import json
+import sys
+import typing as T
+
+from mapilio_kit.components.utilities import serialization
+
+# one description per line, the Information summary last, read with iter_image_descriptions
+NDJSON = "ndjson"
+# an indented JSON array of the descriptions, the default, which json.load reads
+JSON = "json"
+DESC_FORMATS = (NDJSON, JSON)
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+# normalized layout: the camera fields shared by the images are written once as a profile record,
+# {"CameraProfile": {"id": 0, "deviceMake": ..., ...}}, before the first image using it,
+# and each image refers to it with "profileId" instead of repeating them
+PROFILE_KEY = "CameraProfile"
+PROFILE_ID_KEY = "profileId"
+PROFILE_FIELDS = ("deviceMake", "deviceModel", "imageSize", "fov", "vfov", "megapixels", "source")
+
+CameraProfiles = T.Dict[int, T.Dict[str, T.Any]]
+
+
+def expand_image_description(desc: T.Mapping, profiles: CameraProfiles) -> T.Dict:
+    """
+    The description with the fields of its camera profile, as written without normalization
+    """
+    if PROFILE_ID_KEY not in desc:
+        return T.cast(T.Dict, desc)
+    expanded = {key: value for key, value in desc.items() if key != PROFILE_ID_KEY}
+    expanded.update(profiles[desc[PROFILE_ID_KEY]])
+    return expanded
+
+
+class ImageDescriptionWriter:
+    """
+    Writes image descriptions one by one as they are produced, as an indented JSON array or as ndjson.
+    With normalize, the camera fields are moved to shared profile records.
+    """
+
+    def __init__(self, fp: T.BinaryIO, desc_format: str = JSON, normalize: bool = False):
+        if desc_format not in DESC_FORMATS:
+            raise ValueError(f"Invalid image description format {desc_format}, expect one of {DESC_FORMATS}")
+        self.fp = fp
+        self.desc_format = desc_format
+        self.normalize = normalize
+        self.count = 0
+        self._profile_ids: T.Dict[T.Tuple, int] = {}
+
+    def _normalize(self, desc: T.Mapping) -> T.Mapping:
+        if "error" in desc or "Information" in desc:
+            return desc
+        profile = tuple((key, desc[key]) for key in PROFILE_FIELDS if key in desc)
+        if not profile:
+            return desc
+        profile_id = self._profile_ids.get(profile)
+        if profile_id is None:
+            profile_id = len(self._profile_ids)
+            self._profile_ids[profile] = profile_id
+            self._write({PROFILE_KEY: {"id": profile_id, **dict(profile)}})
+        normalized = {key: value for key, value in desc.items() if key not in PROFILE_FIELDS}
+        normalized[PROFILE_ID_KEY] = profile_id
+        return normalized
+
+    def write(self, desc: T.Mapping) -> None:
+        self._write(self._normalize(desc) if self.normalize else desc)
+
+    def _write(self, desc: T.Mapping) -> None:
+        if self.desc_format == NDJSON:
+            self.fp.write(serialization.dumps(desc) + b"\n")
+            return
+        # an indented array, as json.dump(descs, fp, indent=4)
+        self.fp.write(b",\n" if self.count else b"[\n")
+        self.fp.write(b"\n".join(b"    " + line for line in serialization.dumps(desc, pretty=True).split(b"\n")))
+        self.count += 1
+
+    def write_all(self, descs: T.Iterable[T.Mapping]) -> None:
+        for desc in descs:
+            self.write(desc)
+
+    def close(self) -> None:
+        if self.desc_format == JSON:
+            self.fp.write(b"\n]" if self.count else b"[]")
+        self.fp.flush()
+
+    def __enter__(self) -> "ImageDescriptionWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+@contextlib.contextmanager
+def open_image_description_writer(
+    desc_path: str,
+    desc_format: str = JSON,
+    normalize: bool = False,
+) -> T.Iterator[ImageDescriptionWriter]:
+    """
+    Writer of the description file desc_path, "-" for stdout, for descriptions written as they are produced
+    """
+    if desc_path == "-":
+        with ImageDescriptionWriter(sys.stdout.buffer, desc_format, normalize) as writer:
+            yield writer
+        return
+    with open(desc_path, "wb") as fp:
+        with ImageDescriptionWriter(fp, desc_format, normalize) as writer:
+            yield writer
+
+
+def write_image_descriptions(
+    desc_path: str,
+    descs: T.Iterable[T.Mapping],
+    desc_format: str = JSON,
+    normalize: bool = False,
+) -> None:
+    """
+    Write the descriptions to desc_path, "-" for stdout
+    """
+    with open_image_description_writer(desc_path, desc_format, normalize) as writer:
+        writer.write_all(descs)
+
+
+def _iter_json_array(fp: T.TextIO, buffer: str) -> T.Iterator[T.Any]:
+    """
+    Decode the items of a JSON array one by one, reading the file by chunks
+    """
+    decoder = json.JSONDecoder()
+    # skip "["
+    pos = 1
+    while True:
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ","):
+                pos += 1
+            if pos < len(buffer):
+                break
+            buffer, pos = fp.read(READ_CHUNK_SIZE), 0
+            if not buffer:
+                raise json.JSONDecodeError("Unterminated array", "", 0)
+
+        if buffer[pos] == "]":
+            return
+
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                break
+            except json.JSONDecodeError:
+                chunk = fp.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    raise
+                buffer = buffer[pos:] + chunk
+                pos = 0
+        yield item
+        pos = end
+
+
+def iter_image_descriptions(fp: T.TextIO, profiles: T.Optional[CameraProfiles] = None) -> T.Iterator[T.Dict]:
+    """
+    Image descriptions of a JSON array or ndjson file, decoded one at a time.
+    Raises json.JSONDecodeError for invalid content.
+
+    Descriptions of a normalized file are expanded with their camera profile, unless a profiles dict is given:
+    then the profiles are collected into it and the descriptions are yielded as written,
+    to be expanded on demand with expand_image_description.
+    """
+    expand = profiles is None
+    if profiles is None:
+        profiles = {}
+    for item in _iter_items(fp):
+        if isinstance(item, dict) and PROFILE_KEY in item:
+            profile = dict(item[PROFILE_KEY])
+            profiles[profile.pop("id")] = profile
+            continue
+        yield expand_image_description(item, profiles) if expand else item
+
+
+def _iter_items(fp: T.TextIO) -> T.Iterator[T.Any]:
+    buffer = fp.read(READ_CHUNK_SIZE)
+    stripped = buffer.lstrip()
+    while not stripped:
+        chunk = fp.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return
+        buffer = chunk
+        stripped = buffer.lstrip()
+
+    if stripped.startswith("["):
+        yield from _iter_json_array(fp, stripped)
+        return
+
+    # ndjson
+    lines = buffer.split("\n")
+    rest = lines.pop()
+    for line in lines:
+        if line.strip():
+            yield serialization.loads(line)
+    for line in fp:
+        line = rest + line
+        rest = ""
+        if line.strip():
+            yield serialization.loads(line)
+    if rest.strip():
+        yield serialization.loads(rest)
@@ -1,9 +1,8 @@
 import sys
 import time
 
-import requests
-
 from mapilio_kit.components.utilities.config import MAPILIO_CDN_ENDPOINT
+from mapilio_kit.components.utilities.http_session import get_session
 
 
 def alert_maintenance():
@@ -27,7 +26,7 @@ def alert_maintenance():
 def maintenance_info():
     url = MAPILIO_CDN_ENDPOINT + "v1/hearbeat-check"
     try:
-        response = requests.get(url)
+        response = get_session().get(url)
         if response.json()['mode']:
             alert_maintenance()
     except Exception as e:
@@ -36,7 +35,7 @@ def maintenance_info():
 
 def get_latest_version():
     url = "https://raw.githubusercontent.com/mapilio/mapilio-kit/main/mapilio_kit/components/version.py"
-    response = requests.get(url)
+    response = get_session().get(url)
     if response.status_code == 200:
         content = response.text
         version_line = [line for line in content.split('\n') if 'VERSION' in line][0]
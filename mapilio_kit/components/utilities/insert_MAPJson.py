@@ -6,9 +6,12 @@ import uuid
 from tqdm import tqdm
 
 from mapilio_kit.components.logs import image_log
+from mapilio_kit.components.logs.file_inventory import FileInventory, get_file_inventory
 from mapilio_kit.components.processing import processing
 from gps_anomaly.detector import Anomaly
 from mapilio_kit.components.utilities import types_fmt as types
+from mapilio_kit.components.utilities.executor import imap_in_workers
+from mapilio_kit.components.utilities.image_description_file import JSON, open_image_description_writer
 from mapilio_kit.components.logger import MapilioLogger
 
 from colorama import init, Fore
@@ -50,6 +53,85 @@ def get_final_mapilio_image_description(
     return status, T.cast(types.FinalImageDescription, description)
 
 
+def finalize_image_description(
+    image: str,
+    import_path: str,
+    overwrite_all_EXIF_tags=False,
+    overwrite_EXIF_time_tag=False,
+    overwrite_EXIF_gps_tag=False,
+    overwrite_EXIF_direction_tag=False,
+    overwrite_EXIF_orientation_tag=False,
+    resume=False,
+    exif_overlay=False,
+) -> T.Optional[T.Tuple[types.Status, T.Mapping]]:
+    """
+    (status, final description with filename and path) of a processed image, its EXIF overwritten on success.
+    With exif_overlay the image is left untouched and the EXIF changes are kept in the description instead,
+    to be applied to the copy zipped for upload.
+    """
+    ret = get_final_mapilio_image_description(image)
+    if ret is None:
+        return None
+
+    status, desc = ret
+
+    if status == "success" and exif_overlay:
+        changes = processing.exif_tag_changes(
+            T.cast(types.FinalImageDescription, desc),
+            overwrite_all_EXIF_tags,
+            overwrite_EXIF_time_tag,
+            overwrite_EXIF_gps_tag,
+            overwrite_EXIF_direction_tag,
+            overwrite_EXIF_orientation_tag,
+        )
+        if changes:
+            desc = {**desc, "exifOverlay": changes}
+    # EXIF of the images finished before the checkpointed run stopped is already overwritten
+    exif_done = resume and image_log.is_logged(image, "mapilio_image_description")
+    if status == "success" and not exif_done and not exif_overlay:
+        try:
+            processing.overwrite_exif_tags(
+                image,
+                T.cast(types.FinalImageDescription, desc),
+                overwrite_all_EXIF_tags,
+                overwrite_EXIF_time_tag,
+                overwrite_EXIF_gps_tag,
+                overwrite_EXIF_direction_tag,
+                overwrite_EXIF_orientation_tag,
+            )
+        except Exception:
+            LOG.warning(f"Failed to overwrite EXIF", exc_info=True)
+
+    if status != "success":
+        return status, desc
+    relpath = os.path.relpath(image, import_path)
+    final_desc = T.cast(
+        types.FinalImageDescription,
+        {**desc, "filename": os.path.basename(relpath), "path": os.path.dirname(relpath)},
+    )
+    image_log.log_in_memory(image, "mapilio_image_description", final_desc)
+    return status, final_desc
+
+
+def detect_sequence_anomalies(
+    descs: T.List[types.FinalImageDescription],
+) -> T.Tuple[T.List[types.FinalImageDescription], T.List[str], T.Dict[str, T.Any]]:
+    """
+    (descriptions marked by the anomaly detector, failed image filenames, Information counts) of one sequence.
+    The counts are the changes to add to the summary. Runs in the worker processes with --workers.
+    """
+    summary = {
+        'Information': {
+            "total_images": len(descs),
+            "processed_images": 0,
+            "failed_images": 0,
+            "duplicated_images": 0,
+        }
+    }
+    marked_descs, failed_imgs, _ = Anomaly().anomaly_detector([*descs, summary])
+    return marked_descs[:-1], failed_imgs, marked_descs[-1]['Information']
+
+
 def insert_MAPJson(
     import_path,
     skip_subfolders=False,
@@ -60,6 +142,12 @@ def insert_MAPJson(
     overwrite_EXIF_direction_tag=False,
     overwrite_EXIF_orientation_tag=False,
     desc_path: str = None,
+    file_inventory: T.Optional[FileInventory] = None,
+    resume=False,
+    desc_format=JSON,
+    normalize_descriptions=False,
+    workers=None,
+    exif_overlay=False,
 ):
     # basic check for all
     if not import_path or not os.path.isdir(import_path):
@@ -70,69 +158,63 @@ def insert_MAPJson(
     if desc_path is None:
         desc_path = os.path.join(import_path, "mapilio_image_description.json")
 
-    images = image_log.get_total_file_list(import_path, skip_subfolders=skip_subfolders)
+    file_inventory = get_file_inventory(import_path, skip_subfolders, file_inventory)
+    images = file_inventory.get_images(import_path, skip_subfolders)
 
-    descs: T.List[types.FinalImageDescriptionOrError] = []
+    # descriptions by sequence uuid, in the order the sequences are first seen
+    sequences: T.Dict[str, T.List[types.FinalImageDescription]] = {}
+    total_images = 0
+    processed_images = 0
     for image in tqdm(images, unit="files", desc="Processing image description"):
-        ret = get_final_mapilio_image_description(image)
+        ret = finalize_image_description(
+            image,
+            import_path,
+            overwrite_all_EXIF_tags,
+            overwrite_EXIF_time_tag,
+            overwrite_EXIF_gps_tag,
+            overwrite_EXIF_direction_tag,
+            overwrite_EXIF_orientation_tag,
+            resume,
+            exif_overlay,
+        )
         if ret is None:
             continue
 
-        status, desc = ret
-
-        if status == "success":
-            try:
-                processing.overwrite_exif_tags(
-                    image,
-                    T.cast(types.FinalImageDescription, desc),
-                    overwrite_all_EXIF_tags,
-                    overwrite_EXIF_time_tag,
-                    overwrite_EXIF_gps_tag,
-                    overwrite_EXIF_direction_tag,
-                    overwrite_EXIF_orientation_tag,
-                )
-            except Exception:
-                LOG.warning(f"Failed to overwrite EXIF", exc_info=True)
-
-        relpath = os.path.relpath(image, import_path)
-        dirname = os.path.dirname(relpath)
-        basename = os.path.basename(relpath)
+        status, final_desc = ret
+        total_images += 1
         if status == "success":
-            descs.append(
-                T.cast(types.FinalImageDescription, {**desc, "filename": basename, "path": dirname})
-            )
-        else:
-            descs.append(
-                T.cast(
-                    types.FinalImageDescriptionError,
-                    {"error": desc, "filename": basename, "path": dirname},
-                )
-            )
-    processed_images = [desc for desc in descs if "error" not in desc]
-    not_processed_images = T.cast(
-        T.List[types.FinalImageDescriptionError],
-        [desc for desc in descs if "error" in desc],
-    )
-
+            processed_images += 1
+            # the anomaly detector leaves out the images without heading, as the failed ones
+            if "heading" in final_desc:
+                sequences.setdefault(final_desc.get("sequenceUuid"), []).append(final_desc)
 
     summary = {
         'Information': {
-            "total_images": len(descs),
-            "processed_images": len(processed_images),
-            "failed_images": len(not_processed_images),
+            "total_images": total_images,
+            "processed_images": processed_images,
+            "failed_images": total_images - processed_images,
             "duplicated_images": 0,
             "id": uuid.uuid4().hex,
             "group_key": str(uuid.uuid4()),
-            "device_type": "Desktop"
+            "device_type": "Desktop",
+            "anomaly_sequences": [],
         }
     }
-    descs.append(
-        T.cast(types.FinalImageDescription, {**summary})
-    )
-    anomaly = Anomaly()
 
-    descs, failed_imgs, anomaly_points = anomaly.anomaly_detector(descs)
-    LOG.info(json.dumps(descs[-1]['Information'],indent=4))
+    failed_imgs: T.List[str] = []
+    with open_image_description_writer(desc_path, desc_format, normalize_descriptions) as writer:
+        # each sequence is written once its anomalies are detected, in the order of the sequences
+        for sequence_descs, sequence_failed_imgs, information in imap_in_workers(
+            detect_sequence_anomalies, list(sequences.values()), workers
+        ):
+            writer.write_all(sequence_descs)
+            failed_imgs.extend(sequence_failed_imgs)
+            for key in ("processed_images", "failed_images", "duplicated_images"):
+                summary['Information'][key] += information[key]
+            summary['Information']["anomaly_sequences"].extend(information["anomaly_sequences"])
+        writer.write(summary)
+
+    LOG.info(json.dumps(summary['Information'], indent=4))
     LOG.info("Anomalies can occur due to a combination of factors, including GPS distance being out of range,"
                 "heading angle limit being exceeded, and altitude surpassing the upper limit. "
                 "This contributes to the existence of failed images.")
@@ -141,11 +223,6 @@ def insert_MAPJson(
         LOG.warning(f"{Fore.RED}Some images has failed to upload due to "
                        "anomaly detection."
                        f" These images are => {failed_imgs}{Fore.RESET}")
-    if desc_path == "-":
-        print(json.dumps(descs, indent=4))
-    else:
-        with open(desc_path, "w") as fp:
-            json.dump(descs, fp, indent=4)
 
     # logger.info(json.dumps(summary, indent=4))
     if 0 < summary['Information']["failed_images"]:
@@ -0,0 +1,50 @@
+import json
+import typing as T
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# "orjson" when it is installed, otherwise the standard library
+BACKEND = "orjson" if orjson is not None else "json"
+
+# compact output of the standard library, byte for byte json.dumps(obj, separators=(",", ":"))
+_STDLIB_SEPARATORS = (",", ":")
+# pretty output, always from the standard library: the legacy json.dumps(obj, indent=4) with non-ASCII escaped
+_STDLIB_INDENT = 4
+
+
+def _stdlib_dumps(obj: T.Any, pretty: bool) -> str:
+    if pretty:
+        return json.dumps(obj, indent=_STDLIB_INDENT)
+    return json.dumps(obj, separators=_STDLIB_SEPARATORS)
+
+
+def dumps(obj: T.Any, pretty: bool = False) -> bytes:
+    """
+    UTF-8 JSON of obj, ready to be written to a file or a socket.
+
+    Compact JSON (NDJSON lines, IPC messages, upload payloads) uses orjson when installed. Objects it refuses
+    (integers beyond 64 bits, ...) fall back to the standard library. Pretty JSON keeps the legacy format.
+    """
+    if orjson is not None and not pretty:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except (orjson.JSONEncodeError, TypeError):
+            pass
+    return _stdlib_dumps(obj, pretty).encode("utf-8")
+
+
+def dumps_str(obj: T.Any, pretty: bool = False) -> str:
+    return dumps(obj, pretty).decode("utf-8")
+
+
+def loads(data: T.Union[bytes, bytearray, str]) -> T.Any:
+    """
+    Decode JSON. Raises json.JSONDecodeError (orjson.JSONDecodeError is a subclass of it) for invalid data.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
@@ -172,6 +172,14 @@ FinalImageDescriptionMetadata = {
         "accuracy_level": {"type": "number"},
         "source": {"type": "string"},
         "sourceUser": {"type": "string"},
+        "profileId": {
+            "type": "integer",
+            "description": "Camera profile of a normalized image description file",
+        },
+        "exifOverlay": {
+            "type": "object",
+            "description": "EXIF changes applied to the image copy zipped for upload, the image itself untouched",
+        },
     },
     "required": [
         "latitude",
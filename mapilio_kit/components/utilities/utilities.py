@@ -1,16 +1,19 @@
-import subprocess
 from typing import Dict, Union
+import functools
 import math
 from collections import ChainMap
-import platform
 from calculation.util import calculate_vfov
 import hashlib
 import typing as T
 import os
 from mapilio_kit.components.logger import MapilioLogger
+from mapilio_kit.components.utilities.exiftool_pool import get_exiftool_pool
 
 LOG = MapilioLogger().get_logger()
 
+# distinct cameras seen in one run, a handful in practice
+CAMERA_PROFILE_CACHE_SIZE = 256
+
 __RULES__ = [{('hero7', 'wide', '4:3'): [122.6, 94.4]}, {('hero7', 'wide', '16:9'): [118.2, 69.5]},
              {('hero7', 'linear', '4:3'): [86.7, 71.0]}, {('hero7', 'linear', '16:9'): [87.6, 56.7]},
              {('hero8', 'wide', '4:3'): [122.6, 94.4]}, {('hero8', 'wide', '16:9'): [118.2, 69.5]},
@@ -98,27 +101,76 @@ def calculate_aspect_ratio(image_size: str) -> str:
     return f"{x}:{y}"
 
 
-def get_exiftool_specific_feature(video_or_image_path: str, exiftool_path=None) -> Dict[str, Union[None, str, float]]:
+def _to_float(value) -> T.Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _format_image_size(value) -> T.Optional[str]:
+    # exiftool -n prints ImageSize as "W H"
+    if value is None:
+        return None
+    return "x".join(str(value).replace("x", " ").split())
+
+
+class CameraProfile(T.NamedTuple):
+    device_make: T.Optional[str]
+    device_model: T.Optional[str]
+    image_size: T.Optional[str]
+    field_of_view: T.Optional[float]
+    vfov: T.Optional[float]
+
+
+@functools.lru_cache(maxsize=CAMERA_PROFILE_CACHE_SIZE)
+def camera_profile(
+    device_make: T.Optional[str],
+    device_model: T.Optional[str],
+    image_size: T.Optional[str],
+    lens_mode: T.Union[None, str, int, float],
+    elevation_angle: T.Optional[float] = None,
+) -> CameraProfile:
     """
 
     Args:
-        video_or_image_path:
+        device_make:
+        device_model:
+        image_size: "1920x1080" format
+        lens_mode: fov in degrees, or the lens mode name (e.g. "wide") for GoPro cameras
+        elevation_angle: CameraElevationAngle, used when there is no lens mode
 
     Returns:
+        fov and vfov of the camera, derived once per (make, model, resolution, lens mode)
+        since all the frames of a capture share them
+    """
+    field_of_view = vfov = None
+    if isinstance(lens_mode, (int, float)):
+        field_of_view = float(lens_mode)
+        aspect_ratio = calculate_aspect_ratio(image_size)
+        vfov = calculation_vfov(field_of_view, aspect_ratio.split(":"))
+    elif isinstance(lens_mode, str):
+        aspect_ratio = calculate_aspect_ratio(image_size)
+        field_of_view, vfov = find_fov2(device_make, lens_mode, aspect_ratio)
+    elif isinstance(elevation_angle, float):
+        field_of_view = elevation_angle
+        if elevation_angle == 360:
+            vfov = elevation_angle / 2
+        else:
+            width, height = int(image_size.split("x")[0]), int(image_size.split("x")[1])
+            vfov = calculate_vfov(elevation_angle, width, height)
+    return CameraProfile(device_make, device_model, image_size, field_of_view, vfov)
+
 
+def exiftool_features_from_json(metadata: T.Optional[T.Mapping[str, T.Any]]) -> Dict[str, Union[None, str, float]]:
     """
 
-    os_name = platform.system()
-    if os_name == "Windows":
-        process = subprocess.Popen(["exiftool", video_or_image_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, creationflags=subprocess.CREATE_NO_WINDOW)
-    else:
-        if exiftool_path is not None:
-            process = subprocess.Popen([exiftool_path, video_or_image_path], stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE)
-        else:
-            process = subprocess.Popen(["exiftool", video_or_image_path], stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE)
+    Args:
+        metadata: one record of `exiftool -j -n` output
 
+    Returns:
+        camera features of the image or video, derived fov and vfov included
+    """
     dict_object = {
         'field_of_view': None,
         'device_make': None,
@@ -134,76 +186,83 @@ def get_exiftool_specific_feature(video_or_image_path: str, exiftool_path=None)
     }
     fov_str = None
     fov_deg = None
-    global vfov_str
-
-    while True:
-        try:
-            line = process.stdout.readline()
-
-            filtered_line = (line.rstrip().decode('utf-8')).lower()
-
-            if not line:  # noqa
-                break
-            if 'megapixels' in filtered_line:
-                dict_object['megapixels'] = float(filtered_line.split(':')[1].lstrip(' '))
-
-            if 'yaw' in filtered_line:
-                dict_object['yaw'] = float(filtered_line.split(':')[1].lstrip(' '))
-
-            if 'pitch' in filtered_line:
-                dict_object['pitch'] = float(filtered_line.split(':')[1].lstrip(' '))
-
-            if 'roll' in filtered_line:
-                dict_object['roll'] = float(filtered_line.split(':')[1].lstrip(' '))
-
-            if 'carspeed' in filtered_line:
-                dict_object['carSpeed'] = float(filtered_line.split(':')[1].lstrip(' '))
-
-            if 'field of view' in filtered_line:
-                fov_str = filtered_line.split(':')[1].lstrip(' ')
-                dict_object['field_of_view'] = fov_str
-
-            elif 'camera elevation angle' in filtered_line:
-                fov_deg = float(filtered_line.split(':')[1].lstrip(' '))
-            if 'color mode' in filtered_line:
-                dict_object['device_make'] = filtered_line.split(':')[1].lstrip(' ')
-            elif 'make' in filtered_line:
-                dict_object['device_make'] = filtered_line.split(':')[1].lstrip(' ')
-            if 'camera model name' in filtered_line:
-                dict_object['device_model'] = filtered_line.split(':')[1].lstrip(' ')
-            if 'image size' in filtered_line:
-                dict_object['image_size'] = filtered_line.split(':')[1].lstrip(' ')
-        except TypeError:
-            raise f"Exif data does not Exist !" \
-                  f"Please remove this video file {video_or_image_path}"
-
-    if dict_object['field_of_view'] and "deg" in dict_object['field_of_view']:
-        dict_object['field_of_view'] = float(dict_object['field_of_view'].replace('deg', ''))
-        aspect_ratio = calculate_aspect_ratio(dict_object['image_size'])
-        dict_object['vfov'] = calculation_vfov(float(dict_object['field_of_view']), aspect_ratio.split(":"))
-        if isinstance(dict_object['field_of_view'], str):
-            dict_object['field_of_view'], vfov_str = find_fov2(dict_object['device_make'],
-                                                               dict_object['field_of_view'],
-                                                               aspect_ratio)
-            vfov_str = calculation_vfov(dict_object['field_of_view'], aspect_ratio)
-            dict_object['vfov'] = vfov_str
-    elif isinstance(fov_str, str):
-        aspect_ratio = calculate_aspect_ratio(dict_object['image_size'])
-        dict_object['field_of_view'], vfov_str = find_fov2(dict_object['device_make'],
-                                                           dict_object['field_of_view'],
-                                                           aspect_ratio)
-        dict_object['vfov'] = vfov_str
-    elif isinstance(fov_deg, float):
-        dict_object['field_of_view'] = fov_deg
-        if fov_deg == 360:
-            vfov_str = fov_deg / 2
-            dict_object['vfov'] = vfov_str
-        else:
-            width, height = int(dict_object['image_size'].split("x")[0]), int(dict_object['image_size'].split("x")[1])
-            dict_object['vfov'] = calculate_vfov(fov_deg, width, height)
+    fov_composite = None
+
+    for key, value in (metadata or {}).items():
+        name = key.lower()
+        if isinstance(value, str):
+            value = value.lower()
+
+        if 'megapixels' in name:
+            dict_object['megapixels'] = _to_float(value)
+        if 'yaw' in name:
+            dict_object['yaw'] = _to_float(value)
+        if 'pitch' in name:
+            dict_object['pitch'] = _to_float(value)
+        if 'roll' in name:
+            dict_object['roll'] = _to_float(value)
+        if 'carspeed' in name:
+            dict_object['carSpeed'] = _to_float(value)
+
+        if 'fieldofview' in name:
+            # numeric in degrees, or the lens mode name (e.g. "wide") for GoPro cameras
+            dict_object['field_of_view'] = value
+            if isinstance(value, str):
+                fov_str = value
+        elif name == 'fov':
+            # composite field of view of exiftool -n, derived from the focal length
+            fov_composite = _to_float(value)
+        elif 'cameraelevationangle' in name:
+            fov_deg = _to_float(value)
+        if 'colormode' in name:
+            dict_object['device_make'] = value
+        elif name.endswith('make'):
+            dict_object['device_make'] = value
+        if name == 'model':
+            dict_object['device_model'] = value
+        if name == 'imagesize':
+            dict_object['image_size'] = _format_image_size(value)
+
+    lens_mode = dict_object['field_of_view'] if isinstance(dict_object['field_of_view'], (int, float)) else fov_str
+    if lens_mode is None and fov_deg is None:
+        # only without a FieldOfView tag or an elevation angle, which describe wide and 360 lenses better
+        lens_mode = fov_composite
+    if lens_mode is not None or isinstance(fov_deg, float):
+        profile = camera_profile(dict_object['device_make'], dict_object['device_model'],
+                                 dict_object['image_size'], lens_mode, fov_deg)
+        dict_object['field_of_view'], dict_object['vfov'] = profile.field_of_view, profile.vfov
 
     return dict_object
 
+
+def get_exiftool_specific_features(
+    video_or_image_paths: T.Sequence[str], exiftool_path=None, pool_size: T.Optional[int] = None
+) -> T.List[Dict[str, Union[None, str, float]]]:
+    """
+
+    Args:
+        video_or_image_paths:
+        exiftool_path: exiftool executable, "exiftool" from PATH by default
+        pool_size: number of exiftool workers
+
+    Returns:
+        camera features of each file, in the same order
+    """
+    pool = get_exiftool_pool(exiftool_path, pool_size)
+    return [exiftool_features_from_json(metadata) for metadata in pool.execute_json(video_or_image_paths)]
+
+
+def get_exiftool_specific_feature(video_or_image_path: str, exiftool_path=None) -> Dict[str, Union[None, str, float]]:
+    """
+
+    Args:
+        video_or_image_path:
+
+    Returns:
+
+    """
+    return get_exiftool_specific_features([video_or_image_path], exiftool_path)[0]
+
 def photo_uuid_generate(user_email: str, descs: list) -> list:
     """
 
@@ -101,5 +101,6 @@ setup(name='mapilio-kit',
       [console_scripts]
       mapilio_kit=mapilio_kit.__main__:main
       ''',
-      install_requires=requires
+      install_requires=requires,
+      extras_require={'fast_json': ['orjson']}
       )
@@ -0,0 +1,159 @@
+import os
+import sqlite3
+
+import pytest
+
+from mapilio_kit.base.decompose import Decompose
+from mapilio_kit.components.logs import image_log
+from mapilio_kit.components.logs.checkpoint import CHECKPOINT_FILENAME, DecomposeCheckpoint, checkpoint_path
+from mapilio_kit.components.logs.file_inventory import FileInventory
+from mapilio_kit.components.upload.upload import pending_upload_descs
+
+
+@pytest.fixture
+def import_path(tmp_path):
+    os.makedirs(tmp_path / "sub")
+    for name in ("a.jpg", "b.jpg", os.path.join("sub", "c.jpg")):
+        (tmp_path / name).write_bytes(b"\xff\xd8" + name.encode("utf-8"))
+    return str(tmp_path)
+
+
+@pytest.fixture(autouse=True)
+def clean_image_log():
+    image_log.reset_state()
+    yield
+    image_log.attach_checkpoint(None)
+    image_log.reset_state()
+
+
+def _record_all(import_path: str) -> None:
+    checkpoint = DecomposeCheckpoint.open(import_path, file_inventory=FileInventory.scan(import_path))
+    for name in ("a.jpg", "b.jpg", os.path.join("sub", "c.jpg")):
+        image = os.path.join(import_path, name)
+        checkpoint.record(image, "import_meta_data_process", "success", {"name": name})
+        checkpoint.record(image, "geotag_process", "success", {"latitude": 41.0})
+    checkpoint.close()
+
+
+def _restore(import_path: str, resume: bool = True):
+    checkpoint = DecomposeCheckpoint.open(import_path, resume=resume, file_inventory=FileInventory.scan(import_path))
+    try:
+        return list(checkpoint.restore()), checkpoint.stale_images
+    finally:
+        checkpoint.close()
+
+
+def test_restore(import_path):
+    _record_all(import_path)
+    restored, stale = _restore(import_path)
+
+    assert stale == []
+    assert len(restored) == 6
+    image, process, status, description = restored[0]
+    assert image == os.path.join(import_path, "a.jpg")
+    assert (process, status, description) == ("import_meta_data_process", "success", {"name": "a.jpg"})
+    assert os.path.join(import_path, "sub", "c.jpg") in {image for image, *_ in restored}
+
+
+def test_restore_from_another_spelling(import_path):
+    _record_all(import_path)
+    restored, _ = _restore(os.path.join(import_path, "sub", ".."))
+    assert len(restored) == 6
+
+
+def test_changed_files_are_stale(import_path):
+    _record_all(import_path)
+    changed = os.path.join(import_path, "a.jpg")
+    # same size, later mtime
+    st = os.stat(changed)
+    os.utime(changed, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    os.remove(os.path.join(import_path, "b.jpg"))
+
+    restored, stale = _restore(import_path)
+    assert sorted(stale) == sorted([changed, os.path.join(import_path, "b.jpg")])
+    assert {image for image, *_ in restored} == {os.path.join(import_path, "sub", "c.jpg")}
+
+    # the stale results are dropped, not restored again on the next resume
+    restored, stale = _restore(import_path)
+    assert stale == []
+    assert len(restored) == 2
+
+
+def test_open_without_resume_clears(import_path):
+    _record_all(import_path)
+    restored, _ = _restore(import_path, resume=False)
+    assert restored == []
+
+
+def test_image_log_restore(import_path):
+    _record_all(import_path)
+    checkpoint = DecomposeCheckpoint.open(import_path, resume=True)
+    image_log.restore_checkpoint(checkpoint)
+    checkpoint.close()
+
+    image = os.path.join(import_path, "b.jpg")
+    assert image_log.is_logged(image, "geotag_process")
+    assert image_log.read_process_data_from_memory(image, "geotag_process") == ("success", {"latitude": 41.0})
+
+
+def test_session_without_resume_keeps_no_checkpoint(import_path):
+    with Decompose().session({"import_path": import_path}) as checkpoint:
+        assert checkpoint is None
+    assert not os.path.exists(checkpoint_path(import_path))
+
+
+def test_session_with_resume_records(import_path):
+    vars_args = {"import_path": import_path, "resume": True}
+    image = os.path.join(import_path, "a.jpg")
+    with Decompose().session(vars_args) as checkpoint:
+        assert checkpoint is not None
+        image_log.log_in_memory(image, "geotag_process", {"latitude": 41.0})
+    assert os.path.exists(os.path.join(import_path, CHECKPOINT_FILENAME))
+
+    image_log.reset_state()
+    with Decompose().session(vars_args):
+        assert image_log.is_logged(image, "geotag_process")
+
+
+def test_session_goes_on_without_checkpoint(import_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise sqlite3.OperationalError("attempt to write a readonly database")
+
+    monkeypatch.setattr(DecomposeCheckpoint, "open", fail)
+    vars_args = {"import_path": import_path, "resume": True}
+    with Decompose().session(vars_args) as checkpoint:
+        assert checkpoint is None
+    assert not vars_args["resume"]
+
+
+def test_uploaded_images(import_path):
+    images = [os.path.join(import_path, "a.jpg"), os.path.join(import_path, "sub", "c.jpg")]
+    checkpoint = DecomposeCheckpoint.open(import_path)
+    checkpoint.mark_uploaded(images)
+    checkpoint.close()
+
+    checkpoint = DecomposeCheckpoint.open(import_path, resume=True)
+    try:
+        assert checkpoint.uploaded_images() == {os.path.normpath(image) for image in images}
+        # changed since, uploaded again
+        with open(images[0], "ab") as fp:
+            fp.write(b"new")
+        assert checkpoint.uploaded_images() == {os.path.normpath(images[1])}
+    finally:
+        checkpoint.close()
+
+
+def test_pending_upload_descs(import_path):
+    checkpoint = DecomposeCheckpoint.open(import_path)
+    checkpoint.mark_uploaded([os.path.join(import_path, "a.jpg"), os.path.join(import_path, "sub", "c.jpg")])
+    uploaded = checkpoint.uploaded_images()
+    checkpoint.close()
+
+    # the folder grew: its images are now in a new sequence, with the ones uploaded before
+    descs = [
+        {"filename": "a.jpg", "path": "", "sequenceUuid": "new"},
+        {"filename": "b.jpg", "path": "", "sequenceUuid": "new"},
+        {"filename": "c.jpg", "path": "sub", "sequenceUuid": "other"},
+        {"Information": {"total_images": 3}},
+    ]
+    assert pending_upload_descs(import_path, descs, uploaded) == [descs[1], descs[3]]
@@ -0,0 +1,219 @@
+import io
+import struct
+
+import exifread
+import piexif
+import pytest
+
+from mapilio_kit.components.metadata.exif_fast_reader import (
+    UnsupportedExifError,
+    read_exif_tags,
+    read_tiff_bytes_tags,
+)
+from mapilio_kit.components.metadata.exif_metadata_reader import EXIF_READ_FIELDS, ExifRead
+
+EXIF = {
+    "0th": {
+        # ASCII values longer than 4 bytes are stored at an offset
+        piexif.ImageIFD.Make: "GoPro",
+        piexif.ImageIFD.Model: "HERO8 Black",
+        piexif.ImageIFD.Orientation: 6,
+        piexif.ImageIFD.ImageWidth: 4000,
+        piexif.ImageIFD.ImageLength: 3000,
+        piexif.ImageIFD.DateTime: "2023:05:01 10:00:00",
+        piexif.ImageIFD.ImageHistory: '{"anomaly": 0}',
+    },
+    "Exif": {
+        piexif.ExifIFD.DateTimeOriginal: "2023:05:01 10:00:01",
+        # ASCII values of up to 4 bytes are stored in the entry
+        piexif.ExifIFD.SubSecTimeOriginal: "125",
+        piexif.ExifIFD.LensMake: "GoPro",
+        piexif.ExifIFD.PixelXDimension: 4000,
+        piexif.ExifIFD.PixelYDimension: 3000,
+    },
+    "GPS": {
+        piexif.GPSIFD.GPSLatitudeRef: "N",
+        piexif.GPSIFD.GPSLatitude: ((41, 1), (1, 1), (234567, 10000)),
+        piexif.GPSIFD.GPSLongitudeRef: "E",
+        piexif.GPSIFD.GPSLongitude: ((29, 1), (2, 1), (345678, 10000)),
+        # a single byte, stored in the entry
+        piexif.GPSIFD.GPSAltitudeRef: 1,
+        piexif.GPSIFD.GPSAltitude: (12345, 100),
+        piexif.GPSIFD.GPSImgDirection: (27050, 100),
+        piexif.GPSIFD.GPSDateStamp: "2023:05:01",
+        piexif.GPSIFD.GPSTimeStamp: ((10, 1), (0, 1), (1500, 100)),
+    },
+}
+
+EXTRACT_METHODS = [
+    "extract_image_history",
+    "extract_altitude",
+    "extract_capture_time",
+    "extract_direction",
+    "extract_gps_time",
+    "calc_lon_lat",
+    "retrieve_camera_make",
+    "extract_speed",
+    "extract_pitch",
+    "extract_yaw",
+    "extract_megapixel",
+    "extract_roll",
+    "extract_model",
+    "extract_resolution",
+    "extract_orientation",
+    "extract_field_of_view",
+    "extract_vfov",
+]
+
+# bytes swapped at a time for each TIFF field type, rationals are two longs
+SWAP_UNITS = {1: 1, 2: 1, 3: 2, 4: 4, 5: 4, 6: 1, 7: 1, 8: 2, 9: 4, 10: 4}
+TYPE_LENGTHS = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8}
+
+
+def _little_endian(tiff: bytes) -> bytes:
+    """
+    The big-endian TIFF structure written by piexif, converted to little-endian
+    """
+    out = bytearray(tiff)
+
+    def swap(offset: int, length: int) -> None:
+        out[offset: offset + length] = tiff[offset: offset + length][::-1]
+
+    def unpack(fmt: str, offset: int) -> int:
+        return struct.unpack_from(">" + fmt, tiff, offset)[0]
+
+    def convert_ifd(ifd: int, next_ifd: bool) -> None:
+        count = unpack("H", ifd)
+        swap(ifd, 2)
+        for idx in range(count):
+            entry = ifd + 2 + 12 * idx
+            tag, field_type, value_count = unpack("H", entry), unpack("H", entry + 2), unpack("L", entry + 4)
+            swap(entry, 2)
+            swap(entry + 2, 2)
+            swap(entry + 4, 4)
+            length = TYPE_LENGTHS[field_type] * value_count
+            value_offset = entry + 8
+            if 4 < length:
+                value_offset = unpack("L", entry + 8)
+                swap(entry + 8, 4)
+            unit = SWAP_UNITS[field_type]
+            for start in range(0, length, unit):
+                swap(value_offset + start, unit)
+            if tag in (piexif.ImageIFD.ExifTag, piexif.ImageIFD.GPSTag):
+                convert_ifd(unpack("L", entry + 8), False)
+        if next_ifd:
+            # piexif writes the next IFD offset after the first IFD only
+            swap(ifd + 2 + 12 * count, 4)
+
+    out[0:4] = b"II*\x00"
+    swap(4, 4)
+    convert_ifd(unpack("L", 4), True)
+    return bytes(out)
+
+
+def _tiff(endian: str, exif: dict = EXIF) -> bytes:
+    tiff = piexif.dump(exif)[6:]
+    assert tiff[:4] == b"MM\x00*"
+    if endian == "little":
+        tiff = _little_endian(tiff)
+        assert piexif.load(tiff) == piexif.load(piexif.dump(exif))
+    return tiff
+
+
+def _jpeg(tiff: bytes) -> bytes:
+    segment = b"Exif\x00\x00" + tiff
+    return (
+        b"\xff\xd8"
+        + b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+        + b"\xff\xe1" + struct.pack(">H", len(segment) + 2) + segment
+        + b"\xff\xda\x00\x02\xff\xd9"
+    )
+
+
+def _exifread_tags(data: bytes) -> dict:
+    tags = exifread.process_file(io.BytesIO(data), details=False)
+    return {name: tag for name, tag in tags.items() if name in EXIF_READ_FIELDS}
+
+
+def _assert_same_as_exifread(path: str, data: bytes) -> None:
+    fast = ExifRead(path)
+    # the fast path read the file, not the fallback
+    assert read_exif_tags(io.BytesIO(data), EXIF_READ_FIELDS).keys() == fast.tags.keys()
+
+    fallback = ExifRead(path)
+    fallback.tags = _exifread_tags(data)
+    assert fast.tags.keys() == fallback.tags.keys()
+    for name, tag in fast.tags.items():
+        assert tag.values == fallback.tags[name].values, name
+        assert tag.field_type == fallback.tags[name].field_type, name
+    for method in EXTRACT_METHODS:
+        assert getattr(fast, method)() == getattr(fallback, method)(), method
+
+
+@pytest.mark.parametrize("endian", ["big", "little"])
+def test_same_as_exifread(endian, tmp_path):
+    data = _jpeg(_tiff(endian))
+    path = tmp_path / "image.jpg"
+    path.write_bytes(data)
+    _assert_same_as_exifread(str(path), data)
+
+    exif = ExifRead(str(path))
+    assert exif.retrieve_camera_make() == "GoPro"
+    # extract_altitude honors rational altitude refs only, like before the fast reader
+    assert exif.extract_altitude() == pytest.approx(123.45)
+    assert exif.extract_direction() == pytest.approx(270.5)
+    assert exif.extract_orientation() == 6
+    # the GPS and Exif sub-IFDs are both read
+    assert {"GPS GPSLatitude", "EXIF DateTimeOriginal", "EXIF SubSecTimeOriginal"} <= exif.tags.keys()
+
+
+@pytest.mark.parametrize("endian", ["big", "little"])
+def test_tiff_file(endian, tmp_path):
+    tiff = _tiff(endian)
+    path = tmp_path / "image.tif"
+    path.write_bytes(tiff)
+    fast = read_exif_tags(io.BytesIO(tiff), EXIF_READ_FIELDS)
+    assert {name: tag.values for name, tag in fast.items()} == {
+        name: tag.values for name, tag in _exifread_tags(tiff).items()
+    }
+
+
+@pytest.mark.parametrize("endian", ["big", "little"])
+def test_without_sub_ifds(endian, tmp_path):
+    data = _jpeg(_tiff(endian, {"0th": EXIF["0th"]}))
+    path = tmp_path / "image.jpg"
+    path.write_bytes(data)
+    _assert_same_as_exifread(str(path), data)
+    assert ExifRead(str(path)).calc_lon_lat() == (None, None)
+
+
+@pytest.mark.parametrize("endian", ["big", "little"])
+def test_truncated_ifd(endian):
+    tiff = _tiff(endian)
+    with pytest.raises(UnsupportedExifError):
+        read_tiff_bytes_tags(tiff[:20], EXIF_READ_FIELDS)
+    with pytest.raises(UnsupportedExifError):
+        read_exif_tags(io.BytesIO(_jpeg(tiff)[:60]), EXIF_READ_FIELDS)
+
+
+@pytest.mark.parametrize("endian", ["big", "little"])
+def test_malformed_ifd(endian):
+    tiff = bytearray(_tiff(endian))
+    fmt = ">" if endian == "big" else "<"
+    # the first IFD claims more entries than a camera writes
+    first_ifd = struct.unpack_from(fmt + "L", tiff, 4)[0]
+    struct.pack_into(fmt + "H", tiff, first_ifd, 5000)
+    with pytest.raises(UnsupportedExifError):
+        read_tiff_bytes_tags(bytes(tiff), EXIF_READ_FIELDS)
+
+    # the first IFD is past the end of the data
+    struct.pack_into(fmt + "L", tiff, 4, len(tiff) + 100)
+    with pytest.raises(UnsupportedExifError):
+        read_tiff_bytes_tags(bytes(tiff), EXIF_READ_FIELDS)
+
+
+def test_not_a_tiff_structure():
+    with pytest.raises(UnsupportedExifError):
+        read_tiff_bytes_tags(b"XX*\x00\x00\x00\x00\x08", EXIF_READ_FIELDS)
+    with pytest.raises(UnsupportedExifError):
+        read_exif_tags(io.BytesIO(b"GIF89a"), EXIF_READ_FIELDS)
@@ -0,0 +1,157 @@
+import json
+import math
+import os
+import sys
+import textwrap
+
+import pytest
+
+from mapilio_kit.components.utilities.exiftool_pool import ExifToolPool, ExifToolWorker
+from mapilio_kit.components.utilities.utilities import exiftool_features_from_json
+
+# exiftool -j -n output of a DSLR image, trimmed
+DSLR_RECORD = json.loads("""
+{
+  "SourceFile": "/data/IMG_0001.JPG",
+  "ExifToolVersion": 12.40,
+  "FileName": "IMG_0001.JPG",
+  "Make": "Canon",
+  "Model": "Canon EOS 80D",
+  "Orientation": 1,
+  "FocalLength": 24,
+  "ImageWidth": 6000,
+  "ImageHeight": 4000,
+  "ImageSize": "6000 4000",
+  "Megapixels": 24,
+  "ScaleFactor35efl": 1,
+  "FocalLength35efl": 24,
+  "FOV": 73.7398575770812
+}
+""")
+
+# exiftool -j -n output of a GoPro image, trimmed: the lens mode and the composite FOV
+GOPRO_RECORD = json.loads("""
+{
+  "SourceFile": "/data/GOPR0001.JPG",
+  "Make": "GoPro",
+  "Model": "HERO8 Black",
+  "FieldOfView": "Wide",
+  "ImageSize": "4000 3000",
+  "Megapixels": 12,
+  "FocalLength": 2.92,
+  "FOV": 94.3725232528883
+}
+""")
+
+
+def _vfov(fov: float, width: int, height: int) -> float:
+    return math.degrees(2 * math.atan(math.tan(math.radians(fov) / 2) * height / width))
+
+
+def test_composite_fov():
+    features = exiftool_features_from_json(DSLR_RECORD)
+    assert features["field_of_view"] == pytest.approx(73.7398575770812)
+    assert features["vfov"] == pytest.approx(_vfov(73.7398575770812, 6000, 4000), abs=0.01)
+    assert features["device_make"] == "canon"
+    assert features["device_model"] == "canon eos 80d"
+    assert features["image_size"] == "6000x4000"
+    assert features["megapixels"] == 24
+
+
+def test_lens_mode_before_composite_fov():
+    without_fov = {key: value for key, value in GOPRO_RECORD.items() if key != "FOV"}
+    assert exiftool_features_from_json(GOPRO_RECORD) == exiftool_features_from_json(without_fov)
+    assert exiftool_features_from_json(GOPRO_RECORD)["field_of_view"] != pytest.approx(GOPRO_RECORD["FOV"])
+
+
+def test_no_metadata():
+    features = exiftool_features_from_json(None)
+    assert features["field_of_view"] is None
+    assert features["vfov"] is None
+
+
+# answers like exiftool -stay_open, hangs on files named "hang" and exits on files named "crash"
+FAKE_EXIFTOOL = textwrap.dedent("""
+    import json, os, sys, time
+    files = []
+    for line in sys.stdin:
+        line = line.rstrip("\\n")
+        if line == "-execute":
+            names = [os.path.basename(file) for file in files]
+            if "hang" in names:
+                time.sleep(60)
+            if "crash" in names:
+                sys.exit(1)
+            records = [{"SourceFile": file, "Make": "GoPro"} for file in files if os.path.exists(file)]
+            if records:
+                sys.stdout.write(json.dumps(records) + "\\n")
+            sys.stdout.write("{ready}\\n")
+            sys.stdout.flush()
+            files = []
+        elif line == "False":
+            sys.exit(0)
+        elif line not in ("-stay_open", "True"):
+            files.append(line)
+""")
+
+
+@pytest.fixture
+def exiftool(tmp_path):
+    if sys.platform == "win32":
+        pytest.skip("the fake exiftool is a script")
+    path = tmp_path / "exiftool"
+    path.write_text(f"#!{sys.executable}\n{FAKE_EXIFTOOL}")
+    os.chmod(path, 0o755)
+    return str(path)
+
+
+@pytest.fixture
+def images(tmp_path):
+    paths = []
+    for name in ("a.jpg", "b.jpg", "hang", "crash"):
+        path = tmp_path / name
+        path.write_bytes(b"")
+        paths.append(str(path))
+    return paths
+
+
+def test_worker_answers_in_order(exiftool, images, tmp_path):
+    worker = ExifToolWorker(exiftool)
+    try:
+        missing = str(tmp_path / "missing.jpg")
+        records = worker.execute_json([images[1], missing, images[0]])
+        assert [record and record["SourceFile"] for record in records] == [images[1], None, images[0]]
+    finally:
+        worker.close()
+
+
+def test_worker_times_out_and_restarts(exiftool, images):
+    worker = ExifToolWorker(exiftool, timeout=1)
+    try:
+        assert worker.execute_json([images[0], images[2]]) == [None, None]
+        assert not worker.is_alive()
+        assert worker.execute_json([images[0]])[0]["SourceFile"] == images[0]
+    finally:
+        worker.close()
+
+
+def test_worker_restarts_after_crash(exiftool, images):
+    worker = ExifToolWorker(exiftool, timeout=5)
+    try:
+        worker.execute_json([images[0]])
+        # the batch is retried once on a new worker, which exits too
+        with pytest.raises(BrokenPipeError):
+            worker.execute_json([images[3]])
+        assert worker.execute_json([images[1]])[0]["SourceFile"] == images[1]
+    finally:
+        worker.close()
+
+
+def test_pool_batches(exiftool, images):
+    pool = ExifToolPool(2, exiftool)
+    try:
+        files = [images[idx % 2] for idx in range(10)]
+        records = pool.execute_json(files, batch_size=3)
+        assert [record["SourceFile"] for record in records] == files
+    finally:
+        pool.close()
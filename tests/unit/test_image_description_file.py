@@ -0,0 +1,111 @@
+import io
+import json
+
+import pytest
+
+from mapilio_kit.components.utilities import image_description_file
+from mapilio_kit.components.utilities.image_description_file import (
+    DESC_FORMATS,
+    JSON,
+    NDJSON,
+    expand_image_description,
+    iter_image_descriptions,
+    write_image_descriptions,
+)
+
+
+def _descriptions(count: int):
+    descs = [
+        {
+            "filename": f"img_{idx:05d}.jpg",
+            "latitude": 41.0 + idx / 1e5,
+            "longitude": 29.0,
+            "captureTime": f"2023-05-01 10:{idx // 60 % 60:02d}:{idx % 60:02d}",
+            "deviceMake": "gopro" if idx % 2 else "insta360",
+            "deviceModel": "hero8 black" if idx % 2 else "one x2",
+            "imageSize": "4000x3000",
+            "fov": 121.0,
+            "comment": "[1, 2]\n{\"a\": \"]\"}",
+        }
+        for idx in range(count)
+    ]
+    descs.append({"error": {"type": "MapilioGeoTaggingError", "message": "no GPS"}, "filename": "bad.jpg"})
+    descs.append({"Information": {"total_images": count + 1, "processed_images": count}})
+    return descs
+
+
+def _read(path: str, **kwargs):
+    with open(path, encoding="utf-8") as fp:
+        return list(iter_image_descriptions(fp, **kwargs))
+
+
+@pytest.mark.parametrize("desc_format", DESC_FORMATS)
+@pytest.mark.parametrize("normalize", [False, True])
+def test_round_trip(desc_format, normalize, tmp_path):
+    descs = _descriptions(20)
+    path = str(tmp_path / "descs")
+    write_image_descriptions(path, descs, desc_format, normalize)
+    assert _read(path) == descs
+
+
+def test_default_format_is_a_json_document(tmp_path):
+    descs = _descriptions(3)
+    path = str(tmp_path / "mapilio_image_description.json")
+    write_image_descriptions(path, descs)
+    with open(path, encoding="utf-8") as fp:
+        assert json.load(fp) == descs
+    with open(path, encoding="utf-8") as fp:
+        assert fp.read() == json.dumps(descs, indent=4)
+
+
+def test_ndjson_is_a_description_per_line(tmp_path):
+    descs = _descriptions(3)
+    path = str(tmp_path / "mapilio_image_description.ndjson")
+    write_image_descriptions(path, descs, NDJSON)
+    with open(path, encoding="utf-8") as fp:
+        assert [json.loads(line) for line in fp] == descs
+
+
+@pytest.mark.parametrize("desc_format", DESC_FORMATS)
+def test_profiles_collected(desc_format, tmp_path):
+    descs = _descriptions(4)
+    path = str(tmp_path / "descs")
+    write_image_descriptions(path, descs, desc_format, normalize=True)
+    profiles = {}
+    items = _read(path, profiles=profiles)
+    assert len(profiles) == 2
+    assert "deviceMake" not in items[0]
+    assert [expand_image_description(item, profiles) for item in items] == descs
+
+
+@pytest.mark.parametrize("desc_format", DESC_FORMATS)
+def test_descriptions_across_chunks(desc_format, tmp_path, monkeypatch):
+    monkeypatch.setattr(image_description_file, "READ_CHUNK_SIZE", 7)
+    descs = _descriptions(50)
+    path = str(tmp_path / "descs")
+    write_image_descriptions(path, descs, desc_format, normalize=True)
+    assert _read(path) == descs
+
+
+def test_large_json_array_read_incrementally(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_description_file, "READ_CHUNK_SIZE", 100)
+    descs = _descriptions(5000)
+    path = str(tmp_path / "descs.json")
+    write_image_descriptions(path, descs, JSON)
+
+    with open(path, encoding="utf-8") as fp:
+        descriptions = iter_image_descriptions(fp)
+        assert next(descriptions) == descs[0]
+        # only the first chunks are read for the first description
+        assert fp.tell() < 1000
+        assert [descs[0]] + list(descriptions) == descs
+
+
+@pytest.mark.parametrize("content", ["", "  \n", "[]", "[\n]"])
+def test_empty(content):
+    assert list(iter_image_descriptions(io.StringIO(content))) == []
+
+
+def test_unterminated_array():
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_image_descriptions(io.StringIO('[{"a": 1}, {"b"')))
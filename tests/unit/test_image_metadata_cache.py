@@ -0,0 +1,71 @@
+import piexif
+import pytest
+
+from mapilio_kit.components.metadata import image_metadata_cache
+from mapilio_kit.components.metadata.image_metadata_cache import ImageMetadataCache, approximate_size
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for idx in range(10):
+        path = tmp_path / f"img_{idx}.jpg"
+        path.write_bytes(b"x" * (idx + 1))
+        paths.append(str(path))
+    return paths
+
+
+def test_bounded_by_entries(files):
+    cache = ImageMetadataCache(max_entries=3)
+    for path in files:
+        cache.get(path, "kind", lambda _: 1)
+    assert len(cache) == 3
+    assert cache.contains(files[-1], "kind")
+    assert not cache.contains(files[0], "kind")
+
+
+def test_bounded_by_bytes(files):
+    cache = ImageMetadataCache(max_bytes=50000)
+    for path in files:
+        # a piexif dict with a 20KB thumbnail
+        cache.get(path, "piexif", lambda _: {"0th": {}, "thumbnail": b"t" * 20000})
+    assert len(cache) == 2
+    assert cache.total_bytes <= 50000
+    assert cache.contains(files[-1], "piexif")
+
+    cache.invalidate(files[-1])
+    assert len(cache) == 1
+    assert cache.total_bytes == approximate_size({"0th": {}, "thumbnail": b"t" * 20000})
+
+    cache.clear()
+    assert cache.total_bytes == 0
+
+
+def test_replaced_value_is_counted_once(files):
+    cache = ImageMetadataCache()
+    cache.put(files[0], "kind", b"a" * 1000)
+    cache.put(files[0], "kind", b"a" * 1000)
+    assert cache.total_bytes == approximate_size(b"a" * 1000)
+
+
+def test_changed_file_is_reloaded(files):
+    cache = ImageMetadataCache()
+    assert cache.get(files[0], "kind", lambda _: "old") == "old"
+    with open(files[0], "ab") as fp:
+        fp.write(b"more")
+    assert cache.get(files[0], "kind", lambda _: "new") == "new"
+    assert cache.total_bytes == approximate_size("new")
+
+
+def test_load_piexif_without_cache(tmp_path, monkeypatch):
+    cache = ImageMetadataCache()
+    monkeypatch.setattr(image_metadata_cache, "IMAGE_METADATA_CACHE", cache)
+    path = str(tmp_path / "image.jpg")
+    with open(path, "wb") as fp:
+        fp.write(b"\xff\xd8\xff\xda\x00\x02\xff\xd9")
+    piexif.insert(piexif.dump({"0th": {piexif.ImageIFD.Make: "GoPro"}}), path)
+
+    assert image_metadata_cache.load_piexif(path, cache=False)["0th"][piexif.ImageIFD.Make] == b"GoPro"
+    assert len(cache) == 0
+    image_metadata_cache.load_piexif(path)
+    assert cache.contains(path, "piexif")
@@ -0,0 +1,102 @@
+import io
+import struct
+
+import piexif
+import pytest
+
+from mapilio_kit.components.metadata.jpeg_exif_segment import (
+    image_with_exif,
+    locate_exif_segment,
+    write_exif,
+)
+
+# entropy-coded data of the image, kept byte for byte by the Exif writes
+SCAN_DATA = bytes(range(256)) * 4
+
+
+def _jpeg(app0: bool = True) -> bytes:
+    parts = [b"\xff\xd8"]
+    if app0:
+        parts.append(b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00")
+    parts.append(b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, 30, 40, 1) + b"\x01\x11\x00")
+    parts.append(b"\xff\xda" + struct.pack(">HB", 8, 1) + b"\x01\x00\x00\x3f\x00")
+    parts.append(SCAN_DATA + b"\xff\xd9")
+    return b"".join(parts)
+
+
+def _exif(description: str) -> bytes:
+    return piexif.dump({
+        "0th": {piexif.ImageIFD.Make: "GoPro", piexif.ImageIFD.ImageDescription: description},
+        "Exif": {},
+        "GPS": {},
+    })
+
+
+def _description(path: str) -> bytes:
+    return piexif.load(path)["0th"][piexif.ImageIFD.ImageDescription]
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "image.jpg"
+    path.write_bytes(_jpeg())
+    return str(path)
+
+
+def test_first_write_copies_with_padding(image):
+    assert not write_exif(image, _exif("first"), padding=1024)
+
+    assert _description(image) == b"first"
+    with open(image, "rb") as fp:
+        data = fp.read()
+        segment = locate_exif_segment(fp)
+    # the JFIF segment stays first
+    assert data[2:4] == b"\xff\xe0"
+    assert segment.offset == 2 + 2 + 16
+    assert 1024 <= segment.size - 4 - len(_exif("first"))
+    assert data.endswith(SCAN_DATA + b"\xff\xd9")
+
+
+def test_second_write_in_place(image):
+    write_exif(image, _exif("first"))
+    with open(image, "rb") as fp:
+        size = len(fp.read())
+
+    assert write_exif(image, _exif("second, a bit longer"))
+    assert _description(image) == b"second, a bit longer"
+    with open(image, "rb") as fp:
+        data = fp.read()
+    assert len(data) == size
+    assert data.endswith(SCAN_DATA + b"\xff\xd9")
+
+
+def test_write_larger_than_segment_copies(image):
+    write_exif(image, _exif("first"), padding=0)
+    assert not write_exif(image, _exif("x" * 2000), padding=0)
+    assert _description(image) == b"x" * 2000
+
+
+def test_write_without_app0(tmp_path):
+    path = tmp_path / "image.jpg"
+    path.write_bytes(_jpeg(app0=False))
+    write_exif(str(path), _exif("first"))
+    with open(path, "rb") as fp:
+        assert locate_exif_segment(fp).offset == 2
+    assert _description(str(path)) == b"first"
+
+
+def test_image_with_exif_leaves_file_untouched(image):
+    write_exif(image, _exif("on disk"))
+    with open(image, "rb") as fp:
+        original = fp.read()
+
+    data = image_with_exif(image, _exif("overlay"))
+    assert piexif.load(data)["0th"][piexif.ImageIFD.ImageDescription] == b"overlay"
+    assert data.endswith(SCAN_DATA + b"\xff\xd9")
+    with open(image, "rb") as fp:
+        assert fp.read() == original
+
+
+def test_not_a_jpeg():
+    with pytest.raises(piexif.InvalidImageDataError):
+        locate_exif_segment(io.BytesIO(b"GIF89a"))
@@ -0,0 +1,112 @@
+import datetime
+import random
+
+import numpy as np
+import pytest
+
+from mapilio_kit.components.processing.sequence_builder import SequenceArrays, packed_chunk_ids, split_starts
+from mapilio_kit.components.processing.sequence_property_handler import _GPXPoint, split_sequences
+
+
+def _track(count: int, seed: int):
+    """
+    (filenames, descs) of a track of count images, with a few jumps in space and in time
+    """
+    rng = random.Random(seed)
+    t = datetime.datetime(2023, 5, 1, 10, 0, 0)
+    lat, lon = 41.0, 29.0
+    filenames, descs = [], []
+    for idx in range(count):
+        if idx and rng.random() < 0.05:
+            # about 1km away
+            lat += 0.01
+        if idx and rng.random() < 0.05:
+            t += datetime.timedelta(seconds=120)
+        lat += 0.0001
+        lon += 0.0001
+        t += datetime.timedelta(seconds=1)
+        filenames.append(f"img_{idx:04d}.jpg")
+        descs.append({
+            "latitude": lat,
+            "longitude": lon,
+            "captureTime": t.strftime("%Y-%m-%d %H:%M:%S"),
+            "altitude": 100.0,
+        })
+    return filenames, descs
+
+
+def _reference_chunk_ids(starts, sizes, max_length, target_size, max_size):
+    # the image by image packing
+    is_start = set(starts.tolist())
+    ids = []
+    chunk, length, total = -1, 0, 0
+    for idx, size in enumerate(sizes.tolist()):
+        if idx in is_start or length == max_length or target_size <= total or max_size < total + size:
+            chunk += 1
+            length, total = 0, 0
+        ids.append(chunk)
+        length += 1
+        total += size
+    return np.asarray(ids, dtype=np.intp)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_split_starts_matches_split_sequences(seed):
+    filenames, descs = _track(300, seed)
+    sequence = SequenceArrays.from_descs(filenames, descs)
+    starts = split_starts(sequence, 600.0, 60.0)
+
+    parts = split_sequences([_GPXPoint(desc, filename) for filename, desc in zip(filenames, descs)], 600.0, 60.0)
+    expected = np.cumsum([0] + [len(part) for part in parts[:-1]])
+    assert starts.tolist() == expected.tolist()
+
+
+def test_split_starts_empty():
+    sequence = SequenceArrays.from_descs([], [])
+    assert split_starts(sequence, 600.0, 60.0).tolist() == []
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_packed_chunk_ids_without_sizes_cuts_parts_by_length(seed):
+    filenames, descs = _track(700, seed)
+    sequence = SequenceArrays.from_descs(filenames, descs)
+    starts = split_starts(sequence, 600.0, 60.0)
+    chunks = packed_chunk_ids(starts, np.zeros(len(sequence), dtype=np.int64), 50, 500, 750)
+
+    # the baseline partition: each part cut every 50 images
+    parts = split_sequences([_GPXPoint(desc, filename) for filename, desc in zip(filenames, descs)], 600.0, 60.0)
+    expected = []
+    chunk = 0
+    for part in parts:
+        for idx in range(0, len(part), 50):
+            expected.extend([chunk] * len(part[idx: idx + 50]))
+            chunk += 1
+    assert chunks.tolist() == expected
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_packed_chunk_ids_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    count = int(rng.integers(1, 200))
+    sizes = rng.integers(0, 100, count).astype(np.int64)
+    starts = np.unique(np.concatenate(([0], rng.integers(0, count, int(rng.integers(0, 6))))))
+    max_length = int(rng.integers(1, 20))
+    target_size = int(rng.integers(0, 400))
+    max_size = int(rng.integers(0, 600))
+
+    chunks = packed_chunk_ids(starts, sizes, max_length, target_size, max_size)
+    assert chunks.tolist() == _reference_chunk_ids(starts, sizes, max_length, target_size, max_size).tolist()
+
+
+def test_packed_chunk_ids_respects_budget():
+    sizes = np.asarray([400, 300, 200, 900, 100, 100, 100, 100], dtype=np.int64)
+    chunks = packed_chunk_ids(np.zeros(1, dtype=np.intp), sizes, 10, 500, 750)
+    # 400 + 300 fits 750 and reaches 500, 900 is alone over max_size
+    assert chunks.tolist() == [0, 0, 1, 2, 3, 3, 3, 3]
+    for chunk in set(chunks.tolist()):
+        members = sizes[chunks == chunk]
+        assert len(members) == 1 or members.sum() <= 750
+
+
+def test_packed_chunk_ids_empty():
+    assert packed_chunk_ids(np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.int64), 10, 500, 750).tolist() == []
@@ -0,0 +1,30 @@
+import json
+
+from mapilio_kit.components.utilities import serialization
+
+DESC = {
+    "latitude": 41.0123456789,
+    "longitude": 29.0,
+    "captureTime": "2023-05-01 10:00:00",
+    "deviceModel": "Çamlıca",
+    "anomaly": 0,
+    "heading": None,
+    "tags": [1, 2.5, True],
+}
+
+
+def test_pretty_is_the_legacy_format():
+    assert serialization.dumps(DESC, pretty=True) == json.dumps(DESC, indent=4).encode("utf-8")
+    assert serialization.dumps_str(DESC, pretty=True) == json.dumps(DESC, indent=4)
+
+
+def test_compact_round_trip():
+    data = serialization.dumps(DESC)
+    assert b"\n" not in data
+    assert serialization.loads(data) == DESC
+    assert json.loads(data) == DESC
+
+
+def test_compact_falls_back_for_large_integers():
+    obj = {"value": 2 ** 70}
+    assert serialization.loads(serialization.dumps(obj)) == obj
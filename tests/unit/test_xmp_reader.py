@@ -0,0 +1,154 @@
+import io
+import math
+import struct
+import typing as T
+
+import piexif
+import pytest
+
+from mapilio_kit.components.metadata.xmp_reader import (
+    JPEG_XMP_HEADER,
+    parse_xmp_properties,
+    read_camera_metadata,
+    read_jpeg_header,
+)
+from mapilio_kit.components.utilities.utilities import exiftool_features_from_json
+
+XMP_ATTRIBUTES = b"""<x:xmpmeta xmlns:x="adobe:ns:meta/">
+ <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+  <rdf:Description rdf:about=""
+    xmlns:GPano="http://ns.google.com/photos/1.0/panorama/"
+    GPano:ProjectionType="equirectangular"
+    GPano:UsePanoramaViewer="True"
+    GPano:CroppedAreaImageWidthPixels="4000"
+    GPano:PoseHeadingDegrees="90.5"
+    GPano:PosePitchDegrees="-2.25"
+    GPano:PoseRollDegrees="1.5"/>
+ </rdf:RDF>
+</x:xmpmeta>"""
+
+XMP_ELEMENTS = b"""<x:xmpmeta xmlns:x="adobe:ns:meta/">
+ <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+  <rdf:Description rdf:about="" xmlns:GPano="http://ns.google.com/photos/1.0/panorama/">
+   <GPano:ProjectionType>equirectangular</GPano:ProjectionType>
+   <GPano:UsePanoramaViewer>True</GPano:UsePanoramaViewer>
+   <GPano:CroppedAreaImageWidthPixels>4000</GPano:CroppedAreaImageWidthPixels>
+   <GPano:PoseHeadingDegrees>90.5</GPano:PoseHeadingDegrees>
+   <GPano:PosePitchDegrees>-2.25</GPano:PosePitchDegrees>
+   <GPano:PoseRollDegrees>1.5</GPano:PoseRollDegrees>
+   <dc:subject xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <rdf:Bag><rdf:li>street</rdf:li></rdf:Bag>
+   </dc:subject>
+  </rdf:Description>
+ </rdf:RDF>
+</x:xmpmeta>"""
+
+GPANO_PROPERTIES = [
+    ("ProjectionType", "equirectangular"),
+    ("UsePanoramaViewer", "True"),
+    ("CroppedAreaImageWidthPixels", 4000),
+    ("PoseHeadingDegrees", 90.5),
+    ("PosePitchDegrees", -2.25),
+    ("PoseRollDegrees", 1.5),
+]
+
+EXIF = {
+    "0th": {
+        piexif.ImageIFD.Make: "GoPro",
+        piexif.ImageIFD.Model: "HERO8 Black",
+    },
+    "Exif": {
+        piexif.ExifIFD.FocalLength: (292, 100),
+        piexif.ExifIFD.FocalLengthIn35mmFilm: 16,
+    },
+}
+
+# exiftool -j -n output of the image, trimmed to the camera fields
+EXIFTOOL_RECORD = {
+    "Make": "GoPro",
+    "Model": "HERO8 Black",
+    "ProjectionType": "equirectangular",
+    "UsePanoramaViewer": "True",
+    "CroppedAreaImageWidthPixels": 4000,
+    "PoseHeadingDegrees": 90.5,
+    "PosePitchDegrees": -2.25,
+    "PoseRollDegrees": 1.5,
+    "ImageSize": "4000 3000",
+    "Megapixels": 12,
+    "FOV": math.degrees(2 * math.atan(36 / (2 * 16))),
+}
+
+
+def _segment(marker: int, payload: bytes) -> bytes:
+    return struct.pack(">BBH", 0xFF, marker, len(payload) + 2) + payload
+
+
+def _jpeg(xmp: T.Optional[bytes] = None) -> bytes:
+    segments = [b"\xff\xd8", _segment(0xE1, piexif.dump(EXIF))]
+    if xmp is not None:
+        segments.append(_segment(0xE1, JPEG_XMP_HEADER + xmp))
+    # baseline frame of 4000x3000 pixels, 3 components
+    segments.append(_segment(0xC0, struct.pack(">BHHB", 8, 3000, 4000, 3) + b"\x01\x22\x00" * 3))
+    segments.append(b"\xff\xda\x00\x02\xff\xd9")
+    return b"".join(segments)
+
+
+def _assert_same_features(metadata: T.Dict[str, T.Any], record: T.Dict[str, T.Any]) -> T.Dict[str, T.Any]:
+    features = exiftool_features_from_json(metadata)
+    expected = exiftool_features_from_json(record)
+    assert expected["field_of_view"] is not None
+    assert features.keys() == expected.keys()
+    for name, value in expected.items():
+        if isinstance(value, float):
+            assert features[name] == pytest.approx(value), name
+        else:
+            assert features[name] == value, name
+    return features
+
+
+@pytest.mark.parametrize("packet", [XMP_ATTRIBUTES, XMP_ELEMENTS])
+def test_parse_xmp_properties(packet):
+    assert parse_xmp_properties(packet) == GPANO_PROPERTIES
+
+
+def test_parse_invalid_xmp():
+    assert parse_xmp_properties(b"<x:xmpmeta") == []
+
+
+def test_read_jpeg_header():
+    header = read_jpeg_header(io.BytesIO(_jpeg(XMP_ATTRIBUTES)))
+    assert header.exif == piexif.dump(EXIF)[len(b"Exif\x00\x00"):]
+    assert header.xmp == [XMP_ATTRIBUTES]
+    assert (header.width, header.height) == (4000, 3000)
+
+    header = read_jpeg_header(io.BytesIO(_jpeg()))
+    assert header.xmp == []
+    assert (header.width, header.height) == (4000, 3000)
+
+    assert read_jpeg_header(io.BytesIO(b"II*\x00")) is None
+
+
+@pytest.mark.parametrize("packet", [XMP_ATTRIBUTES, XMP_ELEMENTS])
+def test_same_features_as_exiftool(packet, tmp_path):
+    path = tmp_path / "image.jpg"
+    path.write_bytes(_jpeg(packet))
+    metadata = read_camera_metadata(str(path))
+    for name, value in GPANO_PROPERTIES:
+        assert metadata[name] == value
+    # exiftool's composite FOV, from the 35mm equivalent focal length
+    assert metadata["FieldOfView"] == pytest.approx(EXIFTOOL_RECORD["FOV"])
+
+    features = _assert_same_features(metadata, EXIFTOOL_RECORD)
+    assert features["pitch"] == -2.25
+    assert features["roll"] == 1.5
+
+
+def test_image_without_xmp(tmp_path):
+    path = tmp_path / "image.jpg"
+    path.write_bytes(_jpeg())
+    metadata = read_camera_metadata(str(path))
+    assert "ProjectionType" not in metadata
+
+    record = {name: value for name, value in EXIFTOOL_RECORD.items() if name not in dict(GPANO_PROPERTIES)}
+    features = _assert_same_features(metadata, record)
+    assert features["pitch"] is None
@@ -0,0 +1,124 @@
+import io
+import random
+import zipfile
+
+import pytest
+
+from mapilio_kit.components.upload import zip_stream
+from mapilio_kit.components.upload.zip_stream import StoredZipLayout, StoredZipReader
+
+
+@pytest.fixture
+def files(tmp_path):
+    rng = random.Random(0)
+    paths = []
+    for idx, size in enumerate([0, 1, 1000, 300000, 5000]):
+        path = tmp_path / f"img_{idx}.jpg"
+        path.write_bytes(bytes(rng.getrandbits(8) for _ in range(size)))
+        paths.append((str(path), f"sub/img_{idx}.jpg"))
+    # non-ASCII names are flagged UTF-8
+    path = tmp_path / "görüntü.jpg"
+    path.write_bytes(b"\xff\xd8" + b"x" * 100)
+    paths.append((str(path), "görüntü.jpg"))
+    return paths
+
+
+def _archive(layout: StoredZipLayout) -> bytes:
+    with StoredZipReader(layout) as reader:
+        return reader.read()
+
+
+def test_round_trip(files):
+    layout = StoredZipLayout(files)
+    data = _archive(layout)
+    assert len(data) == layout.size
+
+    with zipfile.ZipFile(io.BytesIO(data)) as ziph:
+        assert ziph.testzip() is None
+        assert ziph.namelist() == [name for _, name in files]
+        for path, name in files:
+            info = ziph.getinfo(name)
+            assert info.compress_type == zipfile.ZIP_STORED
+            with open(path, "rb") as fp:
+                assert ziph.read(name) == fp.read()
+
+
+def test_same_bytes_as_zipfile_members(files, tmp_path):
+    layout = StoredZipLayout(files)
+    data = _archive(layout)
+
+    expected_path = tmp_path / "expected.zip"
+    with zipfile.ZipFile(expected_path, "w", zipfile.ZIP_STORED) as ziph:
+        for path, name in files:
+            ziph.write(path, name)
+    with zipfile.ZipFile(expected_path) as expected, zipfile.ZipFile(io.BytesIO(data)) as actual:
+        for idx, (expected_info, actual_info) in enumerate(zip(expected.infolist(), actual.infolist())):
+            assert actual_info.filename == expected_info.filename
+            assert actual_info.CRC == expected_info.CRC
+            assert actual_info.file_size == expected_info.file_size
+            assert actual_info.header_offset == layout.offsets[idx]
+            assert actual_info.flag_bits & zip_stream.DATA_DESCRIPTOR_FLAG
+
+
+def test_sequential_read_reads_each_file_once(files, monkeypatch):
+    layout = StoredZipLayout(files)
+    opened = []
+    real_open = open
+
+    def counting_open(path, *args, **kwargs):
+        opened.append(path)
+        return real_open(path, *args, **kwargs)
+
+    def no_crc_read(path):
+        raise AssertionError(f"{path} read again for its CRC")
+
+    monkeypatch.setattr(zip_stream, "open", counting_open, raising=False)
+    monkeypatch.setattr(zip_stream, "_file_crc", no_crc_read)
+    with StoredZipReader(layout) as reader:
+        data = b"".join(iter(lambda: reader.read(4096), b""))
+    # the empty file has no data to read
+    assert opened == [path for path, _ in files[1:]]
+    with zipfile.ZipFile(io.BytesIO(data)) as ziph:
+        assert ziph.testzip() is None
+
+
+def test_random_reads(files):
+    layout = StoredZipLayout(files)
+    data = _archive(StoredZipLayout(files))
+    rng = random.Random(1)
+    with StoredZipReader(layout) as reader:
+        for _ in range(200):
+            offset = rng.randrange(0, layout.size + 10)
+            size = rng.randrange(0, 70000)
+            reader.seek(offset)
+            assert reader.read(size) == data[offset: offset + size]
+            assert layout.read_at(offset, size) == data[offset: offset + size]
+        reader.seek(-22, io.SEEK_END)
+        assert reader.read() == data[-22:]
+
+
+def test_key_follows_file_changes(files):
+    key = StoredZipLayout(files).key
+    assert StoredZipLayout(files).key == key
+
+    path = files[2][0]
+    with open(path, "ab") as fp:
+        fp.write(b"more")
+    assert StoredZipLayout(files).key != key
+
+
+def test_file_truncated_while_read(files):
+    layout = StoredZipLayout(files)
+    path = files[3][0]
+    with open(path, "r+b") as fp:
+        fp.truncate(10)
+    with pytest.raises(RuntimeError):
+        _archive(layout)
+
+
+def test_empty_archive():
+    layout = StoredZipLayout([])
+    data = _archive(layout)
+    assert len(data) == layout.size
+    with zipfile.ZipFile(io.BytesIO(data)) as ziph:
+        assert ziph.namelist() == []